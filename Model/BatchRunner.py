@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import Config
+from RegisterFrames import PhaseFrames
+from RollingMillSimulator import RollingMillSimulator, steps_per
+from RunRecorder import RunRecorder
+from TelemetryLog import T, TEMP, EFFORT, MOMENT, POWER
+
+# Колонки slabs, описывающие заготовку
+SLAB_FIELDS = ('length_slab', 'width_slab', 'thikness_slab', 'temperature_slab',
+               'material_slab', 'diametr_roll', 'material_roll')
+NUMERIC_SLAB_FIELDS = ('length_slab', 'width_slab', 'thikness_slab', 'temperature_slab',
+                       'diametr_roll')
+
+# Колонки итоговой таблицы
+SUMMARY_FIELDS = ('id', 'status', 'passes', 'final_thickness', 'final_temperature',
+                  'peak_effort', 'peak_moment', 'peak_power', 'duration', 'steps', 'trace')
+
+
+# ===================== Входные данные =====================
+
+def _slab_from_row(row: dict, index: int) -> dict:
+    "Заготовка из строки CSV/JSON/slabs: числовые колонки приводятся к float"
+    slab = dict(row)
+    slab.setdefault('id', index + 1)
+    for key in NUMERIC_SLAB_FIELDS:
+        slab[key] = float(slab[key])
+    missing = [key for key in SLAB_FIELDS if slab.get(key) in (None, '')]
+    if missing:
+        raise ValueError(f"Заготовка {slab['id']}: нет колонок {', '.join(missing)}")
+    if isinstance(slab.get('passes'), str):
+        slab['passes'] = json.loads(slab['passes']) if slab['passes'] else None
+    return slab
+
+
+def load_slabs(path: str) -> list:
+    """
+    Заготовки из CSV (заголовок - колонки slabs) или JSON (список объектов
+    или {"slabs": [...]}). У заготовки может быть свой график проходов в поле passes.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows['slabs']
+    return [_slab_from_row(row, i) for i, row in enumerate(rows)]
+
+
+async def _fetch_slabs(unused_only: bool) -> list:
+    import asyncpg
+
+    conn = await asyncpg.connect(**Config.db_settings(), timeout=Config.DB_CONNECT_TIMEOUT)
+    try:
+        where = "WHERE is_used IS NOT TRUE " if unused_only else ""
+        rows = await conn.fetch(f"SELECT * FROM slabs {where}ORDER BY id")
+    finally:
+        await conn.close()
+    return [dict(row) for row in rows]
+
+
+def load_slabs_from_db(unused_only=False) -> list:
+    "Заготовки из таблицы slabs (параметры подключения - Config)"
+    rows = asyncio.run(_fetch_slabs(unused_only))
+    return [_slab_from_row(row, i) for i, row in enumerate(rows)]
+
+
+def load_schedules(path: str):
+    """
+    Графики проходов из JSON: список проходов (общий для всех заготовок) или
+    словарь {"default": [...], "<id заготовки>": [...]}.
+    Проход: {"gap": раствор, "speed": скорость валков, "v0": ..., "v1": ..., "dir": 0/1};
+    v0/v1 по умолчанию равны speed, dir по умолчанию чередуется от прохода к проходу.
+    """
+    with open(path, encoding='utf-8') as f:
+        schedules = json.load(f)
+    if isinstance(schedules, list):
+        schedules = {'default': schedules}
+    return {str(key): value for key, value in schedules.items()}
+
+
+def schedule_for(slab: dict, schedules: dict) -> list:
+    passes = slab.get('passes') or schedules.get(str(slab['id'])) or schedules.get('default')
+    if not passes:
+        raise ValueError(f"Заготовка {slab['id']}: не задан график проходов")
+    return passes
+
+
+# ===================== Расчёт одной заготовки (в процессе пула) =====================
+
+def roll_slab(sim: RollingMillSimulator, passes: list):
+    "Прокатка по графику целыми фазами, без пауз и Modbus"
+    for i, step in enumerate(passes):
+        direction = int(step.get('dir', i % 2))
+        speed = float(step['speed'])
+        sim._Gap_Valk_(float(step['gap']), direction)
+        sim._Accel_Valk_(speed, direction, direction)
+        sim._Approching_to_Roll_(direction, float(step.get('v0', speed)), float(step.get('v1', speed)))
+        sim._simulate_rolling_pass()
+        sim._simulate_exit_from_rolls()
+
+
+def simulate_slab(job) -> dict:
+    "Прокатка одной заготовки; job = (заготовка, график, seed, каталог трасс или None)"
+    slab, passes, seed, traces_dir = job
+    summary = dict.fromkeys(SUMMARY_FIELDS, '')
+    summary['id'] = slab['id']
+    try:
+        sim = RollingMillSimulator.from_slab(slab, seed=seed)
+        roll_slab(sim, passes)
+    except (ArithmeticError, ValueError, KeyError) as exc:
+        summary['status'] = f"error: {exc!r}"
+        return summary
+
+    log = sim.log
+    summary.update(
+        status='ok',
+        passes=len(passes),
+        final_thickness=float(passes[-1]['gap']),
+        final_temperature=round(float(log.column(TEMP)[-1]), 2),
+        peak_effort=round(float(log.column(EFFORT).max()), 2),
+        peak_moment=round(float(log.column(MOMENT).max()), 2),
+        peak_power=round(float(log.column(POWER).max()), 2),
+        duration=round(float(log.column(T)[-1]), 1),
+        steps=len(log),
+    )
+    if traces_dir:
+        path = os.path.join(traces_dir, f"slab_{slab['id']}.rec")
+        params = {key: slab[key] for key in ('id',) + SLAB_FIELDS}
+        params['seed'] = sim.seed
+        recorder = RunRecorder(path, params, chunk_records=len(log))
+        block, _ = log.since(0)
+        recorder.extend(PhaseFrames(0, block).records[::steps_per(Config.RECORD_DT, sim.time_step)])
+        recorder.close()
+        summary['trace'] = path
+    return summary
+
+
+# ===================== Пакетный прогон =====================
+
+def run_batch(slabs: list, schedules: dict, workers=None, seed=None, traces_dir=None,
+              progress=None):
+    """
+    Прокатка заготовок на пуле процессов. Итоги выдаются в порядке заготовок.
+    seed задаёт воспроизводимые шумы (заготовка i получает seed + i).
+    """
+    if traces_dir:
+        os.makedirs(traces_dir, exist_ok=True)
+    jobs = [(slab, schedule_for(slab, schedules), None if seed is None else seed + i, traces_dir)
+            for i, slab in enumerate(slabs)]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, summary in enumerate(pool.map(simulate_slab, jobs, chunksize=chunksize), 1):
+            if progress:
+                progress(done, len(jobs))
+            yield summary
+
+
+def write_summaries(summaries, path: str | None):
+    "Итоги в CSV (по умолчанию - в stdout) или JSON по расширению файла"
+    if path and path.lower().endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(list(summaries), f, ensure_ascii=False, indent=1)
+        return
+    f = open(path, 'w', newline='', encoding='utf-8') if path else sys.stdout
+    try:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow(summary)
+    finally:
+        if path:
+            f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Пакетная прокатка заготовок без Modbus и пауз на пуле процессов")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--slabs', help="заготовки: CSV или JSON")
+    source.add_argument('--db', action='store_true', help="заготовки из таблицы slabs")
+    parser.add_argument('--unused', action='store_true', help="с --db: только неиспользованные")
+    parser.add_argument('--schedule', help="графики проходов (JSON)")
+    parser.add_argument('--out', help="итоги: .csv или .json (по умолчанию CSV в stdout)")
+    parser.add_argument('--traces', help="каталог для трасс заготовок (файлы прогона .rec)")
+    parser.add_argument('--workers', type=int, help="процессов в пуле (по умолчанию - все ядра)")
+    parser.add_argument('--seed', type=int, help="seed шумов датчиков")
+    args = parser.parse_args(argv)
+
+    slabs = load_slabs_from_db(args.unused) if args.db else load_slabs(args.slabs)
+    schedules = load_schedules(args.schedule) if args.schedule else {}
+
+    started = time.perf_counter()
+
+    def progress(done, total):
+        if done == total or done % 100 == 0:
+            print(f"\r{done}/{total}", end='\n' if done == total else '', file=sys.stderr)
+
+    summaries = run_batch(slabs, schedules, args.workers, args.seed, args.traces, progress)
+    write_summaries(summaries, args.out)
+    print(f"Прокатано {len(slabs)} заготовок за {time.perf_counter() - started:.1f} с",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from ExcelLogger import ExcelLogger, save_run_workbook
+from RegisterFrames import float_to_regs, regs_to_float
+from PhaseCache import PhaseCache
+from RollingMillSimulator import RollingMillSimulator
+from SlabThermal import SlabThermal
+
+# Заготовка и проход, на которых меряются фазы (без записи в slabs)
+SLAB = {
+    'id': None, 'length_slab': 3000, 'width_slab': 250, 'thikness_slab': 350,
+    'temperature_slab': 1200, 'material_slab': 'Ст3сп', 'diametr_roll': 300,
+    'material_roll': 'Сталь',
+}
+PASS_GAP = 320.0
+PASS_SPEED = 200.0
+
+# Проходов на один повтор замера фаз (короткие фазы - единицы шагов)
+PHASE_PASSES = 50
+
+# Размеры Excel-лога (строк) для замеров flush и итогового сохранения файла
+EXCEL_SIZES = (1000, 10000, 30000)
+# Строк на один периодический flush (5 с при 10 Гц)
+FLUSH_ROWS = 50
+
+# Размеры пачки слябов для замера шага тепловой модели
+THERMAL_BATCHES = (1, 64)
+
+# Порог регрессии по умолчанию для compare (доля)
+DEFAULT_THRESHOLD = 0.10
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, better="lower"):
+    """
+    Регистрация замера: функция возвращает значение в единицах unit
+    (или словарь {суффикс: значение} для серии). better - "lower" или "higher".
+    """
+    def register(func):
+        BENCHMARKS[name] = (func, unit, better)
+        return func
+    return register
+
+
+def _timed(func, number):
+    "Среднее время вызова func (с) на number повторах"
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - started) / number
+
+
+def _new_simulator():
+    return RollingMillSimulator.from_slab(SLAB, seed=0)
+
+
+def _pass_phases(sim):
+    "Генераторы фаз одного прохода (как их запускает автомат сервера)"
+    yield "gap", lambda: sim.steps_gap_valk(PASS_GAP, 0)
+    yield "accel", lambda: sim.steps_accel_valk(PASS_SPEED, 0, 0)
+    yield "approach", lambda: sim.steps_approach(0, PASS_SPEED, PASS_SPEED)
+    yield "rolling", sim.steps_rolling_pass
+    yield "exit", sim.steps_exit_from_rolls
+    yield "alarm", sim.steps_alarm_stop
+
+
+# ===================== Замеры =====================
+
+def _phase_rates(repeat, cache):
+    "Шагов в секунду по фазам прохода; cache - кэш траекторий фаз или None"
+    totals = {}
+    for _ in range(repeat * PHASE_PASSES):
+        sim = _new_simulator()
+        sim.phase_cache = cache
+        for name, make in _pass_phases(sim):
+            started = time.perf_counter()
+            steps = sum(1 for _ in make())
+            elapsed = time.perf_counter() - started
+            count, spent = totals.get(name, (0, 0.0))
+            totals[name] = (count + steps, spent + elapsed)
+    return {name: count / spent for name, (count, spent) in totals.items()}
+
+
+@benchmark("simulator.steps_per_s", "шаг/с", "higher")
+def bench_simulator(repeat):
+    "Шагов в секунду по фазам симулятора (пошаговые генераторы, как в сервере), без кэша траекторий"
+    return _phase_rates(repeat, None)
+
+
+@benchmark("simulator.cached_steps_per_s", "шаг/с", "higher")
+def bench_simulator_cached(repeat):
+    "То же при повторении прохода: траектории фаз из кэша, рассчитываются только шумы"
+    cache = PhaseCache(2 ** 24)
+    _phase_rates(1, cache)
+    return _phase_rates(repeat, cache)
+
+
+@benchmark("registers.float_to_regs", "нс")
+def bench_float_to_regs(repeat):
+    return 1e9 * _timed(lambda: float_to_regs(1234.5678), 20000 * repeat)
+
+
+@benchmark("registers.regs_to_float", "нс")
+def bench_regs_to_float(repeat):
+    return 1e9 * _timed(lambda: regs_to_float(17562, 21455), 20000 * repeat)
+
+
+@benchmark("thermal.step", "мкс")
+def bench_thermal(repeat):
+    "Шаг профиля температуры по толщине (SlabThermal.advance) для пачки слябов"
+    result = {}
+    for batch in THERMAL_BATCHES:
+        thermal = SlabThermal(np.full(batch, 1200.0), np.full(batch, 350.0), 250.0)
+        result[f"batch_{batch}"] = 1e6 * min(
+            _timed(lambda: thermal.advance(1000, 0.1, 28.0), 1) for _ in range(repeat)) / 1000
+    return result
+
+
+async def _server(workdir):
+    from Server import AsyncModbusServer
+
+    server = AsyncModbusServer(runs_dir=os.path.join(workdir, "runs"), speed=0, seed=0)
+    await server.start_slab(SLAB)
+    return server
+
+
+@benchmark("server.publish_step", "мкс")
+def bench_publish(repeat):
+    """
+    Публикация шага (_publish_steps, преемник _write_single_step_to_registers_sync):
+    кадр в регистры, файл прогона, телеметрия и очередь Excel; расчёт фаз не входит.
+    """
+    async def run():
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            server = await _server(workdir)
+            try:
+                spent, steps = 0.0, 0
+                for _ in range(repeat):
+                    server.simulator.clear_logs()
+                    server.cursor = 0
+                    for _, make in _pass_phases(server.simulator):
+                        for start, source in make():
+                            started = time.perf_counter()
+                            server._publish_steps(start, source)
+                            spent += time.perf_counter() - started
+                            steps += 1
+                return 1e6 * spent / steps
+            finally:
+                await server.close()
+                os.chdir(cwd)
+    return asyncio.run(run())
+
+
+@benchmark("excel.log_step", "мкс")
+def bench_excel_log_step(repeat):
+    "Постановка шага в очередь Excel-лога (_log_step_to_excel)"
+    async def run():
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            server = await _server(workdir)
+            try:
+                step = server.simulator.log.last()
+                # Очередь не должна переполняться: фоновый поток разбирает её между сериями
+                result = []
+                for _ in range(repeat):
+                    result.append(_timed(lambda: server._log_step_to_excel(step), 5000))
+                    server.excel.flush()
+                    while server.excel.queue_depth:
+                        await asyncio.sleep(0.01)
+                return 1e6 * statistics.median(result)
+            finally:
+                await server.close()
+                os.chdir(cwd)
+    return asyncio.run(run())
+
+
+@benchmark("excel.flush", "мс")
+def bench_excel_flush(repeat):
+    "Периодический flush Excel-лога (строки за FLUSH_ROWS шагов) при росте файла"
+    params = [("Параметр", 1)] * 7
+    row = tuple(float(i) for i in range(10))
+    result = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in EXCEL_SIZES:
+            # Логгер без фонового потока: элементы очереди обрабатываются здесь же
+            logger = ExcelLogger()
+            logger._handle(("open", os.path.join(workdir, f"bench_{size}.xlsx"), params))
+            for _ in range(size):
+                logger._handle(("row", row))
+            logger._write()
+
+            def flush():
+                for _ in range(FLUSH_ROWS):
+                    logger._handle(("row", row))
+                logger._write()
+            result[f"{size}_rows"] = 1e3 * min(_timed(flush, 1) for _ in range(repeat))
+            logger._finish()
+    return result
+
+
+@benchmark("excel.save", "мс")
+def bench_excel_save(repeat):
+    "Итоговое сохранение Excel-лога (save_run_workbook, один раз на файл)"
+    params = [("Параметр", 1)] * 7
+    row = tuple(float(i) for i in range(10))
+    result = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.xlsx")
+        for size in EXCEL_SIZES:
+            rows = [row] * size
+            result[f"{size}_rows"] = 1e3 * min(
+                _timed(lambda: save_run_workbook(path, params, rows), 1) for _ in range(repeat))
+    return result
+
+
+@benchmark("modbus.start_latency", "мс")
+def bench_modbus(repeat):
+    """
+    Локальный клиент pymodbus против AsyncModbusServer: круговой путь чтения регистров
+    и задержка от записи бита Start (Start_Gap) до первого изменения раствора в регистрах.
+    """
+    from pymodbus.client import AsyncModbusTcpClient
+    from pymodbus.server import ModbusTcpServer
+
+    async def run():
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            server = await _server(workdir)
+            tcp = ModbusTcpServer(server.context, address=("127.0.0.1", 0))
+            serving = asyncio.create_task(tcp.serve_forever())
+            monitor = asyncio.create_task(server.monitor_registers())
+            client = None
+            try:
+                while tcp.transport is None:
+                    await asyncio.sleep(0.01)
+                port = tcp.transport.sockets[0].getsockname()[1]
+                client = AsyncModbusTcpClient("127.0.0.1", port=port)
+                await client.connect()
+
+                async def read(address, count):
+                    return (await client.read_holding_registers(address, count, slave=1)).registers
+
+                rtt = []
+                for _ in range(20 * repeat):
+                    started = time.perf_counter()
+                    await read(17, 2)
+                    rtt.append(time.perf_counter() - started)
+
+                latency = []
+                gap = 350.0
+                for i in range(10 * repeat):
+                    # Старт разрешён, команды нет: автомат в ожидании (статус 2)
+                    await client.write_registers(0, [0] * 8 + [0x100], slave=1)
+                    while (await read(32, 1))[0] != 2:
+                        pass
+                    before = await read(17, 2)
+                    gap = 340.0 if gap != 340.0 else 330.0
+                    regs = float_to_regs(PASS_SPEED) + float_to_regs(gap) + [0] * 4
+                    started = time.perf_counter()
+                    await client.write_registers(0, regs + [0x100 | 0x10 | 0x20], slave=1)
+                    while await read(17, 2) == before:
+                        pass
+                    latency.append(time.perf_counter() - started)
+                return {
+                    "read_rtt": 1e3 * statistics.median(rtt),
+                    "start_to_update": 1e3 * statistics.median(latency),
+                }
+            finally:
+                if client is not None:
+                    client.close()
+                server.stop_monitoring = True
+                monitor.cancel()
+                await tcp.shutdown()
+                serving.cancel()
+                await asyncio.gather(monitor, serving, return_exceptions=True)
+                await server.close()
+                os.chdir(cwd)
+    return asyncio.run(run())
+
+
+# ===================== Прогон и сравнение =====================
+
+def run_benchmarks(names=None, repeat=3, progress=None) -> dict:
+    "Прогон замеров; результат - словарь формата файла базовой линии"
+    results = {}
+    for name, (func, unit, better) in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        if progress:
+            progress(name)
+        value = func(repeat)
+        series = value if isinstance(value, dict) else {None: value}
+        for key, item in series.items():
+            results[name if key is None else f"{name}.{key}"] = {
+                "value": round(float(item), 4), "unit": unit, "better": better}
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold=DEFAULT_THRESHOLD) -> list:
+    """
+    Сравнение с базовой линией: строки (имя, база, текущее, изменение, регрессия).
+    Изменение - относительное ухудшение (> 0 - хуже) с учётом направления better.
+    """
+    rows = []
+    for name, base in baseline["results"].items():
+        now = current["results"].get(name)
+        if now is None or not base["value"]:
+            continue
+        ratio = now["value"] / base["value"]
+        worse = ratio - 1 if base["better"] == "lower" else 1 / ratio - 1 if ratio else float("inf")
+        rows.append((name, base, now, worse, worse > threshold))
+    return rows
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры симулятора, регистров, журналов и Modbus")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="прогон замеров")
+    run.add_argument('--out', help="сохранить результат как базовую линию (JSON)")
+
+    cmp = commands.add_parser("compare", help="сравнение с базовой линией")
+    cmp.add_argument('baseline', help="файл базовой линии")
+    cmp.add_argument('current', nargs='?', help="результат для сравнения (по умолчанию - новый прогон)")
+    cmp.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                     help="допустимое ухудшение (доля, по умолчанию 0.10)")
+
+    for sub in (run, cmp):
+        sub.add_argument('--only', nargs='*', help="только замеры с этими префиксами имён")
+        sub.add_argument('--repeat', type=int, default=3, help="повторов каждого замера")
+    args = parser.parse_args(argv)
+
+    def progress(name):
+        print(f"... {name}", file=sys.stderr)
+
+    if args.command == "run":
+        result = run_benchmarks(args.only, args.repeat, progress)
+        for name, item in result["results"].items():
+            print(f"{name:<40} {item['value']:>14.4f} {item['unit']}")
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=1)
+        return 0
+
+    baseline = _load(args.baseline)
+    current = _load(args.current) if args.current else run_benchmarks(args.only, args.repeat, progress)
+    rows = compare(baseline, current, args.threshold)
+    for name, base, now, worse, regressed in rows:
+        print(f"{name:<40} {base['value']:>12.4f} -> {now['value']:>12.4f} {base['unit']:<6} "
+              f"{worse:>+8.1%}{'  РЕГРЕССИЯ' if regressed else ''}")
+    regressions = sum(regressed for *_, regressed in rows)
+    print(f"Регрессий больше {args.threshold:.0%}: {regressions}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
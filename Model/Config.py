@@ -0,0 +1,83 @@
+import os
+
+# Настройки сервера. Каждое значение можно переопределить переменной окружения MT10_<ИМЯ>,
+# по умолчанию - параметры стенда. Пустое значение (MT10_SEED=) - то же, что его отсутствие.
+
+
+def _env(name: str, default, cast=str):
+    value = os.environ.get("MT10_" + name)
+    return cast(value) if value else default
+
+
+# --- PostgreSQL (таблица slabs) ---
+DB_HOST = _env("DB_HOST", "localhost")
+DB_PORT = _env("DB_PORT", 5432, int)
+DB_NAME = _env("DB_NAME", "postgres")
+DB_USER = _env("DB_USER", "postgres")
+DB_PASSWORD = _env("DB_PASSWORD", "postgres")
+
+# Размер пула соединений и таймаут установки соединения (с)
+DB_POOL_MIN = _env("DB_POOL_MIN", 1, int)
+DB_POOL_MAX = _env("DB_POOL_MAX", 4, int)
+DB_CONNECT_TIMEOUT = _env("DB_CONNECT_TIMEOUT", 1.0, float)
+
+# Пауза между опросами slabs при отсутствии заготовки или ошибке БД (с):
+# растёт от минимальной вдвое до максимальной, со случайным разбросом
+DB_RETRY_MIN = _env("DB_RETRY_MIN", 0.1, float)
+DB_RETRY_MAX = _env("DB_RETRY_MAX", 5.0, float)
+
+# --- Телеметрия в PostgreSQL (таблица rolling_telemetry) ---
+# Шагов в одном COPY, максимальная задержка неполной пачки (с), пачек в очереди
+TELEMETRY_BATCH = _env("TELEMETRY_BATCH", 500, int)
+TELEMETRY_FLUSH_INTERVAL = _env("TELEMETRY_FLUSH_INTERVAL", 1.0, float)
+TELEMETRY_MAX_BATCHES = _env("TELEMETRY_MAX_BATCHES", 64, int)
+
+# --- Публикация шагов ---
+# Ускорение относительно реального времени: 1 - пусконаладка, 10/100 - прогоны, 0 - без пауз
+SPEED = _env("SPEED", 1.0, float)
+# Шаг расчёта физики (с, от 0.001) и период записи регистров (с, кратен шагу физики)
+PHYSICS_DT = _env("PHYSICS_DT", 0.1, float)
+PUBLISH_DT = _env("PUBLISH_DT", 0.1, float)
+# Период записи шагов в файл прогона, Excel-лог и телеметрию БД (с; 0 - каждый шаг физики)
+RECORD_DT = _env("RECORD_DT", 0.0, float)
+EXCEL_DT = _env("EXCEL_DT", 0.1, float)
+TELEMETRY_DT = _env("TELEMETRY_DT", 0.1, float)
+# Тепловая модель сляба: empirical - одна температура по формулам RollingMill,
+# fd - профиль по толщине (SlabThermal) с пирометрами по поверхности; узлов по половине толщины
+THERMAL_MODEL = _env("THERMAL_MODEL", "empirical")
+THERMAL_NODES = _env("THERMAL_NODES", 25, int)
+# Кэш траекторий фаз без шумов, общий для станов процесса (МБ; 0 - без кэша)
+PHASE_CACHE_MB = _env("PHASE_CACHE_MB", 64, int)
+# Журнал симулятора сервера: в памяти последние LOG_RETENTION секунд шагов (0 - всё),
+# более старые - в файле в LOG_SPILL_DIR (пусто - временный каталог системы)
+LOG_RETENTION = _env("LOG_RETENTION", 600.0, float)
+LOG_SPILL_DIR = _env("LOG_SPILL_DIR", "")
+# Зерно генератора шумов симулятора (пусто - случайное; фактическое пишется в файл прогона)
+SEED = _env("SEED", None, int)
+
+# --- Метрики ---
+# Страница Prometheus (GET /metrics): адрес и порт (0 - без страницы, только регистры 34..46);
+# период обновления диагностических регистров (с)
+METRICS_HOST = _env("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _env("METRICS_PORT", 9110, int)
+METRICS_INTERVAL = _env("METRICS_INTERVAL", 1.0, float)
+
+# --- Реестр марок стали, материалов и компоновок стана ---
+# Источник: file - JSON-файл REGISTRY_FILE (перечитывается при изменении),
+# db - таблица mill_registry (читается перед каждой заготовкой)
+REGISTRY_SOURCE = _env("REGISTRY_SOURCE", "file")
+REGISTRY_FILE = _env("REGISTRY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                   "mill_registry.json"))
+# Компоновка стана по умолчанию (пусто - default_layout реестра)
+MILL_LAYOUT = _env("MILL_LAYOUT", "")
+
+
+def db_settings() -> dict:
+    "Параметры подключения к БД для asyncpg"
+    return {
+        "host": DB_HOST,
+        "port": DB_PORT,
+        "database": DB_NAME,
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+    }
@@ -0,0 +1,94 @@
+import asyncio
+
+from pymodbus.datastore import ModbusSequentialDataBlock, ModbusSlaveContext
+
+# Регистры, которые пишет ПЛК: уставки (1..8, четыре float) и управляющее слово (9)
+SETPOINT_REGISTERS = range(1, 9)
+CONTROL_REGISTER = 9
+COMMAND_REGISTERS = range(1, CONTROL_REGISTER + 1)
+
+
+class RegisterWatch:
+    """
+    Подписка на запись в диапазон регистров. Запись, пришедшая между двумя
+    ожиданиями, не теряется: wait() сразу вернёт True.
+    """
+
+    def __init__(self, block: "ControlDataBlock", addresses: range):
+        self._block = block
+        self.addresses = addresses
+        self._event = asyncio.Event()
+
+    def _notify(self, first: int, last: int):
+        if first < self.addresses.stop and last >= self.addresses.start:
+            self._event.set()
+
+    async def wait(self, timeout: float | None = None) -> bool:
+        "Ждёт записи в регистры подписки; False - истёк timeout"
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    def pending(self) -> bool:
+        "Была ли запись с момента последнего wait()"
+        return self._event.is_set()
+
+    def close(self):
+        self._block.unwatch(self)
+
+
+class ControlDataBlock(ModbusSequentialDataBlock):
+    """
+    Holding-регистры сервера с уведомлением о записи: каждая запись (от ПЛК или
+    самого сервера) будит подписки RegisterWatch, чей диапазон она затрагивает.
+    Запросы pymodbus обрабатываются в цикле событий, поэтому уведомление синхронное.
+    """
+
+    def __init__(self, address, values):
+        super().__init__(address, values)
+        self._watches: list[RegisterWatch] = []
+
+    def watch(self, addresses: range) -> RegisterWatch:
+        "Подписка на запись в регистры addresses"
+        watch = RegisterWatch(self, addresses)
+        self._watches.append(watch)
+        return watch
+
+    def unwatch(self, watch: RegisterWatch):
+        if watch in self._watches:
+            self._watches.remove(watch)
+
+    def setValues(self, address, values):
+        super().setValues(address, values)
+        last = address + (len(values) if isinstance(values, list) else 1) - 1
+        for watch in self._watches:
+            watch._notify(address, last)
+
+
+# Имена функций Modbus для счётчиков запросов
+FUNCTION_NAMES = {
+    1: "read_coils", 2: "read_discrete_inputs", 3: "read_holding_registers",
+    4: "read_input_registers", 5: "write_coil", 6: "write_register",
+    15: "write_coils", 16: "write_registers", 23: "read_write_registers",
+}
+
+
+class CountingSlaveContext(ModbusSlaveContext):
+    """
+    Контекст стана со счётчиком запросов клиентов по функциям Modbus.
+    pymodbus проверяет адреса (validate) один раз на запрос (read_write_registers -
+    дважды: запись и чтение), там он и считается;
+    обращения самого сервера идут в блок регистров напрямую и не учитываются.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests: dict[str, int] = {}
+
+    def validate(self, fc_as_hex, address, count=1):
+        name = FUNCTION_NAMES.get(fc_as_hex, str(fc_as_hex))
+        self.requests[name] = self.requests.get(name, 0) + 1
+        return super().validate(fc_as_hex, address, count)
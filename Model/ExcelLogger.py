@@ -0,0 +1,332 @@
+import csv
+import os
+import queue
+import threading
+import time
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment
+
+# Заголовки построчных данных (то, что идёт в регистры)
+EXCEL_HEADERS = [
+    "Время (с)",
+    "Пирометр 1 (°C)",
+    "Пирометр 2 (°C)",
+    "Давление (кН)",
+    "Раствор (мм)",
+    "Скорость валков (об/с)",
+    "Скорость левой группы рольгангов (об/с)",
+    "Скорость правой группы рольгангов (об/с)",
+    "Момент прокатки (кН·м)",
+    "Мощность прокатки (кВт)",
+]
+
+# Суффикс CSV-журнала строк, дописываемого при каждом flush до сохранения xlsx
+PART_SUFFIX = ".part.csv"
+
+# Начальные параметры из таблицы slabs для блока параметров: (колонка, название)
+SLAB_PARAMS = [
+    ("length_slab",      "Длина сляба, мм"),
+    ("width_slab",       "Ширина сляба, мм"),
+    ("thikness_slab",    "Толщина сляба, мм"),
+    ("temperature_slab", "Температура сляба, °C"),
+    ("material_slab",    "Марка стали"),
+    ("diametr_roll",     "Диаметр валков, мм"),
+    ("material_roll",    "Материал валков"),
+]
+
+
+def slab_params(row) -> list:
+    "Блок параметров (название, значение) из записи slabs (asyncpg.Record или dict)"
+    return [(title, row[key]) for key, title in SLAB_PARAMS if key in row]
+
+
+class RunWorkbook:
+    """
+    Лог прокатки в xlsx: блок начальных параметров (пары название-значение),
+    пустая строка, заголовки EXCEL_HEADERS и построчные данные.
+    Строки пишутся потоком в write-only книгу (openpyxl держит их во временном файле,
+    а не в памяти); книга сохраняется один раз - во временный файл, который затем
+    подменяет filename.
+    """
+
+    def __init__(self, filename: str, params: list):
+        self.filename = filename
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Лог прокатки")
+        bold = Font(bold=True)
+
+        def styled(value, alignment=None):
+            cell = WriteOnlyCell(self.ws, value=value)
+            cell.font = bold
+            if alignment:
+                cell.alignment = alignment
+            return cell
+
+        # Ширина колонок задаётся до первой строки
+        for col in range(len(EXCEL_HEADERS)):
+            self.ws.column_dimensions[chr(65 + col)].width = 14
+
+        # --- Блок начальных параметров ---
+        self.ws.append([styled("Параметр"), styled("Значение")])
+        for title, value in params:
+            self.ws.append([title, value])
+        self.ws.append([])
+
+        # --- Заголовки построчных данных ---
+        center = Alignment(horizontal="center", vertical="center")
+        self.ws.append([styled(name, center) for name in EXCEL_HEADERS])
+
+    def append(self, row):
+        self.ws.append(row)
+
+    def save(self):
+        tmp_filename = self.filename + ".tmp"
+        self.wb.save(tmp_filename)
+        os.replace(tmp_filename, self.filename)
+
+
+def save_run_workbook(filename: str, params: list, rows):
+    "Сохраняет лог прокатки с построчными данными rows в xlsx (RunWorkbook)"
+    book = RunWorkbook(filename, params)
+    for row in rows:
+        book.append(row)
+    book.save()
+
+
+class ExcelWriter:
+    """
+    Фоновый поток записи Excel-логов. Один поток может обслуживать несколько ExcelLogger
+    (например, все станы процесса): элементы общей очереди несут свой логгер,
+    файлы пишутся по очереди. Поток запускается первым открытым файлом.
+    Размер очереди ограничивает только строки (max_queue); управляющие элементы
+    (открытие и закрытие файла) ставятся всегда и без ожидания, в общем порядке со строками.
+    """
+
+    def __init__(self, max_queue=10000):
+        self.max_queue = max_queue
+        self._queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._loggers = set()  # Логгеры с открытым файлом (меняется только в фоновом потоке)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="ExcelWriter", daemon=True)
+            self._thread.start()
+
+    def put(self, logger, item):
+        "Поставить управляющий элемент вне ограничения max_queue (не блокирует)"
+        self._queue.put_nowait((logger, item))
+
+    def put_nowait(self, logger, item) -> bool:
+        "Поставить строку без ожидания; False - в очереди уже max_queue элементов"
+        if self._queue.qsize() >= self.max_queue:
+            return False
+        self._queue.put_nowait((logger, item))
+        return True
+
+    def wake(self):
+        "Разбудить поток для проверки запросов flush (при полной очереди он и так не спит)"
+        self.put_nowait(None, ("wake",))
+
+    def close(self, timeout=10.0):
+        "Дописать все файлы и остановить поток"
+        if self._thread is None:
+            return
+        self._queue.put((None, ("stop",)))
+        self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    # ===================== Фоновый поток =====================
+
+    def _run(self):
+        while True:
+            deadline = min((logger._next_flush for logger in self._loggers), default=None)
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not None and not self._handle(*item):
+                return
+
+            now = time.monotonic()
+            due = [logger for logger in self._loggers
+                   if logger._flush_requested.is_set() or now >= logger._next_flush]
+            if not due:
+                continue
+            for logger in due:
+                logger._flush_requested.clear()
+            # Всё, что поставлено в очередь до запроса, попадает в этот flush
+            stopping = False
+            while not stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                stopping = not self._handle(*item)
+            for logger in due:
+                logger._write()
+                logger._next_flush = time.monotonic() + logger.flush_interval
+            if stopping:
+                self._stop()
+                return
+
+    def _handle(self, logger, item) -> bool:
+        "Обработка элемента очереди; False - поток должен завершиться"
+        if logger is None:
+            if item[0] == "stop":
+                self._stop()
+                return False
+            return True
+        if item[0] == "open":
+            self._loggers.add(logger)
+            logger._next_flush = time.monotonic() + logger.flush_interval
+        logger._handle(item)
+        if item[0] == "close":
+            self._loggers.discard(logger)
+        return True
+
+    def _stop(self):
+        for logger in self._loggers:
+            logger._finish()
+        self._loggers.clear()
+
+
+class ExcelLogger:
+    """
+    Буферизованная запись лога прокатки в Excel из фонового потока ExcelWriter
+    (собственного или общего для нескольких логгеров - writer).
+    Строки принимаются через ограниченную очередь и никогда не блокируют вызывающего
+    (при переполнении строка отбрасывается и учитывается в счётчике dropped).
+    Фоновый поток сразу дописывает строки в RunWorkbook, а по запросу flush()
+    и раз в flush_interval секунд - только новые строки в CSV-журнал рядом с файлом
+    (filename + PART_SUFFIX). xlsx сохраняется один раз, при открытии следующего
+    файла или закрытии логгера; после этого журнал удаляется. flush() поэтому
+    делает на диске прочным журнал, а не xlsx: если процесс упал, строки запуска
+    остаются в журнале. open() и close() тоже не ждут места в очереди.
+    """
+
+    def __init__(self, flush_interval=5.0, max_queue=10000, writer: ExcelWriter | None = None):
+        self.flush_interval = flush_interval
+        self._own_writer = writer is None
+        self.writer = writer or ExcelWriter(max_queue)
+        self._flush_requested = threading.Event()
+
+        # Состояние текущего файла (меняется только в фоновом потоке)
+        self._filename: str | None = None
+        self._book: RunWorkbook | None = None
+        self._part = None  # CSV-журнал строк текущего файла
+        self._part_writer = None
+        self._pending = []  # Строки после последнего flush
+        self._next_flush = 0.0
+
+        # Счётчики
+        self.rows_logged = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+        self.flush_count = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    # ===================== Интерфейс для сервера =====================
+
+    def open(self, filename: str, params: list):
+        """
+        Начать новый файл. params - список пар (название, значение) для блока
+        начальных параметров. Предыдущий файл дописывается и закрывается.
+        Не блокирует: открытие ставится в очередь вне ограничения на строки.
+        """
+        self.writer.start()
+        self.writer.put(self, ("open", filename, list(params)))
+
+    def log_step(self, row):
+        "Поставить строку в очередь записи (без ожидания)"
+        if not self.writer.put_nowait(self, ("row", row)):
+            self.dropped += 1
+            return
+        self.rows_logged += 1
+        depth = self.writer.queue_depth
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def flush(self):
+        """
+        Запросить дозапись новых строк в CSV-журнал (выполняется фоновым потоком);
+        xlsx при этом не сохраняется
+        """
+        self._flush_requested.set()
+        self.writer.wake()
+
+    def close(self, timeout=10.0):
+        "Дописать файл; собственный фоновый поток при этом останавливается"
+        if self.writer._thread is None:
+            return
+        self.writer.put(self, ("close",))
+        if self._own_writer:
+            self.writer.close(timeout)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.writer.queue_depth
+
+    def stats(self) -> dict:
+        "Счётчики очереди и записи на диск"
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "rows_logged": self.rows_logged,
+            "dropped": self.dropped,
+            "flush_count": self.flush_count,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+        }
+
+    # ===================== Фоновый поток =====================
+
+    def _handle(self, item):
+        "Обработка элемента очереди в потоке ExcelWriter"
+        kind = item[0]
+        if kind == "row":
+            if self._book is not None:
+                self._book.append(item[1])
+                self._pending.append(item[1])
+        elif kind == "open":
+            self._finish()
+            self._filename = item[1]
+            self._book = RunWorkbook(self._filename, item[2])
+            self._part = open(self._filename + PART_SUFFIX, "w", newline="", encoding="utf-8")
+            self._part_writer = csv.writer(self._part)
+            self._part_writer.writerow(EXCEL_HEADERS)
+        elif kind == "close":
+            self._finish()
+
+    def _write(self):
+        "Дописать в журнал строки, пришедшие после последнего flush"
+        if not (self._pending and self._part):
+            return
+        started = time.perf_counter()
+        self._part_writer.writerows(self._pending)
+        self._part.flush()
+        self._pending = []
+
+        latency = time.perf_counter() - started
+        self.flush_count += 1
+        self.last_flush_latency = latency
+        if latency > self.max_flush_latency:
+            self.max_flush_latency = latency
+
+    def _finish(self):
+        "Сохранить xlsx текущего файла и удалить журнал"
+        if self._book is None:
+            return
+        self._write()
+        self._part.close()
+        self._book.save()
+        os.remove(self._filename + PART_SUFFIX)
+        self._book = self._part = self._part_writer = None
@@ -0,0 +1,339 @@
+import asyncio
+import math
+import time
+
+import Config
+import PhaseCache
+
+# Диагностический блок holding-регистров сразу за статусом (регистр 33):
+# (имя, множитель) - значение * множитель, округлённое и ограниченное 0..65535.
+# Счётчики (*_total) берутся по модулю 65536.
+DIAG_ADDRESS = 34
+DIAG_REGISTERS = (
+    ("loop_lag_ms", 10),  # 34: отставание цикла событий, 0.1 мс
+    ("loop_lag_max_ms", 10),  # 35: максимум отставания с запуска, 0.1 мс
+    ("phase_compute_ms", 10),  # 36: расчёт последней фазы, 0.1 мс
+    ("publish_us", 1),  # 37: средняя публикация шага, мкс
+    ("jitter_ms", 10),  # 38: разброс опоздания шагов (СКО), 0.1 мс
+    ("lateness_max_ms", 1),  # 39: наибольшее опоздание шага, мс
+    ("overruns_total", 1),  # 40: шагов с опозданием больше периода
+    ("excel_queue", 1),  # 41: глубина очереди Excel-логов
+    ("excel_flush_ms", 1),  # 42: последняя запись Excel-файла, мс
+    ("telemetry_queue", 1),  # 43: пачек телеметрии в очереди
+    ("telemetry_flush_ms", 1),  # 44: последняя загрузка пачки телеметрии, мс
+    ("db_claim_ms", 1),  # 45: последний захват заготовки из slabs, мс
+    ("modbus_requests_total", 1),  # 46: запросов Modbus к стану
+)
+DIAG_WORDS = len(DIAG_REGISTERS)
+
+
+class Timing:
+    "Счётчик длительностей: число, сумма, последняя и наибольшая (с)"
+
+    __slots__ = ("count", "total", "last", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def stats(self) -> dict:
+        return {"count": self.count, "sum": self.total, "last": self.last,
+                "mean": self.mean, "max": self.max}
+
+
+class MillMetrics:
+    """
+    Время расчёта фаз и публикации шагов одного стана. Сервер отмечает точки цикла
+    фазы: begin_phase - перед первым шагом, step_computed - шаг получен от генератора,
+    step_published - шаг записан; end_phase - после последнего шага.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, Timing] = {}
+        self.publish = Timing()
+        self.last_phase = None
+        self._compute = 0.0
+        self._mark = 0.0
+
+    def begin_phase(self, steps):
+        "steps - генератор фазы симулятора; фаза называется по его функции (steps_*)"
+        self.last_phase = steps.__name__.removeprefix("steps_")
+        self._compute = 0.0
+        self._mark = time.perf_counter()
+
+    def step_computed(self):
+        self._compute += time.perf_counter() - self._mark
+
+    def step_published(self, started: float):
+        self._mark = time.perf_counter()
+        self.publish.add(self._mark - started)
+
+    def end_phase(self):
+        timing = self.phases.get(self.last_phase)
+        if timing is None:
+            timing = self.phases[self.last_phase] = Timing()
+        timing.add(self._compute)
+
+
+class LoopLagMonitor:
+    """
+    Отставание цикла событий: задача спит interval и меряет, насколько позже
+    срока она проснулась. Одна на процесс (цикл событий общий для всех станов).
+    """
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.lag = Timing()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            deadline = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag.add(max(time.monotonic() - deadline, 0.0))
+
+
+def mill_snapshot(mill) -> dict:
+    "Сводка метрик стана (AsyncModbusServer) для страницы и диагностических регистров"
+    return {
+        "phases": {name: timing.stats() for name, timing in mill.metrics.phases.items()},
+        "last_phase": mill.metrics.last_phase,
+        "publish": mill.metrics.publish.stats(),
+        "pacer": mill.pacer.stats(),
+        "excel": mill.excel.stats(),
+        "telemetry": mill.telemetry.stats(),
+        "db": mill.db.stats(),
+        "modbus": dict(mill.slave_context.requests),
+        "status": mill.status_code,
+    }
+
+
+def diag_values(snapshot: dict, lag: Timing) -> dict:
+    "Значения диагностического блока (в единицах DIAG_REGISTERS до масштабирования)"
+    phase = snapshot["phases"].get(snapshot["last_phase"])
+    return {
+        "loop_lag_ms": 1e3 * lag.last,
+        "loop_lag_max_ms": 1e3 * lag.max,
+        "phase_compute_ms": 1e3 * phase["last"] if phase else 0.0,
+        "publish_us": 1e6 * snapshot["publish"]["mean"],
+        "jitter_ms": 1e3 * snapshot["pacer"]["jitter"],
+        "lateness_max_ms": 1e3 * snapshot["pacer"]["max_lateness"],
+        "overruns_total": snapshot["pacer"]["overruns"],
+        "excel_queue": snapshot["excel"]["queue_depth"],
+        "excel_flush_ms": 1e3 * snapshot["excel"]["last_flush_latency"],
+        "telemetry_queue": snapshot["telemetry"]["queue_depth"],
+        "telemetry_flush_ms": 1e3 * snapshot["telemetry"]["last_flush_latency"],
+        "db_claim_ms": 1e3 * snapshot["db"]["claim"]["last"],
+        "modbus_requests_total": sum(snapshot["modbus"].values()),
+    }
+
+
+def diag_words(values: dict) -> list:
+    "Слова диагностического блока: масштаб, насыщение (счётчики - по модулю)"
+    words = []
+    for name, scale in DIAG_REGISTERS:
+        value = values[name] * scale
+        if name.endswith("_total"):
+            words.append(int(value) & 0xFFFF)
+        elif math.isfinite(value):
+            words.append(min(max(round(value), 0), 0xFFFF))
+        else:
+            words.append(0xFFFF)
+    return words
+
+
+# ===================== Текстовая страница Prometheus =====================
+
+def _labels(**labels) -> str:
+    items = ",".join(f'{key}="{value}"' for key, value in labels.items() if value is not None)
+    return "{" + items + "}" if items else ""
+
+
+class _Page:
+    "Сборка страницы: HELP/TYPE выводятся один раз на метрику"
+
+    def __init__(self):
+        self.lines = []
+        self._declared = set()
+
+    def add(self, name, value, help_text, kind="gauge", **labels):
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {kind}")
+        self.lines.append(f"{name}{_labels(**labels)} {float(value):.9g}")
+
+    def timing(self, name, stats, help_text, **labels):
+        "Timing как summary без квантилей (_count, _sum) и отдельный gauge максимума"
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} summary")
+        self.lines.append(f"{name}_count{_labels(**labels)} {stats['count']}")
+        self.lines.append(f"{name}_sum{_labels(**labels)} {stats['sum']:.9g}")
+        self.add(f"{name}_max", stats["max"], f"{help_text} (наибольшее)", **labels)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render(mills, lag: Timing) -> str:
+    "Страница метрик в текстовом формате Prometheus 0.0.4"
+    page = _Page()
+    page.timing("mt10_loop_lag_seconds", lag.stats(), "Отставание цикла событий")
+    if PhaseCache.CACHE is not None:
+        cache = PhaseCache.CACHE.stats()
+        page.add("mt10_phase_cache_hits_total", cache["hits"], "Фаз из кэша траекторий", "counter")
+        page.add("mt10_phase_cache_misses_total", cache["misses"], "Фаз, рассчитанных заново",
+                 "counter")
+        page.add("mt10_phase_cache_evictions_total", cache["evictions"],
+                 "Траекторий, вытесненных из кэша", "counter")
+        page.add("mt10_phase_cache_entries", cache["entries"], "Траекторий в кэше")
+        page.add("mt10_phase_cache_bytes", cache["bytes"], "Размер кэша траекторий (байт)")
+    for mill in mills:
+        s = mill_snapshot(mill)
+        name = mill.name or "mill"
+        for phase, stats in s["phases"].items():
+            page.timing("mt10_phase_compute_seconds", stats, "Расчёт фазы симулятора",
+                        mill=name, phase=phase)
+        page.timing("mt10_publish_seconds", s["publish"], "Публикация шага в регистры и журналы",
+                    mill=name)
+
+        pacer = s["pacer"]
+        page.add("mt10_steps_total", pacer["steps"], "Выдано шагов", "counter", mill=name)
+        page.add("mt10_step_overruns_total", pacer["overruns"],
+                 "Шагов с опозданием больше периода", "counter", mill=name)
+        page.add("mt10_step_resyncs_total", pacer["resyncs"], "Сдвигов графика шагов",
+                 "counter", mill=name)
+        page.add("mt10_step_lateness_seconds", pacer["mean_lateness"],
+                 "Опоздание шага относительно графика", mill=name, stat="mean")
+        page.add("mt10_step_lateness_seconds", pacer["max_lateness"],
+                 "Опоздание шага относительно графика", mill=name, stat="max")
+        page.add("mt10_step_jitter_seconds", pacer["jitter"], "Разброс опоздания шагов (СКО)",
+                 mill=name)
+
+        excel = s["excel"]
+        page.add("mt10_excel_queue_depth", excel["queue_depth"], "Очередь Excel-логов", mill=name)
+        page.add("mt10_excel_dropped_total", excel["dropped"], "Отброшено строк Excel-лога",
+                 "counter", mill=name)
+        page.add("mt10_excel_flush_seconds", excel["last_flush_latency"], "Запись Excel-файла",
+                 mill=name, stat="last")
+        page.add("mt10_excel_flush_seconds", excel["max_flush_latency"], "Запись Excel-файла",
+                 mill=name, stat="max")
+
+        telemetry = s["telemetry"]
+        page.add("mt10_telemetry_queue_depth", telemetry["queue_depth"],
+                 "Пачек телеметрии в очереди загрузки", mill=name)
+        page.add("mt10_telemetry_pending_summaries", telemetry["pending_summaries"],
+                 "Итогов заготовок, ожидающих записи в slabs", mill=name)
+        page.add("mt10_telemetry_rows_total", telemetry["rows_written"],
+                 "Загружено строк телеметрии", "counter", mill=name)
+        page.add("mt10_telemetry_dropped_total", telemetry["dropped_rows"],
+                 "Отброшено строк телеметрии", "counter", mill=name)
+        page.add("mt10_telemetry_flush_seconds", telemetry["last_flush_latency"],
+                 "Загрузка пачки телеметрии", mill=name, stat="last")
+        page.add("mt10_telemetry_flush_seconds", telemetry["max_flush_latency"],
+                 "Загрузка пачки телеметрии", mill=name, stat="max")
+
+        db = s["db"]
+        page.timing("mt10_db_open_seconds", db["open"], "Создание пула соединений БД", mill=name)
+        page.timing("mt10_db_claim_seconds", db["claim"], "Захват заготовки из slabs", mill=name)
+
+        for function, count in sorted(s["modbus"].items()):
+            page.add("mt10_modbus_requests_total", count, "Запросов Modbus к регистрам стана",
+                     "counter", mill=name, function=function)
+        page.add("mt10_status", s["status"], "Статус автомата (регистр 33)", mill=name)
+    return page.text()
+
+
+class MetricsExporter:
+    """
+    Метрики станов процесса: страница Prometheus на локальном порту (GET /metrics)
+    и диагностический блок регистров 34..46 каждого стана, обновляемый раз в interval.
+    """
+
+    def __init__(self, mills, host=Config.METRICS_HOST, port=Config.METRICS_PORT,
+                 interval=Config.METRICS_INTERVAL):
+        self.mills = list(mills)
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.loop_lag = LoopLagMonitor()
+        self._server: asyncio.AbstractServer | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        "Запуск замера отставания, обновления регистров и (если port > 0) HTTP-страницы"
+        self.loop_lag.start()
+        self._task = asyncio.create_task(self._update_registers())
+        if self.port > 0:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.loop_lag.stop()
+
+    def page(self) -> str:
+        return render(self.mills, self.loop_lag.lag)
+
+    def write_registers(self):
+        for mill in self.mills:
+            values = diag_values(mill_snapshot(mill), self.loop_lag.lag)
+            mill.hr_data_combined.setValues(DIAG_ADDRESS, diag_words(values))
+
+    async def _update_registers(self):
+        while True:
+            self.write_registers()
+            await asyncio.sleep(self.interval)
+
+    async def _serve(self, reader, writer):
+        "Минимальный HTTP/1.0: GET /metrics - страница, остальное - 404"
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5.0)
+            # Заголовки запроса не нужны, но дочитываются до пустой строки
+            while (await asyncio.wait_for(reader.readline(), 5.0)).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.page().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        except (OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
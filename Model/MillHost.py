@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import os
+
+from pymodbus.server import ModbusTcpServer
+from pymodbus.datastore import ModbusServerContext
+
+import Config
+from ExcelLogger import ExcelWriter
+from Metrics import MetricsExporter
+from Server import AsyncModbusServer
+from SlabDatabase import SlabDatabase
+
+# Адресация станов: unit - один порт, стан = Modbus unit ID 1..N;
+# port - у каждого стана свой порт (port, port + 1, ...), unit ID любой
+HOST_MODES = ("unit", "port")
+
+# Наибольший unit ID Modbus (0 - широковещательный)
+MAX_UNIT_ID = 247
+
+
+class MillHost:
+    """
+    Несколько независимых станов в одном процессе. У каждого стана свои регистры,
+    симулятор, автомат управляющих регистров, файл прогона, Excel-файл и телеметрия;
+    цикл событий, пул соединений БД и поток записи Excel-логов общие.
+    Заготовки станы берут из общей очереди slabs (захват с SKIP LOCKED);
+    с replay станы вместо расчёта по кругу повторяют записанный прогон.
+    """
+
+    def __init__(self, count: int, ip: str, port: int, mode="unit", speed=Config.SPEED,
+                 runs_dir="runs", excel_flush_interval=5.0, layouts=None,
+                 metrics_port=Config.METRICS_PORT, replay=None):
+        if mode not in HOST_MODES:
+            raise ValueError(f"Неизвестный режим адресации: {mode}")
+        if mode == "unit" and not 1 <= count <= MAX_UNIT_ID:
+            raise ValueError(f"В режиме unit станов от 1 до {MAX_UNIT_ID}")
+        self.ip = ip
+        self.port = port
+        self.mode = mode
+        self.replay = replay
+
+        self.db = SlabDatabase(max_size=max(Config.DB_POOL_MAX, count))
+        self.excel_writer = ExcelWriter()
+        self.mills = []
+        for i in range(count):
+            name = f"mill{i + 1}"
+            self.mills.append(AsyncModbusServer(
+                excel_flush_interval=excel_flush_interval,
+                runs_dir=os.path.join(runs_dir, name),
+                speed=speed,
+                db=self.db,
+                excel_writer=self.excel_writer,
+                name=name,
+                layout=layouts[i] if layouts else None,
+            ))
+        # Одна страница метрик на процесс, метка mill различает станы
+        self.metrics = MetricsExporter(self.mills, port=metrics_port)
+
+    def listeners(self) -> list:
+        "Пары (адрес, контекст Modbus) для запуска TCP-серверов"
+        if self.mode == "unit":
+            slaves = {unit: mill.slave_context for unit, mill in enumerate(self.mills, 1)}
+            return [((self.ip, self.port), ModbusServerContext(slaves=slaves, single=False))]
+        return [((self.ip, self.port + i), mill.context) for i, mill in enumerate(self.mills)]
+
+    async def run(self):
+        "Запуск TCP-серверов, первичная инициализация станов и их автоматов"
+        servers = [ModbusTcpServer(context, address=address) for address, context in self.listeners()]
+        tasks = [asyncio.create_task(server.serve_forever()) for server in servers]
+        try:
+            await self.metrics.start()
+            if self.replay:
+                await asyncio.gather(*(mill.replay(self.replay, loop=True) for mill in self.mills),
+                                     *tasks)
+                return
+            # Дадим серверам подняться
+            await asyncio.sleep(0.1)
+            await asyncio.gather(*(mill.start_init_from_registers() for mill in self.mills))
+            await asyncio.gather(*(mill.monitor_registers() for mill in self.mills), *tasks)
+        finally:
+            for server in servers:
+                await server.shutdown()
+            await self.close()
+
+    async def close(self):
+        await self.metrics.close()
+        for mill in self.mills:
+            await mill.close()
+        self.excel_writer.close()
+        await self.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Несколько станов в одном процессе")
+    parser.add_argument('--mills', type=int, default=1, help="число станов")
+    parser.add_argument('--ip', default="192.168.0.99")
+    parser.add_argument('--port', type=int, default=55000, help="порт (первый порт в режиме port)")
+    parser.add_argument('--mode', choices=HOST_MODES, default="unit",
+                        help="адресация станов: unit ID на одном порту или порт на стан")
+    parser.add_argument('--speed', type=float, default=Config.SPEED, help="ускорение времени")
+    parser.add_argument('--runs', default="runs", help="каталог файлов прогона")
+    parser.add_argument('--layouts', help="компоновки станов из справочника через запятую")
+    parser.add_argument('--metrics-port', type=int, default=Config.METRICS_PORT,
+                        help="порт страницы метрик Prometheus (0 - без неё)")
+    parser.add_argument('--replay', help="повторять файл прогона (.rec) вместо расчёта")
+    args = parser.parse_args(argv)
+
+    layouts = args.layouts.split(',') if args.layouts else None
+    if layouts and len(layouts) != args.mills:
+        parser.error("--layouts: по одной компоновке на стан")
+    host = MillHost(args.mills, args.ip, args.port, args.mode, args.speed, args.runs,
+                    layouts=layouts, metrics_port=args.metrics_port, replay=args.replay)
+    asyncio.run(host.run())
+
+
+if __name__ == "__main__":
+    main()
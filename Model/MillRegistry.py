@@ -0,0 +1,180 @@
+import json
+import os
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import Config
+
+# Разделы файла реестра (и значения колонки kind таблицы mill_registry)
+SECTIONS = ("grades", "roll_materials", "slab_materials", "layouts")
+
+
+@dataclass(frozen=True, slots=True)
+class Grade:
+    "Марка стали: коэффициенты сопротивления деформации и материал сляба (для трения)"
+    name: str
+    sigmaOD: float
+    a: float
+    b: float
+    c: float
+    material: str = 'Austenitic steel'
+    coefficients: tuple = field(init=False, repr=False)  # (sigmaOD, a, b, c) для DefResistance
+
+    def __post_init__(self):
+        object.__setattr__(self, 'coefficients', (self.sigmaOD, self.a, self.b, self.c))
+
+
+@dataclass(frozen=True, slots=True)
+class Material:
+    "Материал валков или сляба: множитель коэффициента трения (k1 или k3 в FricCoef)"
+    name: str
+    friction: float
+
+
+@dataclass(frozen=True, slots=True)
+class MillLayout:
+    "Геометрия и настройки стана (мм, мм/с, °C)"
+    name: str
+    DR: float  # Диаметр рольгангов
+    d1: float  # Путь до валков
+    d2: float  # Путь после валков
+    d: float  # Расстояние между левыми и правыми рольгангами
+    VS: float  # Скорость выставления валков
+    LeftStopCap: float  # Положение левого концевика
+    RightStopCap: float  # Положение правого концевика
+    TempV: float = 28  # Температура валков
+    StartS: float = 350  # Начальный раствор валков
+    roll_axis: float = field(init=False)  # Координата оси валков
+    exit_position: float = field(init=False)  # Граница дохода сляба после валков
+
+    def __post_init__(self):
+        object.__setattr__(self, 'roll_axis', self.d1 + self.d / 2)
+        object.__setattr__(self, 'exit_position', self.d / 2 + self.d2)
+
+
+class MillRegistry:
+    """
+    Справочник марок стали, материалов валков и сляба и компоновок стана.
+    Записи неизменяемы, производные величины считаются при загрузке, поэтому
+    расчёт проходов обращается к готовым объектам без разбора строк.
+    """
+
+    def __init__(self, grades, roll_materials, slab_materials, layouts, default_layout=None,
+                 source=None):
+        self.grades = MappingProxyType(dict(grades))
+        self.roll_materials = MappingProxyType(dict(roll_materials))
+        self.slab_materials = MappingProxyType(dict(slab_materials))
+        self.layouts = MappingProxyType(dict(layouts))
+        self.default_layout = default_layout or next(iter(self.layouts), None)
+        self.source = source
+        for grade in self.grades.values():
+            self.slab_material(grade.material)
+
+    @classmethod
+    def from_dict(cls, data: dict, source=None) -> "MillRegistry":
+        "Реестр из словаря формата mill_registry.json"
+        return cls(
+            grades={name: Grade(name, **params) for name, params in data["grades"].items()},
+            roll_materials={name: Material(name, **params)
+                            for name, params in data["roll_materials"].items()},
+            slab_materials={name: Material(name, **params)
+                            for name, params in data["slab_materials"].items()},
+            layouts={name: MillLayout(name, **params) for name, params in data["layouts"].items()},
+            default_layout=data.get("default_layout"),
+            source=source,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "MillRegistry":
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f), source=path)
+
+    @classmethod
+    def from_rows(cls, rows, source="db") -> "MillRegistry":
+        "Реестр из строк таблицы mill_registry (kind, name, params)"
+        data = {section: {} for section in SECTIONS}
+        default_layout = None
+        for row in rows:
+            params = row['params']
+            if isinstance(params, str):
+                params = json.loads(params)
+            params = dict(params)
+            if row['kind'] == "layouts" and params.pop("default", False):
+                default_layout = row['name']
+            data[row['kind']][row['name']] = params
+        data["default_layout"] = default_layout
+        return cls.from_dict(data, source=source)
+
+    def _get(self, table, kind, name):
+        try:
+            return table[name]
+        except KeyError:
+            raise KeyError(f"{kind} '{name}' нет в реестре ({self.source})") from None
+
+    def grade(self, name) -> Grade:
+        return self._get(self.grades, "Марки стали", name)
+
+    def roll_material(self, name) -> Material:
+        return self._get(self.roll_materials, "Материала валков", name)
+
+    def slab_material(self, name) -> Material:
+        return self._get(self.slab_materials, "Материала сляба", name)
+
+    def layout(self, name=None) -> MillLayout:
+        return self._get(self.layouts, "Компоновки стана", name or self.default_layout)
+
+
+# ===================== Текущий реестр =====================
+# Загружается один раз из Config.REGISTRY_FILE; reload_if_changed() перечитывает
+# файл, если он изменился (сервер вызывает её перед каждой новой заготовкой).
+
+_current: MillRegistry | None = None
+_stamp = None
+
+
+def current() -> MillRegistry:
+    if _current is None:
+        reload_if_changed()
+    return _current
+
+
+def install(registry: MillRegistry):
+    "Сделать registry текущим (например, реестр из таблицы mill_registry)"
+    global _current, _stamp
+    _current = registry
+    _stamp = None
+
+
+def reload_if_changed(path: str = Config.REGISTRY_FILE) -> bool:
+    """
+    Перечитывает файл реестра, если изменились его mtime/размер. Ошибка в новом файле
+    оставляет прежний реестр (без прежнего - исключение). True - реестр заменён.
+    """
+    global _current, _stamp
+    try:
+        stat = os.stat(path)
+        stamp = (path, stat.st_mtime_ns, stat.st_size)
+        if stamp == _stamp and _current is not None:
+            return False
+        registry = MillRegistry.load(path)
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        if _current is None:
+            raise
+        print(f"Реестр {path} не перечитан: {exc!r}")
+        return False
+    _current = registry
+    _stamp = stamp
+    return True
+
+
+def resolve_grade(grade) -> Grade:
+    "Марка по имени из текущего реестра (объект Grade возвращается как есть)"
+    return grade if isinstance(grade, Grade) else current().grade(grade)
+
+
+def resolve_roll_material(material) -> Material:
+    return material if isinstance(material, Material) else current().roll_material(material)
+
+
+def resolve_slab_material(material) -> Material:
+    return material if isinstance(material, Material) else current().slab_material(material)
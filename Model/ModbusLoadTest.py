@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.exceptions import ModbusException
+from pymodbus.server import ModbusTcpServer
+
+from Metrics import LoopLagMonitor
+from RegisterFrames import FRAME_ADDRESS, FRAME_WORDS
+from ScaleTest import SLAB, MAX_OVERRUN_RATIO, MIN_RATE_RATIO, plc
+from Server import AsyncModbusServer
+
+# Опрос клиента SCADA: holding-регистры 1..33 (адрес Modbus 0) одним запросом
+POLL_ADDRESS = 0
+POLL_COUNT = 33
+# Кадр шага в ответе опроса
+FRAME_SLICE = slice(FRAME_ADDRESS - 1 - POLL_ADDRESS, FRAME_ADDRESS - 1 - POLL_ADDRESS + FRAME_WORDS)
+
+# Таймаут ответа (с); повторов нет - каждый сбой виден в отчёте
+REQUEST_TIMEOUT = 1.0
+
+PERCENTILES = (50, 90, 99)
+
+# Порог прохождения: разброс опоздания шагов публикации (СКО, с)
+MAX_JITTER = 0.005
+
+
+class FrameWatch:
+    """
+    Все состояния кадра шага (регистры FRAME_ADDRESS..), в которых он побывал после
+    каждой записи сервера. Кадр из ответа клиенту, которого нет среди них, - рваный:
+    клиент прочитал регистры посреди обновления.
+    """
+
+    def __init__(self, block):
+        self.block = block
+        self.frames = set()
+        self._set_values = block.setValues
+        block.setValues = self._record
+        self._snapshot()
+
+    def _snapshot(self):
+        self.frames.add(tuple(self.block.getValues(FRAME_ADDRESS, FRAME_WORDS)))
+
+    def _record(self, address, values):
+        self._set_values(address, values)
+        if address < FRAME_ADDRESS + FRAME_WORDS and address + len(values) > FRAME_ADDRESS:
+            self._snapshot()
+
+    def torn(self, frames: Counter) -> int:
+        "Число прочитанных кадров, которых сервер не публиковал"
+        return sum(count for frame, count in frames.items() if frame not in self.frames)
+
+
+# ===================== Клиенты (дочерний процесс) =====================
+
+async def _poll(client, period, offset, state):
+    "Опрос одного клиента по графику: запрос раз в period с (0 - подряд), пропуская опоздания"
+    deadline = time.perf_counter() + offset
+    while not state["stopped"]:
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        measuring = state["measuring"]
+        started = time.perf_counter()
+        try:
+            response = await client.read_holding_registers(POLL_ADDRESS, POLL_COUNT, slave=1)
+            failed = response.isError()
+        except (ModbusException, asyncio.TimeoutError, ConnectionError):
+            failed = True
+        if measuring:
+            if failed:
+                state["errors"] += 1
+            else:
+                state["latency"].append(time.perf_counter() - started)
+                state["frames"][tuple(response.registers[FRAME_SLICE])] += 1
+        deadline = max(deadline + period, time.perf_counter()) if period else time.perf_counter()
+
+
+async def _clients(port, count, rate, warmup, duration, conn):
+    state = {"stopped": False, "measuring": False, "errors": 0, "latency": [], "frames": Counter()}
+    clients = [AsyncModbusTcpClient("127.0.0.1", port=port, timeout=REQUEST_TIMEOUT, retries=0)
+               for _ in range(count)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    connected = sum(client.connected for client in clients)
+    period = 1.0 / rate if rate > 0 else 0.0
+    # Клиенты равномерно разнесены по периоду опроса
+    tasks = [asyncio.create_task(_poll(client, period, period * i / count, state))
+             for i, client in enumerate(clients)]
+
+    await asyncio.sleep(warmup)
+    state["measuring"] = True
+    conn.send(("start",))
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    state["measuring"] = False
+    wall = time.perf_counter() - started
+
+    state["stopped"] = True
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for client in clients:
+        client.close()
+    conn.send(("result", {
+        "connected": connected,
+        "wall": wall,
+        "errors": state["errors"],
+        "latency": np.array(state["latency"]),
+        "frames": state["frames"],
+    }))
+
+
+def _client_process(port, count, rate, warmup, duration, conn):
+    asyncio.run(_clients(port, count, rate, warmup, duration, conn))
+
+
+# ===================== Сервер и прогон =====================
+
+async def run_trial(count: int, rate: float, duration: float, warmup: float, speed: float) -> dict:
+    """
+    Один стан под нагрузкой count клиентов, опрашивающих регистры 1..33 с частотой rate
+    (0 - без пауз), пока имитатор ПЛК ведёт проходы. Клиенты - в отдельном процессе.
+    """
+    mill = AsyncModbusServer(runs_dir="runs", speed=speed, seed=0, name="load")
+    watch = FrameWatch(mill.hr_data_combined)
+    await mill.start_slab(SLAB)
+    tcp = ModbusTcpServer(mill.context, address=("127.0.0.1", 0))
+    stopped = asyncio.Event()
+    lag = LoopLagMonitor()
+    tasks = [asyncio.create_task(tcp.serve_forever()),
+             asyncio.create_task(mill.monitor_registers()),
+             asyncio.create_task(plc(mill, stopped))]
+    process = None
+    try:
+        while tcp.transport is None:
+            await asyncio.sleep(0.01)
+        port = tcp.transport.sockets[0].getsockname()[1]
+
+        parent, child = multiprocessing.get_context("spawn").Pipe()
+        process = multiprocessing.get_context("spawn").Process(
+            target=_client_process, args=(port, count, rate, warmup, duration, child), daemon=True)
+        process.start()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, parent.recv)  # Клиенты подключились и разогрелись
+        mill.pacer.reset_stats()
+        lag.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        _, clients = await loop.run_in_executor(None, parent.recv)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        stats = mill.pacer.stats()
+        lag_stats = lag.lag.stats()
+    finally:
+        await lag.stop()
+        stopped.set()
+        mill.stop_monitoring = True
+        await tcp.shutdown()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await mill.close()
+        if process is not None:
+            process.join(5)
+
+    latency = clients["latency"]
+    requests = len(latency) + clients["errors"]
+    expected = count * rate * clients["wall"]
+    result = {
+        "clients": count,
+        "connected": clients["connected"],
+        "requests_per_s": len(latency) / clients["wall"],
+        "rate_ratio": requests / expected if expected else 1.0,
+        "errors": clients["errors"],
+        "torn": watch.torn(clients["frames"]),
+        "latency_ms": {p: 1000 * float(np.percentile(latency, p)) if len(latency) else 0.0
+                       for p in PERCENTILES},
+        "latency_max_ms": 1000 * float(latency.max()) if len(latency) else 0.0,
+        "steps": stats["steps"],
+        "overrun_ratio": stats["overruns"] / stats["steps"] if stats["steps"] else 1.0,
+        "jitter_ms": 1000 * stats["jitter"],
+        "max_lateness_ms": 1000 * stats["max_lateness"],
+        "loop_lag_max_ms": 1000 * lag_stats["max"],
+        "cpu": cpu / wall,
+    }
+    result["ok"] = (result["connected"] == count and not result["errors"] and not result["torn"]
+                    and result["overrun_ratio"] <= MAX_OVERRUN_RATIO
+                    and stats["jitter"] <= MAX_JITTER
+                    and result["rate_ratio"] >= MIN_RATE_RATIO)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Нагрузка клиентами SCADA: сколько опрашивающих клиентов держит один стан")
+    parser.add_argument('--clients', help="числа клиентов через запятую (по умолчанию 1, 2, 4, ... до отказа)")
+    parser.add_argument('--max', type=int, default=256, help="наибольшее число клиентов при удвоении")
+    parser.add_argument('--rate', type=float, default=10.0, help="опросов в секунду на клиента (0 - без пауз)")
+    parser.add_argument('--duration', type=float, default=20.0, help="длительность замера, с")
+    parser.add_argument('--warmup', type=float, default=3.0, help="разгон перед замером, с")
+    parser.add_argument('--speed', type=float, default=1.0, help="ускорение времени стана")
+    args = parser.parse_args(argv)
+
+    counts = [int(c) for c in args.clients.split(',')] if args.clients else None
+    header = "".join(f"{'p' + str(p) + ' мс':>9}" for p in PERCENTILES)
+    print(f"{'клиент.':>7} {'запр/с':>9} {'темп':>6}{header} {'макс.мс':>8} {'ошиб.':>6} "
+          f"{'рваных':>6} {'шагов':>6} {'опозд.':>7} {'джиттер':>8} {'лаг мс':>7} {'CPU':>5}")
+    best = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # Файл прогона и Excel-лог стана - во временном каталоге
+        try:
+            count = 1
+            while True:
+                if counts is not None:
+                    if not counts:
+                        break
+                    count = counts.pop(0)
+                r = asyncio.run(run_trial(count, args.rate, args.duration, args.warmup, args.speed))
+                percentiles = "".join(f"{r['latency_ms'][p]:>9.2f}" for p in PERCENTILES)
+                print(f"{r['clients']:>7} {r['requests_per_s']:>9.1f} {r['rate_ratio']:>6.1%}{percentiles} "
+                      f"{r['latency_max_ms']:>8.1f} {r['errors']:>6} {r['torn']:>6} {r['steps']:>6} "
+                      f"{r['overrun_ratio']:>7.2%} {r['jitter_ms']:>8.2f} {r['loop_lag_max_ms']:>7.1f} "
+                      f"{r['cpu']:>5.0%}  {'ok' if r['ok'] else 'FAIL'}")
+                if r["ok"]:
+                    best = max(best, count)
+                elif counts is None:
+                    break
+                if counts is None:
+                    if count >= args.max:
+                        break
+                    count = min(count * 2, args.max)
+        finally:
+            os.chdir(cwd)
+    print(f"Клиентов с опросом {args.rate:g} Гц без джиттера публикации (x{args.speed:g}): {best}")
+
+
+if __name__ == "__main__":
+    main()
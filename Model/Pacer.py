@@ -0,0 +1,95 @@
+import asyncio
+import math
+import time
+
+
+class Pacer:
+    """
+    Выдача шагов по монотонным дедлайнам: шаг N публикуется в t0 + N * dt / speed,
+    поэтому время на расчёт и запись шага не накапливается в отставание.
+    speed - ускорение относительно реального времени (1 - пусконаладка,
+    10/100 - прогоны против ПЛК); speed <= 0 - без пауз, только уступка циклу событий.
+    Опоздавший шаг выдаётся сразу (график догоняется); опоздание больше периода
+    считается перегрузкой, а при отставании больше max_lag периодов график
+    сдвигается на текущий момент.
+    """
+
+    def __init__(self, dt=0.1, speed=1.0, max_lag=10):
+        self.dt = dt
+        self.max_lag = max_lag
+        self.set_speed(speed)
+        self._t0 = None
+        self._n = 0
+        self.reset_stats()
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.period = self.dt / speed if speed and speed > 0 else 0.0
+
+    def restart(self):
+        "Новый график: следующий шаг выдаётся сразу и становится шагом 0"
+        self._t0 = None
+        self._n = 0
+
+    def begin(self):
+        """
+        Начало последовательности шагов (фазы). Если следующий дедлайн текущего графика
+        ещё впереди (фаза продолжает предыдущую), график сохраняется, иначе начинается новый.
+        """
+        if self._t0 is None or self._t0 + self._n * self.period < time.monotonic():
+            self.restart()
+
+    def reset_stats(self):
+        self.steps = 0
+        self.overruns = 0
+        self.resyncs = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self._lateness_sum = 0.0
+        self._lateness_sq = 0.0
+
+    async def tick(self):
+        "Дождаться дедлайна очередного шага"
+        if self.period <= 0:
+            self.steps += 1
+            await asyncio.sleep(0)
+            return
+
+        now = time.monotonic()
+        if self._t0 is None:
+            self._t0 = now
+        deadline = self._t0 + self._n * self.period
+        if deadline > now:
+            await asyncio.sleep(deadline - now)
+            now = time.monotonic()
+
+        lateness = now - deadline
+        if lateness > self.period:
+            self.overruns += 1
+            if lateness > self.max_lag * self.period:
+                # Безнадёжное отставание (например, пауза процесса): график от текущего момента
+                self._t0 = now
+                self._n = 0
+                self.resyncs += 1
+        self._n += 1
+        self.steps += 1
+        self.last_lateness = lateness
+        self._lateness_sum += lateness
+        self._lateness_sq += lateness * lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+
+    def stats(self) -> dict:
+        "Счётчики выдачи шагов; опоздания в секундах, jitter - их СКО"
+        mean = self._lateness_sum / self.steps if self.steps else 0.0
+        variance = self._lateness_sq / self.steps - mean * mean if self.steps else 0.0
+        return {
+            "speed": self.speed,
+            "steps": self.steps,
+            "overruns": self.overruns,
+            "resyncs": self.resyncs,
+            "last_lateness": self.last_lateness,
+            "mean_lateness": mean,
+            "max_lateness": self.max_lateness,
+            "jitter": math.sqrt(max(variance, 0.0)),
+        }
@@ -0,0 +1,229 @@
+import argparse
+import json
+
+import numpy as np
+
+import MillRegistry
+import RollingMillArrays as rma
+
+
+class MillLimits:
+    """
+    Ограничения стана для графика проходов. Единицы - как в журнале симулятора:
+    усилие (кН), момент (кН*м), мощность (кВт); температура (°C), обжатие (мм).
+    """
+
+    def __init__(self, max_effort=4000.0, max_moment=250.0, max_power=60.0,
+                 min_temp=850.0, min_reduction=1.0, max_reduction=60.0):
+        self.max_effort = max_effort
+        self.max_moment = max_moment
+        self.max_power = max_power
+        self.min_temp = min_temp
+        self.min_reduction = min_reduction
+        self.max_reduction = max_reduction
+
+
+# ===================== Оптимизатор =====================
+
+class PassScheduleOptimizer:
+    """
+    Подбор графика проходов (раствор и скорость валков на каждый проход) от начальной
+    толщины сляба до целевой. Поиск - динамическое программирование по проходам:
+    на каждом проходе все сочетания "состояние x обжатие x скорость" оцениваются одним
+    пакетом NumPy, недопустимые (захват, усилие, момент, мощность, температура)
+    отбрасываются, и из допустимых остаются:
+    objective='passes' - по одному состоянию на толщину и интервал температуры temp_step
+    (поиск в ширину: первый проход, достигший цели, даёт наименьшее число проходов);
+    горячее сляб не всегда лучше - коэффициент трения у него ниже, а предельное по
+    захвату обжатие меньше, поэтому более холодные состояния не отбрасываются;
+    objective='energy' - лучшее по суммарной энергии прокатки на каждую толщину.
+    """
+
+    def __init__(self, limits: MillLimits | None = None, speeds=None, reduction_step=1.0,
+                 interpass_time=15.0, max_passes=30, MS=None, temp_step=5.0):
+        self.limits = limits or MillLimits()
+        self.speeds = np.asarray(speeds if speeds is not None else np.arange(50, 401, 25), dtype=float)
+        self.reduction_step = reduction_step
+        self.interpass_time = interpass_time  # Пауза между проходами (реверс, разгон, подход), с
+        self.max_passes = max_passes
+        self.MS = MS  # Материал сляба; None - материал марки из реестра
+        self.temp_step = temp_step  # Интервал температуры состояний для objective='passes', °C
+
+    def evaluate(self, h_0, h_1, V, T_in, b, DV, grade, MV, MS=None):
+        """
+        Параметры прохода h_0 -> h_1 при скорости валков V и температуре на входе T_in
+        (массивы с broadcasting): словарь RollingMillArrays.rolling_pass.
+        """
+        return rma.rolling_pass(h_0, h_1, V, T_in, b, DV, grade, MV, MS or self.MS)
+
+    def optimize(self, slab: dict, target: float, objective='passes') -> dict:
+        """
+        График для заготовки slab (колонки slabs: thikness_slab, width_slab, length_slab,
+        temperature_slab, material_slab, diametr_roll, material_roll) до толщины target.
+        Возвращает {"passes": [...], "energy": ..., "final_temperature": ...};
+        проходы совместимы с графиками BatchRunner. ValueError - допустимого графика нет.
+        """
+        if objective not in ('passes', 'energy'):
+            raise ValueError(f"Неизвестная цель оптимизации: {objective}")
+        lim = self.limits
+        grade = MillRegistry.resolve_grade((slab['material_slab'] or "").replace(' ', ''))
+        MV = MillRegistry.resolve_roll_material(slab['material_roll'])
+        MS = MillRegistry.resolve_slab_material(self.MS or grade.material)
+        h0 = float(slab['thikness_slab'])
+        b = float(slab['width_slab'])
+        DV = float(slab['diametr_roll'])
+        target = float(target)
+        if not 0 < target < h0:
+            raise ValueError("Целевая толщина должна быть меньше начальной")
+
+        reductions = np.arange(lim.min_reduction, lim.max_reduction + 1e-9, self.reduction_step)
+        speeds = self.speeds
+        # Состояния слоя: толщина, температура, длина, энергия; history - ссылки на родителей
+        H = np.array([h0])
+        T = np.array([float(slab['temperature_slab'])])
+        L = np.array([float(slab['length_slab'])])
+        E = np.zeros(1)
+        history = []
+        best = None
+
+        for k in range(self.max_passes):
+            T_in = T - rma.TempDrBPass(T, self.interpass_time, b, H)
+            # Обжатия сверх предельного по захвату (при наибольшем коэффициенте трения слоя) не оцениваются
+            Mu = rma.FricCoef(MV, MS, rma.SpeedOfRolling(DV, speeds[0]), T_in.min())
+            dh = reductions[reductions <= DV * (1 - np.cos(np.arctan(Mu)))]
+            if dh.size == 0:
+                break
+            H1 = np.maximum(H[:, None, None] - dh[None, :, None], target)
+            V = speeds[None, None, :]
+            h_0 = H[:, None, None]
+            m = self.evaluate(h_0, H1, V, T_in[:, None, None], b, DV, grade, MV, MS)
+            energy = E[:, None, None] + m["power"] * (L[:, None, None] / V)
+            # Отрицательный момент (плечо psi < 0 при длинной дуге контакта) - вне области модели
+            ok = ((H1 < h_0) & m["bite"] & (m["moment"] > 0)
+                  & (m["effort"] <= lim.max_effort) & (m["moment"] <= lim.max_moment)
+                  & (m["power"] <= lim.max_power) & (m["temp"] >= lim.min_temp))
+            if objective == 'passes':
+                parent, r_i, v_i = self._front(ok, H1, m["temp"])
+            else:
+                parent, r_i, v_i = self._cheapest(np.where(ok, energy, np.inf), H1)
+            if parent.size == 0:
+                break
+
+            H = H1[parent, r_i, 0]
+            T = m["temp"][parent, r_i, v_i]
+            L = L[parent] * h_0[parent, 0, 0] / H
+            E = energy[parent, r_i, v_i]
+            history.append({
+                "parent": parent, "speed": speeds[v_i], "gap": H, "temp": T, "energy": E,
+                "effort": m["effort"][parent, r_i, v_i], "moment": m["moment"][parent, r_i, v_i],
+                "power": m["power"][parent, r_i, v_i],
+            })
+
+            done = np.flatnonzero(H <= target)
+            if done.size:
+                j = done[E[done].argmin()]
+                if best is None or E[j] < best[2]:
+                    best = (k, j, E[j])
+                if objective == 'passes':
+                    break
+            # Достигшие цели дальше не катаются; энергия только растёт, поэтому
+            # состояния не дешевле найденного графика тоже отбрасываются
+            keep = H > target
+            if best is not None:
+                keep &= E < best[2]
+            if not keep.any():
+                break
+            history[-1]["alive"] = np.flatnonzero(keep)
+            H, T, L, E = H[keep], T[keep], L[keep], E[keep]
+
+        if best is None:
+            raise ValueError("Нет графика проходов, удовлетворяющего ограничениям стана")
+        return self._schedule(history, *best)
+
+    def _front(self, ok, H1, temp):
+        """
+        Допустимые переходы "состояние x обжатие x скорость", по одному на толщину и
+        интервал температуры (в интервале - самый горячий)
+        """
+        idx = np.flatnonzero(ok)
+        temp = np.broadcast_to(temp, ok.shape).ravel()[idx]
+        keys = np.round(np.broadcast_to(H1, ok.shape).ravel()[idx] / self.reduction_step).astype(np.int64)
+        buckets = np.floor(temp / self.temp_step).astype(np.int64)
+        order = np.lexsort((-temp, buckets, keys))
+        pairs = np.stack((keys[order], buckets[order]), axis=1)
+        _, first = np.unique(pairs, axis=0, return_index=True)
+        return np.unravel_index(idx[order[first]], ok.shape)
+
+    def _cheapest(self, score, H1):
+        """
+        Дешевейший по энергии переход на каждую толщину; более толстые состояния, не
+        дешевле более тонкого, отбрасываются
+        """
+        # Лучшая скорость для каждой пары "состояние x обжатие"
+        v_best = score.argmin(axis=2)
+        score = np.take_along_axis(score, v_best[..., None], axis=2)[..., 0]
+        idx = np.flatnonzero(np.isfinite(score))
+        score = score.ravel()[idx]
+        keys = np.round(H1[..., 0].ravel()[idx] / self.reduction_step).astype(np.int64)
+        order = np.lexsort((score, keys))
+        _, first = np.unique(keys[order], return_index=True)
+        chosen = idx[order[first]]
+        kept = score[order[first]]
+        chosen = chosen[kept < np.minimum.accumulate(np.concatenate(([np.inf], kept[:-1])))]
+        parent, r_i = np.unravel_index(chosen, v_best.shape)
+        return parent, r_i, v_best[parent, r_i]
+
+    @staticmethod
+    def _schedule(history, last, j, energy):
+        "Восстановление графика по ссылкам на родителей"
+        passes = []
+        for k in range(last, -1, -1):
+            layer = history[k]
+            passes.append({
+                "gap": round(float(layer["gap"][j]), 2),
+                "speed": float(layer["speed"][j]),
+                "effort": round(float(layer["effort"][j]), 1),
+                "moment": round(float(layer["moment"][j]), 2),
+                "power": round(float(layer["power"][j]), 2),
+                "temp": round(float(layer["temp"][j]), 1),
+            })
+            j = layer["parent"][j]
+            if k > 0:
+                # Родитель - индекс среди продолжающих состояний предыдущего прохода
+                j = history[k - 1]["alive"][j]
+        passes.reverse()
+        for i, step in enumerate(passes):
+            step.update(v0=step["speed"], v1=step["speed"], dir=i % 2)
+        return {
+            "passes": passes,
+            "energy": round(float(energy), 1),
+            "final_temperature": passes[-1]["temp"],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Подбор графика проходов")
+    parser.add_argument('--grade', default='Ст3сп', help="марка стали")
+    parser.add_argument('--h0', type=float, required=True, help="начальная толщина, мм")
+    parser.add_argument('--target', type=float, required=True, help="целевая толщина, мм")
+    parser.add_argument('--width', type=float, default=250, help="ширина, мм")
+    parser.add_argument('--length', type=float, default=3000, help="длина, мм")
+    parser.add_argument('--temp', type=float, default=1200, help="температура выдачи из печи, °C")
+    parser.add_argument('--roll', type=float, default=300, help="диаметр валков, мм")
+    parser.add_argument('--objective', choices=('passes', 'energy'), default='passes')
+    parser.add_argument('--out', help="сохранить график (JSON, формат графиков BatchRunner)")
+    args = parser.parse_args()
+
+    slab = {
+        'thikness_slab': args.h0, 'width_slab': args.width, 'length_slab': args.length,
+        'temperature_slab': args.temp, 'material_slab': args.grade,
+        'diametr_roll': args.roll, 'material_roll': 'Сталь',
+    }
+    result = PassScheduleOptimizer().optimize(slab, args.target, args.objective)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result["passes"], f, ensure_ascii=False, indent=1)
+    for i, step in enumerate(result["passes"], 1):
+        print(f"{i:2d}: раствор {step['gap']:7.1f} мм, скорость {step['speed']:5.0f}, "
+              f"усилие {step['effort']:7.1f} кН, мощность {step['power']:6.2f} кВт, {step['temp']:6.1f} °C")
+    print(f"Энергия {result['energy']}, температура на выходе {result['final_temperature']} °C")
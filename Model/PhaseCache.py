@@ -0,0 +1,101 @@
+from collections import OrderedDict
+
+import numpy as np
+
+import Config
+
+# Кэш траекторий фаз без шумов. Фаза при одних и тех же входах (состояние на начало
+# фазы, уставки, параметры сляба и стана) рассчитывается одинаково, различаются только
+# шумы датчиков, которые накладываются при выдаче. Станы процесса делят общий кэш.
+
+# Шаг квантования входов ключа (мм, °C, мм/с): входы, совпадающие до KEY_DECIMALS
+# знаков, дают одну и ту же траекторию
+KEY_DECIMALS = 3
+
+
+def quantize(*values) -> tuple:
+    "Часть ключа кэша из чисел и массивов, округлённых до KEY_DECIMALS знаков"
+    key = []
+    for value in values:
+        if isinstance(value, np.ndarray):
+            key.append(np.round(value, KEY_DECIMALS).tobytes())
+        elif isinstance(value, float):
+            key.append(round(value, KEY_DECIMALS) + 0.0)  # -0.0 и 0.0 - один ключ
+        else:
+            key.append(value)
+    return tuple(key)
+
+
+class PhaseEntry:
+    """
+    Траектория фазы без шумов: блок [колонка, шаг] (время - от начала фазы),
+    операции наложения шумов PhaseKernels и расчётные величины фазы (values).
+    """
+
+    __slots__ = ("block", "ops", "values", "nbytes")
+
+    def __init__(self, block, ops, values=None):
+        self.block = block
+        self.ops = ops
+        self.values = values
+        self.nbytes = block.nbytes + sum(
+            item.nbytes for op in ops for item in op if isinstance(item, np.ndarray))
+
+
+class PhaseCache:
+    "LRU-кэш траекторий фаз, ограниченный суммарным размером массивов (байт)"
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        "Запись по ключу (None - промах); найденная становится самой свежей"
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry: PhaseEntry):
+        "Запись в кэш; самые давние записи вытесняются до укладывания в max_bytes"
+        if entry.nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self._entries[key] = entry
+        self.nbytes += entry.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Общий кэш процесса (None - кэш выключен)
+CACHE = PhaseCache(Config.PHASE_CACHE_MB * 2 ** 20) if Config.PHASE_CACHE_MB > 0 else None
@@ -0,0 +1,342 @@
+import numpy as np
+from TelemetryLog import (T, GAP, SPEED_V, TEMP, PYRO1, PYRO2, X, X1,
+                          SPEED_V0, SPEED_V1, LENGTH, EFFORT, MOMENT, POWER,
+                          LEFT_CAP, RIGHT_CAP, GAP_FB, SPEED_FB, TEMP_CORE, TEMP_SURF)
+
+# Векторные расчёты фаз прокатки: каждая функция строит всю фазу сразу в виде
+# блока [колонка, шаг] (колонки TelemetryLog) по последнему шагу журнала last.
+# Длина фазы - целое число шагов, вычисляемое заранее, а не сравнение float в цикле.
+# Температуры сляба фазы даёт cooling(n, unclamped) - средние, осевые и поверхностные
+# значения шагов 1..n (linear_cooling, constant_temperature или SlabThermal.cooling).
+# Функции фаз возвращают траекторию без шумов и операции шумов датчиков (ops);
+# add_noise накладывает их в том порядке, в котором значения выбираются из rng.
+
+PYRO1_POS = 2000  # Координата пирометра перед валками(мм)
+PYRO2_POS = 2700  # Координата пирометра после валков(мм)
+PARK_GAP = 350  # Раствор валков в исходном положении(мм)
+PYRO_NOISE = 0.07  # Разброс показаний пирометра вне сляба
+FORCE_NOISE = 0.03  # Разброс усилия, момента и мощности на шаге прокатки NOISE_DT
+NOISE_DT = 0.1  # Шаг, к которому отнесён FORCE_NOISE (блуждание не зависит от шага расчёта)
+
+# Операции шумов (вид, колонка, шаги, аргумент):
+# NOISE - показания пирометра вне сляба (аргумент - маска шагов с показанием по слябу или None),
+# WALK - случайное блуждание расчётного значения (аргумент - разброс шага),
+# HOLD - удержание показания (аргумент - индекс шага в блоке, -1 - последний шаг журнала)
+NOISE, WALK, HOLD = "noise", "walk", "hold"
+ALL = slice(None)
+
+
+def ticks_to(distance, per_tick) -> int:
+    "Количество шагов, за которое величина проходит distance, меняясь на per_tick за шаг"
+    if distance <= 0:
+        return 0
+    if per_tick <= 0:
+        raise ValueError("Изменение за шаг должно быть положительным")
+    return max(int(np.ceil(distance / per_tick - 1e-9)), 1)
+
+
+def ramp(start, target, per_tick, n=None):
+    "Линейный выход величины на уставку target (значения шагов 1..n, последнее - точно target)"
+    dist = abs(target - start)
+    reach = ticks_to(dist, per_tick) if dist > 0 else 0
+    if n is None:
+        n = reach
+    k = np.arange(1, n + 1, dtype=np.float64)
+    values = start + np.copysign(np.minimum(k * per_tick, dist), target - start)
+    values[max(reach, 1) - 1:] = target
+    return values
+
+
+def noise(rng, base, rel, n):
+    "Значения base с равномерным отклонением +- rel * base"
+    return base + rng.uniform(-base * rel, base * rel, n)
+
+
+def add_noise(block, ops, last, TempV, rng):
+    "Наложение шумов датчиков на траекторию фазы (на месте); возвращает блок"
+    for kind, col, steps, arg in ops:
+        if kind == NOISE:
+            values = noise(rng, TempV, PYRO_NOISE, block[col, steps].shape[0])
+            block[col, steps] = values if arg is None else np.where(arg, block[col, steps], values)
+        elif kind == WALK:
+            block[col, steps] *= np.cumprod(1 + rng.uniform(-arg, arg, block[col, steps].shape[0]))
+        else:
+            block[col, steps] = block[col, arg] if arg >= 0 else last[col]
+    return block
+
+
+def linear_cooling(temp0, per_tick, final_temp):
+    """
+    Равномерное линейное остывание от temp0 на per_tick за шаг, но не ниже final_temp.
+    Первые unclamped шагов остывают без ограничения, остальные - от последнего из них
+    (доход до концевика в exit_phase эмпирической модели).
+    """
+    def temps(n, unclamped=0):
+        free = temp0 - np.arange(1, unclamped + 1) * per_tick
+        start = free[-1] if unclamped else temp0
+        temp = np.concatenate(
+            (free, np.maximum(start - np.arange(1, n - unclamped + 1) * per_tick, final_temp)))
+        return temp, temp, temp
+    return temps
+
+
+def constant_temperature(temp):
+    "Неизменная равномерная температура"
+    def temps(n, unclamped=0):
+        values = np.full(n, temp, dtype=np.float64)
+        return values, values, values
+    return temps
+
+
+def _temperatures(block, cooling, unclamped=0):
+    "Температуры сляба в блок; возвращает температуры поверхности (показания пирометров)"
+    block[TEMP], block[TEMP_CORE], block[TEMP_SURF] = cooling(block.shape[1], unclamped)
+    return block[TEMP_SURF]
+
+
+def between(x, x1, pos):
+    "Флаг: точка pos находится под слябом [x, x1]"
+    return (x <= pos) & (x1 >= pos)
+
+
+def _block(last, n, dt):
+    """
+    Блок из n шагов, повторяющих last (неизменяемые величины), с продолжением времени.
+    Усилие, момент и мощность вне прохода через валки равны нулю.
+    """
+    block = np.empty((len(last), n))
+    block[:] = np.asarray(last, dtype=np.float64)[:, None]
+    block[T] = last[T] + np.arange(1, n + 1) * dt
+    block[EFFORT:POWER + 1] = 0
+    return block
+
+
+def _advance(head0, stop, direction, speed, dt):
+    """
+    Смещения сляба по шагам при движении переднего торца от head0 к упору stop
+    (direction = +1 / -1) со скоростями speed[k]. Обрезаются на шаге достижения упора.
+    """
+    if head0 == stop:
+        return np.empty(0)
+    shift = direction * np.cumsum(speed) * dt
+    reached = direction * (head0 + shift) >= direction * stop
+    if not reached.any():
+        raise ValueError("Сляб не доходит до упора: скорость должна быть положительной")
+    return shift[:int(np.argmax(reached)) + 1]
+
+
+def _clamp(values, limit, direction):
+    return np.minimum(values, limit) if direction > 0 else np.maximum(values, limit)
+
+
+def gap_phase(last, target, per_tick, cooling, dt):
+    "Выставление раствора валков"
+    gap = ramp(last[GAP], target, per_tick)
+    n = len(gap)
+    block = _block(last, n, dt)
+    block[GAP] = gap
+    block[SPEED_V] = 0
+    _temperatures(block, cooling)
+    block[GAP_FB] = gap == target
+    return block, [(NOISE, PYRO1, ALL, None), (NOISE, PYRO2, ALL, None)]
+
+
+def accel_phase(last, target, per_tick, cooling, dt):
+    "Разгон (или замедление) валков до заданной скорости"
+    speed = ramp(last[SPEED_V], target, per_tick)
+    n = len(speed)
+    block = _block(last, n, dt)
+    block[SPEED_V] = speed
+    block[SPEED_V0] = 0
+    block[SPEED_V1] = 0
+    _temperatures(block, cooling)
+    block[SPEED_FB][speed == target] = 1
+    return block, [(NOISE, PYRO1, ALL, None), (NOISE, PYRO2, ALL, None)]
+
+
+def approach_phase(last, Dir_of_rot, V0, V1, accel, stop, LeftStopCap, RightStopCap,
+                   cooling, dt):
+    """
+    Подход сляба к валкам с разгоном рольгангов. stop - упор переднего торца:
+    x1 при Dir_of_rot == 0, x при обратном направлении.
+    """
+    length = last[LENGTH]
+    direction = 1 if Dir_of_rot == 0 else -1
+    drive = V0 if Dir_of_rot == 0 else V1  # Рольганги, которые везут сляб
+    head0 = last[X1] if direction > 0 else last[X]
+    if drive <= 0 and head0 != stop:
+        raise ValueError("Скорость рольгангов должна быть положительной")
+    per_tick = accel * dt
+    n_max = ticks_to(drive, per_tick) + ticks_to(abs(stop - head0), drive * dt) + 1
+    k = np.arange(1, n_max + 1)
+    shift = _advance(head0, stop, direction, np.minimum(k * per_tick, drive), dt)
+    n = len(shift)
+    k = k[:n]
+
+    block = _block(last, n, dt)
+    surface = _temperatures(block, cooling)
+    block[SPEED_V0] = np.minimum(k * per_tick, V0)
+    block[SPEED_V1] = np.minimum(k * per_tick, V1)
+    if direction > 0:
+        x1 = _clamp(last[X1] + shift, stop, direction)
+        x = _clamp(last[X] + shift, stop - length, direction)
+        block[LEFT_CAP] = between(x, x1, LeftStopCap)
+        block[PYRO1] = surface
+        ops = [(NOISE, PYRO1, ALL, between(x, x1, PYRO1_POS)), (NOISE, PYRO2, ALL, None)]
+    else:
+        x = _clamp(last[X] + shift, stop, direction)
+        x1 = _clamp(last[X1] + shift, stop + length, direction)
+        block[RIGHT_CAP] = between(x, x1, RightStopCap)
+        block[PYRO2] = surface
+        ops = [(NOISE, PYRO2, ALL, between(x, x1, PYRO2_POS)), (NOISE, PYRO1, ALL, None)]
+    block[X] = x
+    block[X1] = x1
+    return block, ops
+
+
+def rolling_pass_phase(last, Dir_of_rot, rolls_pos, Length_coef, cooling, Effort, Moment, Power,
+                       LeftStopCap, RightStopCap, dt):
+    """
+    Проход сляба через валки (rolls_pos - координата валков).
+    Сначала передний торец доходит до валков, затем сляб вытягивается,
+    пока задний торец не выйдет из валков. Effort, Moment, Power - в Н, Н*м, Вт.
+    """
+    v = last[SPEED_V]
+    x_0, x1_0 = last[X], last[X1]
+    direction = 1 if Dir_of_rot == 0 else -1
+    head0 = x1_0 if direction > 0 else x_0
+    if v <= 0:
+        raise ValueError("Скорость валков должна быть положительной")
+    step = v * dt
+
+    # 1. Передний торец до валков
+    n_max = ticks_to(abs(rolls_pos - head0), step) + 1
+    shift = _advance(head0, rolls_pos, direction, np.full(n_max, v), dt)
+    if direction > 0:
+        xa = _clamp(x_0 + shift, rolls_pos - last[LENGTH], direction)
+        x1a = _clamp(x1_0 + shift, rolls_pos, direction)
+    else:
+        xa = _clamp(x_0 + shift, rolls_pos, direction)
+        x1a = _clamp(x1_0 + shift, rolls_pos + last[LENGTH], direction)
+    x_end = xa[-1] if len(xa) else x_0
+    x1_end = x1a[-1] if len(x1a) else x1_0
+
+    # 2. Вытяжка: выходящая часть движется быстрее в Length_coef раз
+    tail = (rolls_pos - x_end) if direction > 0 else (x1_end - rolls_pos)
+    n_b = int(np.floor(tail / step + 1e-9)) + 1 if tail >= 0 else 0
+    kb = np.arange(1, n_b + 1)
+    if direction > 0:
+        xb = x_end + kb * step
+        x1b = x1_end + kb * step * Length_coef
+    else:
+        xb = x_end - kb * step * Length_coef
+        x1b = x1_end - kb * step
+
+    x = np.concatenate((xa, xb))
+    x1 = np.concatenate((x1a, x1b))
+    n = len(x)
+    block = _block(last, n, dt)
+    block[X] = x
+    block[X1] = x1
+    block[LENGTH] = x1 - x
+    block[PYRO1] = block[PYRO2] = _temperatures(block, cooling)
+    # Случайное блуждание усилия, момента и мощности вокруг расчётных значений;
+    # разброс шага масштабируется по sqrt(dt), дисперсия за секунду от шага не зависит
+    rel = FORCE_NOISE * np.sqrt(dt / NOISE_DT)
+    block[EFFORT] = Effort / 1000
+    block[MOMENT] = Moment / 1000
+    block[POWER] = Power / 1000
+    if direction > 0:
+        on_pyro2 = between(x, x1, PYRO2_POS)
+    else:
+        on_pyro2 = (x1 <= PYRO2_POS) & (x >= PYRO2_POS)
+    block[RIGHT_CAP] = between(x, x1, RightStopCap)
+    block[LEFT_CAP] = between(x, x1, LeftStopCap)
+    return block, [(WALK, EFFORT, ALL, rel), (WALK, MOMENT, ALL, rel), (WALK, POWER, ALL, rel),
+                   (NOISE, PYRO2, ALL, on_pyro2), (NOISE, PYRO1, ALL, x <= PYRO1_POS)]
+
+
+def exit_phase(last, Dir_of_rot, accel, V_Valk_Per, LeftStopCap, RightStopCap,
+               cooling, dt):
+    """
+    Доход сляба до концевика и замедление валков и рольгангов до остановки.
+    В обратном направлении сляб везут рольганги V0, на торможении - по V1.
+    """
+    length = last[LENGTH]
+    direction = 1 if Dir_of_rot == 0 else -1
+
+    # 1. Доход до концевика
+    if direction > 0:
+        stop, head0, v = RightStopCap, last[X1], last[SPEED_V1]
+    else:
+        stop, head0, v = LeftStopCap, last[X], last[SPEED_V0]
+    if v <= 0 and head0 != stop:
+        raise ValueError("Скорость рольгангов должна быть положительной")
+    n_max = ticks_to(abs(stop - head0), v * dt) + 1 if head0 != stop else 0
+    shift = _advance(head0, stop, direction, np.full(n_max, v), dt)
+    n1 = len(shift)
+    if direction > 0:
+        x1a = _clamp(last[X1] + shift, stop, direction)
+        xa = _clamp(last[X] + shift, stop - length, direction)
+    else:
+        xa = _clamp(last[X] + shift, stop, direction)
+        x1a = _clamp(last[X1] + shift, stop + length, direction)
+    x_end = xa[-1] if n1 else last[X]
+    x1_end = x1a[-1] if n1 else last[X1]
+
+    # 2. Замедление до 0; сляб смещается со скоростью V1 предыдущего шага
+    per_tick = accel * dt
+    n2 = max(ticks_to(last[SPEED_V], per_tick), ticks_to(last[SPEED_V0], per_tick),
+             ticks_to(last[SPEED_V1], per_tick))
+    speed = ramp(last[SPEED_V], 0, per_tick, n2)
+    V0 = ramp(last[SPEED_V0], 0, per_tick, n2)
+    V1 = ramp(last[SPEED_V1], 0, per_tick, n2)
+    shift_b = direction * np.cumsum(np.concatenate(([last[SPEED_V1]], V1[:-1]))[:n2]) * dt
+    xb = x_end + shift_b
+    x1b = x1_end + shift_b
+    prev_x = np.concatenate(([x_end], xb[:-1]))
+    prev_x1 = np.concatenate(([x1_end], x1b[:-1]))
+    speed_flag = (speed == 0).astype(np.float64)
+    hold = (speed == V_Valk_Per) & (speed != 0)  # На уставке флаг не меняется
+    if hold.any():
+        i = int(np.argmax(hold))
+        speed_flag[i] = speed_flag[i - 1] if i else last[SPEED_FB]
+
+    a, b = slice(0, n1), slice(n1, n1 + n2)
+    block = _block(last, n1 + n2, dt)
+    # Пока сляб идёт до концевика, температура не ограничивается final_temp
+    block[PYRO1] = block[PYRO2] = _temperatures(block, cooling, n1)
+    hold = n1 - 1 if n1 else -1  # Показание, удерживаемое на торможении
+    block[X, a], block[X1, a] = xa, x1a
+    block[X, b], block[X1, b] = xb, x1b
+    block[SPEED_V, b], block[SPEED_V0, b], block[SPEED_V1, b] = speed, V0, V1
+    block[SPEED_FB, b] = speed_flag
+    if direction > 0:
+        block[RIGHT_CAP, a] = between(xa, x1a, stop)
+        block[RIGHT_CAP, b] = between(xb, x1b, RightStopCap)
+        ops = [(NOISE, PYRO1, a, None), (NOISE, PYRO2, a, between(xa, x1a, PYRO2_POS)),
+               (HOLD, PYRO1, b, hold), (NOISE, PYRO2, b, between(prev_x, prev_x1, PYRO2_POS))]
+    else:
+        block[LEFT_CAP, a] = (xa < stop) & (x1a > stop)
+        block[LEFT_CAP, b] = between(xb, x1b, LeftStopCap)
+        ops = [(NOISE, PYRO2, a, None), (NOISE, PYRO1, a, between(xa, x1a, PYRO1_POS)),
+               (HOLD, PYRO2, b, hold), (NOISE, PYRO1, b, between(prev_x, prev_x1, PYRO1_POS))]
+    return block, ops
+
+
+def alarm_phase(last, accel, gap_per_tick, TempV, dt):
+    "Аварийная остановка: торможение до 0 и отвод валков в исходное положение (без шумов)"
+    per_tick = accel * dt
+    n = max(ticks_to(last[SPEED_V], per_tick), ticks_to(last[SPEED_V0], per_tick),
+            ticks_to(last[SPEED_V1], per_tick), ticks_to(abs(last[GAP] - PARK_GAP), gap_per_tick))
+    block = _block(last, n, dt)
+    gap = ramp(last[GAP], PARK_GAP, gap_per_tick, n)  # Раствор меняется на gap_per_tick за шаг
+    block[GAP] = gap
+    block[SPEED_V] = ramp(last[SPEED_V], 0, per_tick, n)
+    block[SPEED_V0] = ramp(last[SPEED_V0], 0, per_tick, n)
+    block[SPEED_V1] = ramp(last[SPEED_V1], 0, per_tick, n)
+    block[PYRO1] = TempV
+    block[PYRO2] = TempV
+    block[GAP_FB] = gap == PARK_GAP
+    block[SPEED_FB] = 0
+    return block, []
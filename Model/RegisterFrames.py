@@ -0,0 +1,83 @@
+import struct
+
+import numpy as np
+
+from TelemetryLog import (round_block, T, PYRO1, PYRO2, EFFORT, GAP, SPEED_V, SPEED_V0,
+                          SPEED_V1, MOMENT, POWER, LEFT_CAP, RIGHT_CAP, GAP_FB, SPEED_FB)
+
+# Колонки журнала, публикуемые в регистры 12..31 (по два регистра на значение, float32 big-endian)
+REGISTER_COLUMNS = (PYRO1, PYRO2, EFFORT, GAP, SPEED_V, SPEED_V0, SPEED_V1, MOMENT, POWER, T)
+
+# Кадр шага: регистры 12..32 - 20 слов значений и слово флагов
+FRAME_ADDRESS = 12
+FRAME_WORDS = 2 * len(REGISTER_COLUMNS) + 1
+
+# Биты слова флагов (регистр 32)
+FLAG_BITS = ((LEFT_CAP, 0x01), (RIGHT_CAP, 0x02), (GAP_FB, 0x04), (SPEED_FB, 0x08))
+
+# Уставки в регистрах 1..8: скорость валков, раствор, скорости левой и правой групп рольгангов
+_SETPOINT_WORDS = struct.Struct('>8H')
+_SETPOINT_FLOATS = struct.Struct('>4f')
+_FLOAT_WORDS = struct.Struct('>2H')
+_FLOAT = struct.Struct('>f')
+
+
+def encode_frames(block):
+    """
+    Кодирование блока шагов [колонка, шаг] в кадры регистров [шаг, FRAME_WORDS] (uint16):
+    значения REGISTER_COLUMNS как >f4, просмотренные как пары >u2, и слово флагов.
+    Возвращает кадры и значения float32 (порядок REGISTER_COLUMNS) для журналов.
+    """
+    values = np.ascontiguousarray(block[list(REGISTER_COLUMNS)].T, dtype='>f4')
+    frames = np.empty((values.shape[0], FRAME_WORDS), dtype=np.uint16)
+    frames[:, :-1] = values.view('>u2')
+    flags = frames[:, -1]
+    flags[:] = 0
+    for col, bit in FLAG_BITS:
+        flags[block[col] != 0] |= bit
+    return frames, values
+
+
+class PhaseFrames:
+    """
+    Публикуемое представление целой фазы, подготовленное одним пакетом:
+    start - индекс первого шага фазы в журнале симулятора, source - исходный блок фазы,
+    block - блок, округлённый по правилам журнала (то же, что выдаёт steps_since),
+    frames - кадры регистров 12..32 по шагам [шаг, FRAME_WORDS] (uint16),
+    records - записи файла прогона (значения REGISTER_COLUMNS и слово флагов, <f4).
+    Шаги выбираются срезами: при шаге физики мельче периода публикации
+    в регистры и журналы уходят не все шаги фазы.
+    """
+
+    def __init__(self, start, source):
+        self.start = start
+        self.source = source
+        self.block = round_block(source)
+        self.frames, values = encode_frames(self.block)
+        self.records = np.empty((values.shape[0], values.shape[1] + 1), dtype='<f4')
+        self.records[:, :-1] = values
+        self.records[:, -1] = self.frames[:, -1]
+
+    def __len__(self):
+        return self.block.shape[1]
+
+    def rows(self, steps):
+        "Записи шагов steps (срез) списками со словом флагов целым (для телеметрии)"
+        records = self.records[steps]
+        flags = records[:, -1].astype(np.int64).tolist()
+        return [row[:-1] + [flag] for row, flag in zip(records.tolist(), flags)]
+
+
+def decode_setpoints(regs):
+    "Уставки из регистров 1..8: (скорость валков, раствор, V0 рольгангов, V1 рольгангов)"
+    return _SETPOINT_FLOATS.unpack(_SETPOINT_WORDS.pack(*regs[:8]))
+
+
+def float_to_regs(value: float):
+    """Преобразует float в два WORD регистра (big-endian)."""
+    return list(_FLOAT_WORDS.unpack(_FLOAT.pack(value)))
+
+
+def regs_to_float(reg1: int, reg2: int) -> float:
+    """Преобразует два WORD регистра обратно в float (big-endian)."""
+    return _FLOAT.unpack(_FLOAT_WORDS.pack(reg1, reg2))[0]
@@ -1,5 +1,7 @@
 from math import *
 
+import MillRegistry
+
 class RollingMill:
     def __init__(self,DR,L,b,h_0,StartTemp,DV,MV,MS,OutTemp,SteelGrade,V0,V1,S,V_Valk_Per,StartS,d1,d2,d,VS,Dir_of_rot):
         #Параметры сляба(Задает оператор)
@@ -78,14 +80,7 @@ class RollingMill:
 
     def DefResistance(self,RelDef,LK,V,CurrentTemp,SteelGrade) -> float:
         "Сопротивление деформации(МПа)"
-        SteelGrades = {"Ст3сп":(87.1,0.124,0.167,2.8),
-                      "12ХН3А":(89.9,0.095,0.261,2.84),
-                      "65Г":(73.2,0.166,0.222,3.02),
-                      "К65":(83.2,0.149,0.213,4.143),
-                      "X100":(84.5,0.161,0.197,4.208),
-                      "HARDOX500":(92.3,0.159,0.291,3.756),
-                      "08Х18Н10Т":(175.4,0.1312,0.1493,4.2269)}
-        sigmaOD,a,b,c = SteelGrades[SteelGrade] 
+        sigmaOD,a,b,c = MillRegistry.resolve_grade(SteelGrade).coefficients
         u = (V/LK * RelDef)
         Sigmaf = sigmaOD * (u**a) * ((10*RelDef)**b) * ((CurrentTemp/1000)**-c)
         #a,b,c - Коэффициенты зависящие от марки стали
@@ -127,20 +122,15 @@ class RollingMill:
     
     def FricCoef(self,MV, MS, V0, TempS) -> float:
         "Коэффициент трения"
-        if (MV == 'Сталь'): 
-            k1 = 1
-        elif(MV == 'Чугун'):
-            k1 = 0.8
+        # MV, MS - материалы валков и сляба (имена из реестра или объекты MillRegistry.Material)
+        k1 = MillRegistry.resolve_roll_material(MV).friction
 
         if (V0 <= 3):
             k2 = 0.8
         elif (V0 > 3):
             k2 = 1.53 * V0 ** (-0.47)
 
-        if (MS == 'Carbon Steel'): 
-            k3 = 1
-        elif (MS == 'Austenitic steel'):
-            k3 = 1.47
+        k3 = MillRegistry.resolve_slab_material(MS).friction
 
         Mu = k1 * k2 * k3 * (1.05 - 0.0005 * TempS) 
         return Mu
@@ -0,0 +1,184 @@
+import numpy as np
+
+import MillRegistry
+
+# Формулы RollingMill для массивов NumPy: те же имена и аргументы, что у методов
+# RollingMill, аргументы - скаляры или массивы с broadcasting, ветвления заменены
+# на np.where/np.select. На допустимых входах результаты совпадают со скалярными методами
+# с точностью до округления (векторные pow/log NumPy могут отличаться от math на 1 ulp).
+
+
+def _lookup(values, resolve, attr):
+    "Параметр записи реестра для имени (объекта) или массива имён"
+    if not isinstance(values, (np.ndarray, list, tuple)):
+        return getattr(resolve(values), attr)
+    names, inverse = np.unique(np.asarray(values), return_inverse=True)
+    table = np.array([getattr(resolve(str(name)), attr) for name in names])
+    return table[inverse.reshape(np.shape(values))]
+
+
+def grade_coefficients(SteelGrade):
+    "Коэффициенты (sigmaOD, a, b, c) для марки стали (имя или MillRegistry.Grade) или массива марок"
+    coefficients = _lookup(SteelGrade, MillRegistry.resolve_grade, 'coefficients')
+    if isinstance(coefficients, tuple):
+        return coefficients
+    return tuple(coefficients[..., i] for i in range(4))
+
+
+def SpeedOfRolling(DV, V):
+    "Скорость прокатки (м/с)"
+    w = V / (np.pi * DV)
+    return np.pi * DV * w * (1 + 0.05) / 1000
+
+
+def RelDef(h_0, h_1):
+    "Относительная деформация"
+    return (h_0 - h_1) / h_0
+
+
+def ContactArcLen(DV, h_0, h_1):
+    "Длина дуги контакта (мм)"
+    return np.sqrt((DV * (h_0 - h_1)) / 2)
+
+
+def TempDrDConRoll(DV, h_0, h_1, Temp, SpeedOfRolling):
+    "Падение температуры вследствие контакта с валками (°C)"
+    contact_angle = np.arccos(1 - (h_0 - h_1) / DV)
+    contact_length = np.sqrt((DV / 2) * contact_angle)
+    return (0.216 * contact_length / (h_0 + h_1) *
+            (Temp - 60) * np.sqrt(1.08 / SpeedOfRolling) * 0.8)
+
+
+def TempDrPlDeform(DefResistance, h_0, h_1):
+    "Прирост температуры вследствие пластической деформации (°C)"
+    return 0.183 * DefResistance * np.log(h_0 / h_1)
+
+
+def GenTemp(Temp, TempDrBPass, TempDrDConRoll, TempDrPlDeform):
+    "Общая температура после итерации прокатки"
+    return Temp + TempDrPlDeform - TempDrDConRoll - TempDrBPass
+
+
+def DefResistance(RelDef, LK, V, CurrentTemp, SteelGrade):
+    "Сопротивление деформации (МПа); SteelGrade - марка или массив марок"
+    sigmaOD, a, b, c = grade_coefficients(SteelGrade)
+    u = V / LK * RelDef
+    return sigmaOD * u ** a * (10 * RelDef) ** b * (CurrentTemp / 1000) ** -c
+
+
+def Moment(LK, h_0, h_1, Effort):
+    "Момент прокатки"
+    h_average = (h_1 + h_0) / 2
+    psi = 0.498 - 0.283 * LK / h_average
+    return 2 * Effort * psi * LK
+
+
+def Effort(LK, b, AvrgPressure):
+    "Усилие прокатки (Н)"
+    return AvrgPressure * (LK * b)
+
+
+def Power(M, V, DV):
+    "Мощность прокатки"
+    return M * (V / (np.pi * DV))
+
+
+def CapCondition(Mu, S, DV):
+    "Условие захвата (массив bool); S - абсолютное обжатие"
+    return Mu >= np.tan(np.arccos(1 - S / DV))
+
+
+def FricCoef(MV, MS, V0, TempS):
+    "Коэффициент трения; MV, MS - материалы валков и сляба (имена, объекты реестра или массивы имён)"
+    V0 = np.asarray(V0, dtype=float)
+    k1 = _lookup(MV, MillRegistry.resolve_roll_material, 'friction')
+    # Степень считается только для V0 > 3, чтобы не вычислять её на нуле
+    k2 = np.where(V0 <= 3, 0.8, 1.53 * np.where(V0 > 3, V0, 1.0) ** (-0.47))
+    k3 = _lookup(MS, MillRegistry.resolve_slab_material, 'friction')
+    return k1 * k2 * k3 * (1.05 - 0.0005 * TempS)
+
+
+def AvrgPressure(LK, h_1, h_0, DefResistance):
+    "Среднее давление на валки (МПа)"
+    ratio = LK / ((h_1 + h_0) / 2)
+    n_frict = np.select([ratio <= 2, ratio <= 4, ratio > 4],
+                        [1 + ratio / 6, 1 + ratio / 5, 1 + ratio / 4], np.nan)
+    n_zone = np.where(ratio < 1, ratio ** -0.4, 1)
+    return 1.15 * n_frict * n_zone * DefResistance
+
+
+def TempDrBPass(T0, Time, width, height):
+    "Падение температуры между пропусками (°C)"
+    P0 = 2 * (width + height)
+    F0 = width * height
+    cube_root = (0.0255 * P0 * Time / F0 + (1000 / (T0 + 273)) ** 3) ** (1 / 3)
+    return T0 - (1000 / cube_root) + 273
+
+
+def rolling_pass(h_0, h_1, V, Temp, b, DV, SteelGrade, MV='Сталь', MS=None):
+    """
+    Параметры прохода h_0 -> h_1 при скорости валков V (мм/с) и температуре Temp на входе
+    в той же цепочке, что и RollingMillSimulator._rolling_pass_block. Аргументы - скаляры
+    или массивы с broadcasting. Возвращает словарь массивов в единицах журнала симулятора:
+    effort (кН), moment (кН*м), power (кВт), temp (°C после прохода), bite (условие захвата).
+    MS по умолчанию - материал марки из реестра.
+    """
+    if MS is None:
+        MS = _lookup(SteelGrade, MillRegistry.resolve_grade, 'material')
+    rel_def = RelDef(h_0, h_1)
+    LK = ContactArcLen(DV, h_0, h_1)
+    def_resistance = DefResistance(rel_def, LK, V, Temp, SteelGrade)
+    pressure = AvrgPressure(LK, h_1, h_0, def_resistance)
+    effort = Effort(LK, b, pressure)
+    moment = Moment(LK, h_0, h_1, effort / 1000)
+    power = Power(moment, V, DV)
+    speed = SpeedOfRolling(DV, V)
+    temp = GenTemp(Temp, 0, TempDrDConRoll(DV, h_0, h_1, Temp, speed),
+                   TempDrPlDeform(def_resistance, h_0, h_1))
+    mu = FricCoef(MV, MS, speed, Temp)
+    return {
+        "effort": effort / 1000,
+        "moment": moment / 1000,
+        "power": power / 1000,
+        "temp": temp,
+        "bite": CapCondition(mu, h_0 - h_1, DV),
+    }
+
+
+SWEEP_AXES = ("grade", "h_0", "reduction", "temp", "speed")
+
+
+def sweep(grades, h_0, reductions, temps, speeds, b=250.0, DV=300.0, MV='Сталь',
+          MS=None, relative=False):
+    """
+    Карты усилия, момента и мощности прохода на сетке марка x h_0 x обжатие x температура
+    x скорость валков (оси SWEEP_AXES). reductions - абсолютные обжатия (мм) или, при
+    relative=True, доли h_0. Точки с h_1 <= 0 дают nan. Возвращает словарь
+    rolling_pass плюс h_1 и axes; массивы формы (len(grades), len(h_0), ...);
+    ось-скаляр - ось длины 1.
+    Расчёт идёт по марке за раз, поэтому пиковая память - одна марка сетки.
+    grades=None - все марки текущего реестра.
+    """
+    if grades is None:
+        grades = list(MillRegistry.current().grades)
+    grades = list(np.atleast_1d(grades))
+    h_0 = np.atleast_1d(np.asarray(h_0, dtype=float))[:, None, None, None]
+    reductions = np.atleast_1d(np.asarray(reductions, dtype=float))[None, :, None, None]
+    temps = np.atleast_1d(np.asarray(temps, dtype=float))[None, None, :, None]
+    speeds = np.atleast_1d(np.asarray(speeds, dtype=float))[None, None, None, :]
+    h_1 = h_0 - reductions * h_0 if relative else h_0 - reductions
+    h_1 = np.where(h_1 > 0, h_1, np.nan)
+
+    result = None
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i, grade in enumerate(grades):
+            maps = rolling_pass(h_0, h_1, speeds, temps, b, DV, grade, MV, MS)
+            if result is None:
+                shape = (len(grades),) + np.broadcast_shapes(h_1.shape, temps.shape, speeds.shape)
+                result = {key: np.empty(shape, dtype=bool if key == "bite" else float) for key in maps}
+            for key, value in maps.items():
+                result[key][i] = value
+    result["h_1"] = np.broadcast_to(h_1, result["effort"].shape[1:])
+    result["axes"] = dict(zip(SWEEP_AXES, (grades, h_0.ravel(), reductions.ravel(),
+                                            temps.ravel(), speeds.ravel())))
+    return result
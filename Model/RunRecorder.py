@@ -0,0 +1,251 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from RegisterFrames import FRAME_WORDS
+
+# Поля шага: значения в порядке регистров 12..31 и слово флагов регистра 32
+STEP_FIELDS = (
+    'pyro1',      # Пирометр 1 (°C)
+    'pyro2',      # Пирометр 2 (°C)
+    'effort',     # Давление (кН)
+    'gap',        # Раствор (мм)
+    'speed_V',    # Скорость валков (об/с)
+    'speed_V0',   # Скорость левой группы рольгангов (об/с)
+    'speed_V1',   # Скорость правой группы рольгангов (об/с)
+    'moment',     # Момент прокатки (кН·м)
+    'power',      # Мощность прокатки (кВт)
+    'time',       # Время (с)
+    'flags',      # Битовые флаги (концевики, выход на уставки)
+)
+# Управляющее слово (регистр 9) и статус автомата (регистр 33) в момент публикации шага -
+# по ним повтор прогона воспроизводит команды ПЛК
+CONTROL_FIELDS = ('control', 'status')
+RECORD_FIELDS = STEP_FIELDS + CONTROL_FIELDS
+RECORD_DTYPE = np.dtype([(name, '<f4') for name in RECORD_FIELDS])
+
+# Порядок полей в xlsx-выгрузке (совпадает со столбцами EXCEL_HEADERS)
+EXCEL_FIELDS = ('time', 'pyro1', 'pyro2', 'effort', 'gap',
+                'speed_V', 'speed_V0', 'speed_V1', 'moment', 'power')
+
+# Заголовок файла: сигнатура, версия, размер заголовка, размер записи,
+# длина JSON с параметрами сляба, число записанных шагов. Далее - сам JSON.
+MAGIC = b'RMREC\x00\x00\x01'
+VERSION = 2
+# Записи прежних версий: 1 - без CONTROL_FIELDS
+RECORD_DTYPES = {1: np.dtype([(name, '<f4') for name in STEP_FIELDS]), VERSION: RECORD_DTYPE}
+HEADER = struct.Struct('<8sIIIIQ')
+COUNT_OFFSET = HEADER.size - 8
+HEADER_SIZE = 4096
+
+
+class RunRecorder:
+    """
+    Запись прогона в файл только на дописывание: заголовок с параметрами сляба
+    и далее записи фиксированной длины из float32 (RECORD_DTYPE).
+    Файл отображается в память и растёт кусками по chunk_records записей;
+    счётчик шагов в заголовке обновляется после каждой записи, поэтому файл
+    можно читать (RunReader) прямо во время прокатки.
+    """
+
+    def __init__(self, path: str, params: dict, chunk_records=4096):
+        meta = json.dumps(params, ensure_ascii=False, default=str).encode('utf-8')
+        if HEADER.size + len(meta) > HEADER_SIZE:
+            raise ValueError(f"Параметры сляба не помещаются в заголовок ({len(meta)} байт)")
+
+        self.path = path
+        self.chunk_records = max(int(chunk_records), 1)
+        self._count = 0
+
+        self._file = open(path, 'w+b')
+        self._file.truncate(HEADER_SIZE + self.chunk_records * RECORD_DTYPE.itemsize)
+        self._map()
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, HEADER_SIZE,
+                         RECORD_DTYPE.itemsize, len(meta), 0)
+        self._mm[HEADER.size:HEADER.size + len(meta)] = meta
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return self._records.shape[0]
+
+    def _map(self):
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._records = np.frombuffer(self._mm, dtype=RECORD_DTYPE, offset=HEADER_SIZE)
+
+    def _grow(self, steps):
+        "Увеличивает файл минимум на steps записей (с перевыделением отображения)"
+        need = self._count + steps
+        capacity = self.capacity
+        while capacity < need:
+            capacity += self.chunk_records
+        self._records = None
+        self._mm.close()
+        self._file.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        self._map()
+
+    def append(self, record):
+        "Дописывает один шаг (последовательность значений в порядке RECORD_FIELDS)"
+        if self._count == self.capacity:
+            self._grow(1)
+        self._records[self._count] = tuple(record)
+        self._count += 1
+        struct.pack_into('<Q', self._mm, COUNT_OFFSET, self._count)
+
+    def extend(self, block, control=(0, 0)):
+        """
+        Дописывает блок шагов [шаг, поле] одним копированием. Блок из STEP_FIELDS
+        дополняется значениями control (управляющее слово и статус, общие для блока).
+        """
+        block = np.asarray(block, dtype='<f4')
+        steps = block.shape[0]
+        if block.shape[1] == len(STEP_FIELDS):
+            full = np.empty((steps, len(RECORD_FIELDS)), dtype='<f4')
+            full[:, :len(STEP_FIELDS)] = block
+            full[:, len(STEP_FIELDS):] = control
+            block = full
+        if self._count + steps > self.capacity:
+            self._grow(steps)
+        self._records[self._count:self._count + steps] = block.view(RECORD_DTYPE).reshape(steps)
+        self._count += steps
+        struct.pack_into('<Q', self._mm, COUNT_OFFSET, self._count)
+
+    def flush(self):
+        "Сбрасывает отображение на диск"
+        self._mm.flush()
+
+    def close(self):
+        "Закрывает файл, обрезая незаполненный хвост"
+        if self._file is None:
+            return
+        self._records = None
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(HEADER_SIZE + self._count * RECORD_DTYPE.itemsize)
+        self._file.close()
+        self._file = None
+
+
+class RunReader:
+    """
+    Чтение файла прогона. records - структурированный массив поверх отображения
+    файла (без копирования); для файла, который ещё пишется, refresh() подхватывает
+    новые шаги.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        magic, version, header_size, record_size, meta_len, _ = HEADER.unpack(
+            self._file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: не файл прогона")
+        self.dtype = RECORD_DTYPES.get(version)
+        if self.dtype is None or record_size != self.dtype.itemsize:
+            raise ValueError(f"{path}: неподдерживаемая версия формата {version}")
+        self.version = version
+        self._header_size = header_size
+        self.params = json.loads(self._file.read(meta_len).decode('utf-8'))
+
+        self._mm = None
+        self.records = np.empty(0, dtype=self.dtype)
+        self.refresh()
+
+    def __len__(self):
+        return self.records.shape[0]
+
+    def refresh(self) -> int:
+        "Перечитывает счётчик шагов; возвращает текущее число записей"
+        size = os.fstat(self._file.fileno()).st_size
+        if self._mm is None or len(self._mm) != size:
+            # Старые представления продолжают ссылаться на прежнее отображение
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        count, = struct.unpack_from('<Q', self._mm, COUNT_OFFSET)
+        count = min(count, (size - self._header_size) // self.dtype.itemsize)
+        self.records = np.frombuffer(self._mm, dtype=self.dtype,
+                                     count=count, offset=self._header_size)
+        return count
+
+    def field(self, name: str):
+        "Поле записи по всем шагам (представление без копирования)"
+        return self.records[name]
+
+    @property
+    def has_control(self) -> bool:
+        "Есть ли в записях управляющее слово и статус (формат версии 2)"
+        return all(name in self.dtype.names for name in CONTROL_FIELDS)
+
+    def close(self):
+        self.records = np.empty(0, dtype=self.dtype)
+        self._mm = None
+        self._file.close()
+
+
+def publish_points(times, period):
+    """
+    Индексы записей, которые повтор публикует раз в period секунд: последняя запись
+    каждого периода (kP, (k+1)P]. Файл с шагом записи не мельче period публикуется целиком.
+    Сброс времени (новый сеанс в том же файле) начинает новые периоды.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if times.size < 2:
+        return np.arange(times.size)
+    spacing = np.diff(times)
+    spacing = spacing[spacing > 0]
+    if not spacing.size or np.median(spacing) >= period * (1 - 1e-3):
+        return np.arange(times.size)
+    # Допуск - полшага записи: время во float32 не кратно периоду точно
+    tick = np.ceil(times / period - 0.5 * np.median(spacing) / period)
+    return np.append(np.flatnonzero(tick[1:] != tick[:-1]), times.size - 1)
+
+
+def replay_frames(records):
+    """
+    Кадры регистров 12..32 из записей прогона [шаг, FRAME_WORDS] (uint16) - обратное
+    кодирование без расчёта: значения как >f4, просмотренные как пары >u2, и слово флагов.
+    Для записей с CONTROL_FIELDS вторым значением - управляющее слово и статус [шаг, 2].
+    """
+    values = np.empty((records.shape[0], len(STEP_FIELDS) - 1), dtype='>f4')
+    for i, name in enumerate(STEP_FIELDS[:-1]):
+        values[:, i] = records[name]
+    frames = np.empty((records.shape[0], FRAME_WORDS), dtype=np.uint16)
+    frames[:, :-1] = values.view('>u2')
+    frames[:, -1] = records['flags']
+    control = None
+    if all(name in records.dtype.names for name in CONTROL_FIELDS):
+        control = np.stack([records[name] for name in CONTROL_FIELDS], axis=1).astype(np.uint16)
+    return frames, control
+
+
+def export_xlsx(path: str, xlsx_path: str | None = None) -> str:
+    """
+    Выгрузка файла прогона в xlsx в формате построчного Excel-лога сервера.
+    По умолчанию файл кладётся рядом с прогоном с расширением .xlsx.
+    """
+    from ExcelLogger import save_run_workbook, slab_params
+
+    if xlsx_path is None:
+        xlsx_path = os.path.splitext(path)[0] + '.xlsx'
+    reader = RunReader(path)
+    try:
+        columns = [np.round(reader.field(name).astype(np.float64), 3 if name == 'time' else 2)
+                   for name in EXCEL_FIELDS]
+        rows = np.stack(columns, axis=1).tolist() if columns[0].size else []
+        save_run_workbook(xlsx_path, slab_params(reader.params), rows)
+    finally:
+        reader.close()
+    return xlsx_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Выгрузка файла прогона в xlsx")
+    parser.add_argument('run', help="файл прогона (.rec)")
+    parser.add_argument('xlsx', nargs='?', help="имя xlsx-файла (по умолчанию рядом с прогоном)")
+    args = parser.parse_args()
+    print(export_xlsx(args.run, args.xlsx))
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import Config
+from MillHost import MillHost
+from RegisterFrames import float_to_regs
+
+# Управляющее слово имитатора ПЛК: Start_Switch | Start | Start_Gap | Start_Accel | Start_Roll
+RUN_WORD = 0x100 | 0x10 | 0x20 | 0x40 | 0x80
+DIR_BIT = 0x02
+
+# Заготовка без записи в slabs (id None - телеметрия в БД не пишется)
+SLAB = {
+    'id': None, 'length_slab': 3000, 'width_slab': 250, 'thikness_slab': 350,
+    'temperature_slab': 1200, 'material_slab': 'Ст3сп', 'diametr_roll': 300,
+    'material_roll': 'Сталь',
+}
+
+# Порог прохождения: доля опоздавших больше чем на период шагов и доля выданных шагов
+MAX_OVERRUN_RATIO = 0.01
+MIN_RATE_RATIO = 0.95
+
+
+def write_plc(mill, roll_speed, gap, v0, v1, word):
+    "Запись уставок (регистры 1..8) и управляющего слова (9), как это делает ПЛК"
+    regs = []
+    for value in (roll_speed, gap, v0, v1):
+        regs += float_to_regs(value)
+    mill.hr_data_combined.setValues(1, regs + [word])
+
+
+async def plc(mill, stopped: asyncio.Event, reduction=10.0, min_gap=40.0, speed=200.0):
+    """
+    Имитатор ПЛК одного стана: проходы подряд с обжатием reduction и сменой направления.
+    Уставки следующего прохода пишутся, пока идёт текущий (автомат их уже прочитал).
+    """
+    gap = SLAB['thikness_slab'] - reduction
+    direction = 0
+    write_plc(mill, speed, gap, speed, speed, RUN_WORD)
+    while not stopped.is_set():
+        await asyncio.sleep(0.05)
+        if mill.counter == 2 and mill.simulator.S == gap:
+            gap -= reduction
+            direction ^= DIR_BIT
+            word = RUN_WORD | direction if gap >= min_gap else 0x100
+            write_plc(mill, speed, gap, speed, speed, word)
+
+
+async def run_trial(count: int, duration: float, warmup: float, speed: float) -> dict:
+    "Прогон count станов: duration секунд замера после warmup секунд разгона"
+    host = MillHost(count, "127.0.0.1", 0, speed=speed, runs_dir="runs")
+    stopped = asyncio.Event()
+    for mill in host.mills:
+        await mill.start_slab(SLAB)
+    tasks = [asyncio.create_task(mill.monitor_registers()) for mill in host.mills]
+    tasks += [asyncio.create_task(plc(mill, stopped)) for mill in host.mills]
+
+    await asyncio.sleep(warmup)
+    for mill in host.mills:
+        mill.pacer.reset_stats()
+    wall, cpu = time.perf_counter(), time.process_time()
+    await asyncio.sleep(duration)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    stats = [mill.pacer.stats() for mill in host.mills]
+
+    stopped.set()
+    for mill in host.mills:
+        mill.stop_monitoring = True
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await host.close()
+
+    steps = sum(s["steps"] for s in stats)
+    expected = count * wall / Config.PUBLISH_DT * speed
+    overruns = sum(s["overruns"] for s in stats)
+    result = {
+        "mills": count,
+        "steps_per_s": steps / wall,
+        "rate_ratio": steps / expected if expected else 0.0,
+        "overrun_ratio": overruns / steps if steps else 1.0,
+        "mean_lateness_ms": 1000 * sum(s["mean_lateness"] * s["steps"] for s in stats) / max(steps, 1),
+        "max_lateness_ms": 1000 * max(s["max_lateness"] for s in stats),
+        "cpu": cpu / wall,
+    }
+    result["ok"] = (result["overrun_ratio"] <= MAX_OVERRUN_RATIO
+                    and result["rate_ratio"] >= MIN_RATE_RATIO)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест MillHost: сколько станов держат 10 Гц на одном ядре")
+    parser.add_argument('--counts', help="числа станов через запятую (по умолчанию 1, 2, 4, ... до отказа)")
+    parser.add_argument('--max', type=int, default=247, help="наибольшее число станов при удвоении")
+    parser.add_argument('--duration', type=float, default=20.0, help="длительность замера, с")
+    parser.add_argument('--warmup', type=float, default=3.0, help="разгон перед замером, с")
+    parser.add_argument('--speed', type=float, default=1.0, help="ускорение времени (1 - 10 Гц)")
+    parser.add_argument('--cpu', type=int, default=0, help="ядро для процесса (-1 - без привязки)")
+    args = parser.parse_args(argv)
+
+    if args.cpu >= 0 and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {args.cpu})
+    counts = [int(c) for c in args.counts.split(',')] if args.counts else None
+
+    print(f"{'станов':>7} {'шагов/с':>9} {'темп':>6} {'опозд.':>7} {'сред.мс':>8} {'макс.мс':>8} {'CPU':>5}")
+    best = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # Файлы прогона и Excel-логи станов - во временном каталоге
+        try:
+            count = 1
+            while True:
+                if counts is not None:
+                    if not counts:
+                        break
+                    count = counts.pop(0)
+                r = asyncio.run(run_trial(count, args.duration, args.warmup, args.speed))
+                print(f"{r['mills']:>7} {r['steps_per_s']:>9.1f} {r['rate_ratio']:>6.1%} "
+                      f"{r['overrun_ratio']:>7.2%} {r['mean_lateness_ms']:>8.2f} "
+                      f"{r['max_lateness_ms']:>8.1f} {r['cpu']:>5.0%}  {'ok' if r['ok'] else 'FAIL'}")
+                if r["ok"]:
+                    best = max(best, count)
+                elif counts is None:
+                    break
+                if counts is None:
+                    if count >= args.max:
+                        break
+                    count = min(count * 2, args.max)
+        finally:
+            os.chdir(cwd)
+    print(f"Станов на 10 Гц (x{args.speed:g}) на одном ядре: {best}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,62 @@
 import asyncio
-import struct
+import os
+import time
 from datetime import datetime
 
-import asyncpg
 from pymodbus.server import StartAsyncTcpServer
-from pymodbus.datastore import ModbusSequentialDataBlock
-from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
+from pymodbus.datastore import ModbusServerContext
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
+import Config
+from ControlRegisters import (ControlDataBlock, CountingSlaveContext, COMMAND_REGISTERS,
+                              CONTROL_REGISTER)
+from ExcelLogger import ExcelLogger, ExcelWriter, slab_params
+from Metrics import DIAG_WORDS, MetricsExporter, MillMetrics
+import MillRegistry
+from Pacer import Pacer
+from RegisterFrames import FRAME_ADDRESS, PhaseFrames, decode_setpoints, float_to_regs
+from RollingMillSimulator import RollingMillSimulator, steps_per
+from RunRecorder import RunReader, RunRecorder, publish_points, replay_frames
+from SlabDatabase import SlabDatabase
+from TelemetrySink import TelemetrySink
+from TelemetryLog import (T, PYRO1, PYRO2, EFFORT, GAP, SPEED_V, SPEED_V0, SPEED_V1,
+                          MOMENT, POWER, TEMP)
 
-from RollingMillSimulator import RollingMillSimulator
+# Колонки журнала в порядке столбцов построчного Excel-лога
+EXCEL_COLUMNS = (T, PYRO1, PYRO2, EFFORT, GAP, SPEED_V, SPEED_V0, SPEED_V1, MOMENT, POWER)
 
+# Максимальное ожидание записи в управляющие регистры в покое (с)
+MONITOR_IDLE_TIMEOUT = 1.0
 
-def float_to_regs(value: float):
-    """Преобразует float в два WORD регистра (big-endian)."""
-    b = struct.pack('>f', float(value))
-    return [int.from_bytes(b[:2], 'big'), int.from_bytes(b[2:], 'big')]
+# Шагов файла прогона, кодируемых в кадры регистров за один раз при повторе
+REPLAY_CHUNK = 4096
 
 
-def regs_to_float(reg1: int, reg2: int) -> float:
-    """Преобразует два WORD регистра обратно в float (big-endian)."""
-    b1 = (reg1 >> 8) & 0xFF
-    b2 = reg1 & 0xFF
-    b3 = (reg2 >> 8) & 0xFF
-    b4 = reg2 & 0xFF
-    return struct.unpack('>f', bytes([b1, b2, b3, b4]))[0]
-
 class AsyncModbusServer:
-    def __init__(self):
-        # Настройка области регистров Holding Registers
-        total_registers = 33
+    """
+    Один стан: регистры, симулятор, автомат управляющих регистров и журналы.
+    db и excel_writer - общие пул БД и поток Excel-логов, если в процессе
+    несколько станов (MillHost); по умолчанию стан создаёт собственные.
+    name различает файлы станов, layout - компоновка стана в справочнике,
+    seed - зерно шумов симулятора (None - своё случайное на каждую заготовку).
+    Вместо расчёта стан может повторять записанный прогон (replay).
+    """
+
+    def __init__(self, excel_flush_interval: float = 5.0, runs_dir: str = "runs",
+                 speed: float = Config.SPEED, db: SlabDatabase | None = None,
+                 excel_writer: ExcelWriter | None = None, name: str | None = None,
+                 layout: str | None = None, seed: int | None = Config.SEED):
+        self.name = name
+        self.layout = layout
+        self.seed = seed
+
+        # Настройка области регистров Holding Registers: 1..33 и диагностика 34..46 (Metrics)
+        total_registers = 33 + DIAG_WORDS
         initial_values = [0] * total_registers
         # Адрес 1, длина total_registers
-        self.hr_data_combined = ModbusSequentialDataBlock(1, initial_values)
-        store = ModbusSlaveContext(hr=self.hr_data_combined)
-        self.context = ModbusServerContext(slaves=store, single=True)
+        # Запись ПЛК в регистры уставок и управляющее слово будит monitor_registers
+        self.hr_data_combined = ControlDataBlock(1, initial_values)
+        self.slave_context = CountingSlaveContext(hr=self.hr_data_combined)
+        self.context = ModbusServerContext(slaves=self.slave_context, single=True)
 
         self.stop_monitoring = False
         self.simulator: RollingMillSimulator | None = None
@@ -44,19 +65,65 @@ class AsyncModbusServer:
         # Состояние "этапа" прокатки
         self.counter = 0
         self.counter2 = 0
-        self.nex_idx = 0
-        self.prev_total_steps = 0
+        self.cursor = 0  # Курсор чтения журнала симулятора: следующий неопубликованный шаг
+        self._phase: PhaseFrames | None = None  # Подготовленная к публикации текущая фаза
         self.status_code = 0 # 1-ожидание инициализации,2-ожидание переключателя старт,3-ожидание команды старта, 4-проход выполняется
 
         # Синхронизация асинхронных задач
         self.simulation_lock = asyncio.Lock()
         self.simulation_in_progress = False
 
-        # --- Excel логирование ---
-        self.excel_wb: Workbook | None = None
-        self.excel_ws = None
+        # Темп публикации: N-й период фазы уходит в регистры в t0 + N * PUBLISH_DT / speed
+        self.pacer = Pacer(dt=Config.PUBLISH_DT, speed=speed)
+        # Каждый какой шаг физики пишется в файл прогона, Excel-лог и телеметрию
+        # (пересчитывается по шагу симулятора при старте заготовки)
+        self.record_every = self.excel_every = self.telemetry_every = 1
+        # Время расчёта фаз и публикации шагов (страница метрик и регистры 34..46)
+        self.metrics = MillMetrics()
+
+        # --- Excel логирование (фоновый поток, файл пишется раз в excel_flush_interval с) ---
+        self.excel = ExcelLogger(flush_interval=excel_flush_interval, writer=excel_writer)
         self.excel_filename: str | None = None
-        self.excel_next_row: int | None = None
+
+        # --- Файл прогона (основной журнал телеметрии, xlsx выгружается из него по запросу) ---
+        self.runs_dir = runs_dir
+        self.recorder: RunRecorder | None = None
+
+        # --- Таблица slabs: общий пул соединений, параметры подключения из Config ---
+        self._own_db = db is None
+        self.db = db or SlabDatabase()
+        # Построчная телеметрия в rolling_telemetry и итог заготовки в slabs
+        self.telemetry = TelemetrySink(self.db)
+
+    # ===================== Файл прогона =====================
+
+    def _create_new_recording(self, last_row):
+        """
+        Открывает новый файл прогона; параметры сляба (запись slabs) кладутся в его заголовок.
+        Предыдущий файл закрывается.
+        """
+        self._close_recording()
+        os.makedirs(self.runs_dir, exist_ok=True)
+        filename = self._file_prefix() + datetime.now().strftime("%Y%m%d_%H%M%S.rec")
+        # Зерно симулятора - в заголовке: прогон можно пересчитать с теми же шумами
+        params = dict(last_row, seed=self.simulator.seed)
+        self.recorder = RunRecorder(os.path.join(self.runs_dir, filename), params)
+
+    def _file_prefix(self) -> str:
+        "Префикс имён файлов стана (у нескольких станов процесса файлы не совпадают)"
+        return f"{self.name}_" if self.name else ""
+
+    def _close_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def _flush_logs(self):
+        "Конец прохода или аварии: сброс на диск файла прогона и CSV-журнала Excel-лога"
+        if self.recorder is not None:
+            self.recorder.flush()
+        self.excel.flush()
+        self.telemetry.flush()
 
     # ===================== Excel-помощники =====================
 
@@ -67,130 +134,44 @@ class AsyncModbusServer:
         """
         # Имя файла — текущая дата/время окончания инициализации
         now = datetime.now()
-        self.excel_filename = now.strftime("%H:%M:%S_%d.%m.%Y.xlsx")
-
-        self.excel_wb = Workbook()
-        self.excel_ws = self.excel_wb.active
-        ws = self.excel_ws
-        ws.title = "Лог прокатки"
-
-        # --- Блок начальных параметров ---
-        ws.cell(row=1, column=1, value="Параметр").font = Font(bold=True)
-        ws.cell(row=1, column=2, value="Значение").font = Font(bold=True)
-
-        params = [
-            ("length_slab",      "Длина сляба, мм"),
-            ("width_slab",       "Ширина сляба, мм"),
-            ("thikness_slab",    "Толщина сляба, мм"),
-            ("temperature_slab", "Температура сляба, °C"),
-            ("material_slab",    "Марка стали"),
-            ("diametr_roll",     "Диаметр валков, мм"),
-            ("material_roll",    "Материал валков"),
-        ]
-
-        row = 2
-        for key, title in params:
-            ws.cell(row=row, column=1, value=title)
-            ws.cell(row=row, column=2, value=last_row[key])
-            row += 1
-
-        # Пустая строка
-        row += 1
-
-        # --- Заголовки для построчных данных (то, что идёт в регистры) ---
-        headers = [
-            "Время (с)",
-            "Пирометр 1 (°C)",
-            "Пирометр 2 (°C)",
-            "Давление (кН)",
-            "Раствор (мм)",
-            "Скорость валков (об/с)",
-            "Скорость левой группы рольгангов (об/с)",
-            "Скорость правой группы рольгангов (об/с)",
-            "Момент прокатки (кН·м)",
-            "Мощность прокатки (кВт)",
-        ]
-
-        header_row = row
-        for col, name in enumerate(headers, start=1):
-            cell = ws.cell(row=header_row, column=col, value=name)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        # Первая строка для данных
-        self.excel_next_row = header_row + 1
-
-        # Можно чуть растянуть ширину колонок
-        for col in range(1, len(headers) + 1):
-            col_letter = ws.cell(row=header_row, column=col).column_letter
-            ws.column_dimensions[col_letter].width = 14
-
-        # Сохранить структуру файла
-        self.excel_wb.save(self.excel_filename)
-
-    def _log_step_to_excel(self, sim_data: dict, idx: int):
+        self.excel_filename = self._file_prefix() + now.strftime("%H:%M:%S_%d.%m.%Y.xlsx")
+        self.excel.open(self.excel_filename, slab_params(last_row))
+
+    def _log_step_to_excel(self, step: list):
         """
-        Записать один шаг симуляции (индекс idx) в Excel.
+        Поставить один шаг симуляции (значения в порядке колонок журнала) в очередь Excel-лога.
         Логируются только те значения, которые реально идут в регистры.
         """
-        if not (self.excel_wb and self.excel_ws and self.excel_next_row):
-            return  # логирование ещё не настроено
-
-        ws = self.excel_ws
-        r = self.excel_next_row
-
-        def get(key, default=0.0):
-            if key not in sim_data:
-                return default
-            val = sim_data[key]
-            if isinstance(val, list):
-                if 0 <= idx < len(val):
-                    return val[idx]
-                return default
-            return val
-
-        row_data = [
-            get("Time", 0.0),
-            get("Pyro1", 0.0),
-            get("Pyro2", 0.0),
-            get("Pressure", 0.0),
-            get("Gap", 0.0),
-            get("VRPM", 0.0),
-            get("V0RPM", 0.0),
-            get("V1RPM", 0.0),
-            get("Moment", 0.0),
-            get("Power", 0.0),
-        ]
-
-        for c, value in enumerate(row_data, start=1):
-            ws.cell(row=r, column=c, value=value)
-
-        self.excel_next_row += 1
-
-        # Для простоты сохраняем файл каждый шаг (можно оптимизировать при необходимости)
-        self.excel_wb.save(self.excel_filename)
+        self.excel.log_step(tuple(step[col] for col in EXCEL_COLUMNS))
 
     # ===================== Логика аварийной остановки =====================
 
-    async def alarm_stop(self, diff: int):
+    async def alarm_stop(self):
         """Асинхронное выполнение последовательности аварийной остановки."""
         async with self.simulation_lock:
             self.simulation_in_progress = True
             try:
-                alarm_data = self.simulator.Alarm_stop()
-                await self._write_alarm_data_to_registers(alarm_data, diff)
+                # Неопубликованные шаги прерванной фазы пропускаются
+                self.cursor = self.simulator.cursor
+                await self._write_alarm_data_to_registers(self.simulator.steps_alarm_stop())
+                self._flush_logs()
             finally:
                 self.simulation_in_progress = False
 
-    async def _write_alarm_data_to_registers(self, alarm_data: dict, diff: int):
-        """Асинхронно записывает данные аварийной остановки в регистры и Excel."""
-        total_steps = len(alarm_data['Time'])
-        self.nex_idx += diff
-
-        while self.nex_idx != total_steps and not self.stop_monitoring:
-            self._write_single_step_to_registers_sync(alarm_data, self.nex_idx)
-            self.nex_idx += 1
-            await asyncio.sleep(0.1)
+    async def _write_alarm_data_to_registers(self, steps):
+        """Асинхронно рассчитывает и записывает шаги аварийной остановки в регистры и Excel."""
+        self.pacer.begin()
+        self.metrics.begin_phase(steps)
+        try:
+            for start, source in steps:
+                self.metrics.step_computed()
+                if self.stop_monitoring:
+                    break
+                await self.pacer.tick()
+                self._timed_publish(start, source)
+        finally:
+            steps.close()
+            self.metrics.end_phase()
 
     # ===================== Основная инициализация =====================
 
@@ -203,91 +184,75 @@ class AsyncModbusServer:
             
             try:
                 reg32 = self.hr_data_combined.getValues(32, 1)[0]
-                new_reg32 = reg32
 
                 # Сброс выходных регистров и установка начального зазора 350
                 self.hr_data_combined.setValues(12, [0] * 21)
                 gap_regs = float_to_regs(350)
                 self.hr_data_combined.setValues(18, gap_regs)
 
-                while not self.stop_monitoring:
-                    try:
-                        conn = await asyncio.wait_for(
-                            asyncpg.connect(
-                                host="localhost",
-                                database="postgres",
-                                user="postgres",
-                                password="postgres",
-                                port="5432"
-                            ),
-                            timeout=1.0
-                        )
-                        try:
-                            # Проверяем количество записей и удаляем старые
-                            count_result = await conn.fetchrow(
-                                "SELECT COUNT(*) AS count FROM slabs"
-                            )
-                            if count_result and count_result['count'] > 10:
-                                # Оставляем только 3 последние записи
-                                await conn.execute(
-                                    """
-                                    DELETE FROM slabs 
-                                    WHERE id NOT IN (
-                                        SELECT id FROM slabs 
-                                        ORDER BY id DESC 
-                                        LIMIT 3
-                                    )
-                                    """
-                                )
-
-                            last_row = await conn.fetchrow(
-                                "SELECT * FROM slabs ORDER BY id DESC LIMIT 1"
-                            )
-                            if last_row and not last_row['is_used']:
-                                sim = RollingMillSimulator(
-                                    L=0, b=0, h_0=0, S=0, StartTemp=0,
-                                    DV=0, MV=0, MS=0, OutTemp=0, DR=0, SteelGrade=0,
-                                    V0=0, V1=0, VS=0, Dir_of_rot=0,
-                                    d1=0, d2=0, d=0, V_Valk_Per=0, StartS=350
-                                )
-
-                                ms_clean = (last_row['material_slab'] or "").replace(' ', '')
-                                sim.Init(
-                                    Length_slab=last_row['length_slab'],
-                                    Width_slab=last_row['width_slab'],
-                                    Thikness_slab=last_row['thikness_slab'],
-                                    Temperature_slab=last_row['temperature_slab'],
-                                    Material_slab=ms_clean,
-                                    Diametr_roll=last_row['diametr_roll'],
-                                    Material_roll=last_row['material_roll']
-                                )
-
-                                self.simulator = sim
-                                self.initialized = True
-                                new_reg32 = reg32 | 0x10
-                                self.hr_data_combined.setValues(32, [new_reg32])
-
-                                await conn.execute(
-                                    "UPDATE public.slabs SET is_used = TRUE WHERE id = $1",
-                                    last_row['id']
-                                )
-
-                                # Создаём новый Excel-файл для этого запуска
-                                self._create_new_excel_workbook(last_row)
-
-                                self.nex_idx = 0
-                                self.prev_total_steps = 0
-                                self.counter = 0
-                                self.counter2 = 0
-                                break
-                        finally:
-                            await conn.close()
-                    except asyncio.TimeoutError:
-                        # Просто пробуем ещё раз
-                        continue
+                # Предыдущая заготовка закончена: итог уходит в её строку slabs
+                self.telemetry.finish_slab()
+
+                # Заготовка, которую стан не может прокатать, отмечается в slabs,
+                # и ожидание продолжается со следующей
+                while True:
+                    last_row = await self.db.wait_for_slab(lambda: self.stop_monitoring)
+                    if last_row is None:
+                        break
+                    await self._refresh_registry()
+                    if await self.start_slab(last_row):
+                        self.hr_data_combined.setValues(32, [reg32 | 0x10])
+                        break
             finally:
                 self.simulation_in_progress = False
 
+    async def start_slab(self, last_row) -> bool:
+        """
+        Симулятор, файл прогона, Excel-файл и телеметрия для заготовки last_row (запись slabs).
+        False - марки, материала или компоновки заготовки нет в справочнике:
+        причина пишется в строку slabs (reject_reason).
+        """
+        try:
+            sim = self._slab_simulator(last_row)
+        except KeyError as exc:
+            print(f"Заготовка {last_row['id']} пропущена: {exc}")
+            await self.db.reject_slab(last_row['id'], str(exc.args[0]))
+            return False
+        self._begin_slab(last_row, sim)
+        return True
+
+    def _slab_simulator(self, last_row) -> RollingMillSimulator:
+        "Симулятор заготовки; KeyError - марки, материала или компоновки нет в справочнике"
+        sim = RollingMillSimulator.from_slab(last_row, self.layout, self.seed)
+        if Config.LOG_RETENTION > 0:
+            # Сеанс из многих проходов: память журнала не растёт, история - на диске
+            sim.log.set_retention(Config.LOG_RETENTION / sim.time_step, Config.LOG_SPILL_DIR)
+        return sim
+
+    def _begin_slab(self, last_row, sim):
+        if self.simulator is not None:
+            self.simulator.log.close()
+        self.simulator = sim
+        self.initialized = True
+        self.record_every = steps_per(Config.RECORD_DT, sim.time_step)
+        self.excel_every = steps_per(Config.EXCEL_DT, sim.time_step)
+        self.telemetry_every = steps_per(Config.TELEMETRY_DT, sim.time_step)
+
+        self.telemetry.begin_slab(last_row['id'], sim.h_0, sim.StartTemp)
+        self._create_new_recording(last_row)
+        self._create_new_excel_workbook(last_row)
+
+        self.cursor = 0
+        self.counter = 0
+        self.counter2 = 0
+
+    async def _refresh_registry(self):
+        "Справочник стана перед новой заготовкой: файл - если изменился, таблица БД - всегда"
+        if Config.REGISTRY_SOURCE == "db":
+            await self.db.refresh_registry()
+        else:
+            MillRegistry.reload_if_changed()
+
     # ===================== Запуск Modbus-сервера =====================
 
     async def run_server(self, IP: str, port: int):
@@ -295,171 +260,271 @@ class AsyncModbusServer:
         try:
             await StartAsyncTcpServer(context=self.context, address=(IP, port))
         finally:
-            self.stop_monitoring = True
+            await self.close()
+
+    async def close(self):
+        "Остановка автомата и закрытие журналов; общий пул БД закрывает его владелец"
+        self.stop_monitoring = True
+        self._close_recording()
+        if self.simulator is not None:
+            self.simulator.log.close()
+        self.excel.close()
+        await self.telemetry.close()
+        if self._own_db:
+            await self.db.close()
 
     # ===================== Запись данных симуляции =====================
 
-    async def write_simulation_data_to_registers(self, sim_data: dict):
-        """Запись данных симуляции в регистры и Excel."""
+    async def write_simulation_data_to_registers(self, steps) -> bool:
+        """
+        Пошаговое выполнение фазы: steps - генератор фазы симулятора.
+        Каждый шаг периода публикации записывается в журнал, регистры и Excel.
+        Фаза рассчитывается целиком до первого шага; при аварии или сбросе она
+        бросается, и её остаток не попадает в журнал, регистры и Excel.
+        Возвращает True, если фаза дошла до конца.
+        """
+        Alarm = Reset_alarm = False
+        completed = False
         async with self.simulation_lock:
             self.simulation_in_progress = True
             try:
-                total_steps = len(sim_data['Time'])
-                diff = total_steps - self.prev_total_steps
-                self.prev_total_steps = total_steps
-
-                while self.nex_idx != total_steps and not self.stop_monitoring:
-                    self._write_single_step_to_registers_sync(sim_data, self.nex_idx)
-                    self.nex_idx += 1
-                    diff -= 1
+                self.pacer.begin()
+                self.metrics.begin_phase(steps)
+                for start, source in steps:
+                    self.metrics.step_computed()
+                    if self.stop_monitoring:
+                        break
+                    await self.pacer.tick()
+                    self._timed_publish(start, source)
 
                     # Читаем управляющий регистр (адрес 9, индекс 8 относительно начала 1)
                     regs = self.hr_data_combined.getValues(1, 11)
                     reg8 = regs[8]
                     Alarm = bool(reg8 & 0x08)
                     Reset_alarm = bool(reg8 & 0x01)
-
-                    if Alarm:
-                        await self.alarm_stop(diff)
-                        self.initialized = False
-                        return
-
-                    if Reset_alarm:
-                        await self.start_init_from_registers()
-                        self.initialized = False
-                        return
-
-                    await asyncio.sleep(0.1)
+                    if Alarm or Reset_alarm:
+                        break
+                else:
+                    completed = True
             finally:
+                steps.close()
+                self.metrics.end_phase()
                 self.simulation_in_progress = False
 
-    def _write_single_step_to_registers_sync(self, sim_data: dict, idx: int):
+        # Обработчики сами берут simulation_lock, поэтому вызываются после его освобождения
+        if Alarm:
+            await self.alarm_stop()
+            self.initialized = False
+        elif Reset_alarm:
+            self.initialized = False
+            await self.start_init_from_registers()
+        return completed
+
+    def _timed_publish(self, start, source):
+        "Публикация шага с замером её длительности"
+        started = time.perf_counter()
+        self._publish_steps(start, source)
+        self.metrics.step_published(started)
+
+    def _publish_steps(self, start, source):
         """
-        Синхронно записывает данные одного шага симуляции в регистры
-        и добавляет такую же строку в Excel.
+        Синхронно публикует шаги журнала симулятора от курсора до конца.
+        start, source - фаза, которую отдаёт генератор симулятора: при смене фазы
+        её кадры регистров и записи журналов готовятся одним пакетом,
+        дальше публикация шага - срезы готовых данных.
         """
-        keys = [
-            'Pyro1', 'Pyro2', 'Pressure', 'Gap', 'VRPM', 'V0RPM', 'V1RPM',
-            'Moment', 'Power', 'Time'
-        ]
-        regs = []
-        for k in keys:
-            v = sim_data[k][idx] if isinstance(sim_data[k], list) else sim_data[k]
-            regs.extend(float_to_regs(v))
-
-       
-        self.hr_data_combined.setValues(12, regs)
-
-        # Формирование битовых флагов
-        flags = 0
-        StartCap_val = sim_data['StartCap'][idx] if isinstance(sim_data['StartCap'], list) else sim_data['StartCap']
-        EndCap_val = sim_data['EndCap'][idx] if isinstance(sim_data['EndCap'], list) else sim_data['EndCap']
-        Gap_feedback_val = sim_data['Gap_feedback'][idx] if isinstance(sim_data['Gap_feedback'], list) else sim_data['Gap_feedback']
-        Speed_feedback_val = sim_data['Speed_feedback'][idx] if isinstance(sim_data['Speed_feedback'], list) else sim_data['Speed_feedback']
-
-        if StartCap_val:
-            flags |= 0x01
-        if EndCap_val:
-            flags |= 0x02
-        if Gap_feedback_val:
-            flags |= 0x04
-        if Speed_feedback_val:
-            flags |= 0x08
-
-        self.hr_data_combined.setValues(32, [flags])
-
-        # Логирование шага в Excel
-        self._log_step_to_excel(sim_data, idx)
+        phase = self._phase
+        if phase is None or phase.source is not source:
+            phase = self._phase = PhaseFrames(start, source)
+        end = self.simulator.cursor
+
+        if self.cursor < phase.start:
+            # Шаги журнала до начала фазы (например, начальный шаг) ещё не опубликованы
+            block, _ = self.simulator.steps_since(self.cursor, phase.start)
+            self._publish_frames(PhaseFrames(self.cursor, block), 0, block.shape[1])
+            self.cursor = phase.start
+        self._publish_frames(phase, self.cursor - phase.start, end - phase.start)
+        self.cursor = end
+
+    def _publish_frames(self, phase: PhaseFrames, first: int, last: int):
+        """
+        Шаги first..last-1 подготовленной фазы (шаги физики одного периода публикации).
+        В регистры 12..32 одним копированием уходит последний из них - состояние стана
+        на момент публикации; файл прогона, телеметрия и Excel получают шаги со своим
+        прореживанием (record_every, telemetry_every, excel_every).
+        """
+        if last <= first:
+            return
+        self.hr_data_combined.setValues(FRAME_ADDRESS, phase.frames[last - 1].tolist())
+
+        if self.recorder is not None:
+            control = self.hr_data_combined.getValues(CONTROL_REGISTER, 1)[0]
+            steps = self._every(phase, first, last, self.record_every)
+            self.recorder.extend(phase.records[steps], (control, self.status_code))
+        for row in phase.rows(self._every(phase, first, last, self.telemetry_every)):
+            self.telemetry.log_step(row)
+
+        # Логирование шагов в Excel
+        steps = self._every(phase, first, last, self.excel_every)
+        for step in phase.block[:, steps].T.tolist():
+            self._log_step_to_excel(step)
+
+    @staticmethod
+    def _every(phase: PhaseFrames, first: int, last: int, every: int) -> slice:
+        "Срез шагов first..last-1 фазы, чьи индексы в журнале кратны every"
+        return slice(first + (-(phase.start + first)) % every, last, every)
+
+    # ===================== Повтор записанного прогона =====================
+
+    async def replay(self, path: str, loop: bool = False):
+        """
+        Повтор файла прогона без расчёта: записи идут в регистры 12..32 по графику Pacer
+        (по одной на период публикации, см. publish_points), управляющее слово (9)
+        и статус (33) - из тех же записей (файлы версии 2).
+        Симулятор, автомат и журналы не используются. loop - повторять по кругу.
+        """
+        reader = RunReader(path)
+        points = publish_points(reader.field('time'), self.pacer.dt)
+        last_control = None
+        self.pacer.begin()
+        try:
+            while len(points) and not self.stop_monitoring:
+                for first in range(0, len(points), REPLAY_CHUNK):
+                    records = reader.records[points[first:first + REPLAY_CHUNK]]
+                    frames, control = replay_frames(records)
+                    control = control.tolist() if control is not None else [None] * len(frames)
+                    for frame, words in zip(frames.tolist(), control):
+                        if self.stop_monitoring:
+                            return
+                        await self.pacer.tick()
+                        started = time.perf_counter()
+                        if words is not None and words != last_control:
+                            last_control = words
+                            self.status_code = words[1]
+                            self.hr_data_combined.setValues(CONTROL_REGISTER, [words[0]])
+                            self.hr_data_combined.setValues(33, [words[1]])
+                        self.hr_data_combined.setValues(FRAME_ADDRESS, frame)
+                        self.metrics.step_published(started)
+                if not loop:
+                    break
+        finally:
+            reader.close()
 
     # ===================== Мониторинг управляющих регистров =====================
 
     async def monitor_registers(self):
-        """Мониторинг регистров с проверкой блокировки."""
-        while not self.stop_monitoring:
-            if self.simulation_in_progress or self.simulation_lock.locked():
-                await asyncio.sleep(0.1)
-                continue
-
-            if not self.initialized:
-                await asyncio.sleep(0.1)
-                continue
-            
-            regs = self.hr_data_combined.getValues(1, 9)
-            reg8 = regs[8]
-
-            Reset_alarm = bool(reg8 & 0x01)
-            Dir_of_rot_rolg = bool(reg8 & 0x02)
-            Dir_of_rot_valk = Dir_of_rot_rolg
-            Dir_of_rot = Dir_of_rot_rolg
-            Hand_Mode = bool(reg8 & 0x04)
-            Start = bool(reg8 & 0x10)
-            Start_Gap = bool(reg8 & 0x20)
-            Start_Accel = bool(reg8 & 0x40)
-            Start_Roll = bool(reg8 & 0x80)
-            Start_Switch = bool(reg8 & 0x100)
-
-            if Reset_alarm:
-                self.initialized = False
-                await self.start_init_from_registers()
-                continue
-            if Start_Switch:
-                if Start and not self.simulation_in_progress:
-                    # 1. Установка зазора
-                    self.status_code = 4
-                    self.hr_data_combined.setValues(33, [self.status_code])
-                    if Start_Gap and self.counter == 0 and self.counter2 < 2:
-                        Roll_pos = regs_to_float(regs[2], regs[3])
-                        sim_result = self.simulator._Gap_Valk_(Roll_pos, Dir_of_rot_valk)
-                        await self.write_simulation_data_to_registers(sim_result)
-                        self.counter = 1
-                        self.counter2 += 1
-
-                    # 2. Разгон валков
-                    if Start_Accel and self.counter == 1 and self.counter2 < 2:
-                        Num_of_revol_rolls = regs_to_float(regs[0], regs[1])
-                        sim_result = self.simulator._Accel_Valk_(Num_of_revol_rolls, Dir_of_rot_rolg, Dir_of_rot_rolg)
-                        await self.write_simulation_data_to_registers(sim_result)
-                        self.counter = 2
-                        self.counter2 += 1
-
-                    # 3. Подход, проход и выход из валков
-                    if Start_Roll and self.counter == 2 and self.counter2 <= 2:
-                        Num_of_revol_0rollg = regs_to_float(regs[4], regs[5])
-                        Num_of_revol_1rollg = regs_to_float(regs[6], regs[7])
-
-                        sim_result = self.simulator._Approching_to_Roll_(
+        """
+        Мониторинг управляющих регистров. Итерация выполняется сразу после записи
+        в регистры 1..9 и повторяется, пока меняет состояние автомата; в покое цикл
+        ждёт следующей записи (раз в MONITOR_IDLE_TIMEOUT проверяется stop_monitoring).
+        """
+        commands = self.hr_data_combined.watch(COMMAND_REGISTERS)
+        try:
+            while not self.stop_monitoring:
+                await self._monitor_step(commands)
+        finally:
+            commands.close()
+
+    async def _monitor_step(self, commands):
+        "Одна итерация автомата по управляющим регистрам"
+        if self.simulation_in_progress or self.simulation_lock.locked():
+            # Идёт чужая последовательность (инициализация, авария) - ждём её окончания
+            async with self.simulation_lock:
+                return
+
+        state = (self.initialized, self.status_code, self.counter, self.counter2)
+        await self._handle_commands()
+        if state == (self.initialized, self.status_code, self.counter, self.counter2):
+            # Состояние устоялось: следующая итерация - по записи ПЛК
+            await commands.wait(MONITOR_IDLE_TIMEOUT)
+        else:
+            await asyncio.sleep(0)
+
+    async def _handle_commands(self):
+        "Разбор управляющего слова и запуск фаз прокатки"
+        if not self.initialized:
+            return
+
+        regs = self.hr_data_combined.getValues(1, 9)
+        reg8 = regs[8]
+
+        Reset_alarm = bool(reg8 & 0x01)
+        Dir_of_rot_rolg = bool(reg8 & 0x02)
+        Dir_of_rot_valk = Dir_of_rot_rolg
+        Dir_of_rot = Dir_of_rot_rolg
+        Hand_Mode = bool(reg8 & 0x04)
+        Start = bool(reg8 & 0x10)
+        Start_Gap = bool(reg8 & 0x20)
+        Start_Accel = bool(reg8 & 0x40)
+        Start_Roll = bool(reg8 & 0x80)
+        Start_Switch = bool(reg8 & 0x100)
+
+        if Reset_alarm:
+            self.initialized = False
+            await self.start_init_from_registers()
+            return
+        if Start_Switch:
+            if Start and not self.simulation_in_progress:
+                # 1. Установка зазора
+                self.status_code = 4
+                self.hr_data_combined.setValues(33, [self.status_code])
+                if Start_Gap and self.counter == 0 and self.counter2 < 2:
+                    Roll_pos = decode_setpoints(regs)[1]
+                    await self.write_simulation_data_to_registers(
+                        self.simulator.steps_gap_valk(Roll_pos, Dir_of_rot_valk))
+                    self.counter = 1
+                    self.counter2 += 1
+
+                # 2. Разгон валков
+                if Start_Accel and self.counter == 1 and self.counter2 < 2:
+                    Num_of_revol_rolls = decode_setpoints(regs)[0]
+                    await self.write_simulation_data_to_registers(
+                        self.simulator.steps_accel_valk(Num_of_revol_rolls, Dir_of_rot_rolg, Dir_of_rot_rolg))
+                    self.counter = 2
+                    self.counter2 += 1
+
+                # 3. Подход, проход и выход из валков
+                if Start_Roll and self.counter == 2 and self.counter2 <= 2:
+                    _, _, Num_of_revol_0rollg, Num_of_revol_1rollg = decode_setpoints(regs)
+
+                    # Следующая фаза стартует только после завершения предыдущей
+                    completed = await self.write_simulation_data_to_registers(
+                        self.simulator.steps_approach(
                             Dir_of_rot,
                             Num_of_revol_0rollg,
                             Num_of_revol_1rollg,
-                        )
-                        await self.write_simulation_data_to_registers(sim_result)
-
-                        sim_result = self.simulator._simulate_rolling_pass()
-                        await self.write_simulation_data_to_registers(sim_result)
-
-                        sim_result = self.simulator._simulate_exit_from_rolls()
-                        await self.write_simulation_data_to_registers(sim_result)
-
-                        self.counter2 += 1
-                    else:
-                        self.status_code = 3
-                        self.hr_data_combined.setValues(33, [self.status_code])
-                        self.counter = 0
-                        self.counter2 = 0
+                        ))
+                    if completed:
+                        completed = await self.write_simulation_data_to_registers(
+                            self.simulator.steps_rolling_pass())
+                    if completed:
+                        self.telemetry.pass_done(self.simulator.S, self.simulator.log.last()[TEMP],
+                                                 self.simulator.pass_values["Effort"] / 1000)
+                        await self.write_simulation_data_to_registers(
+                            self.simulator.steps_exit_from_rolls())
+                    # Конец прохода: файл прогона и Excel-лог сбрасываются на диск
+                    self._flush_logs()
+
+                    self.counter2 += 1
                 else:
-                    self.status_code = 2
+                    self.status_code = 3
                     self.hr_data_combined.setValues(33, [self.status_code])
                     self.counter = 0
                     self.counter2 = 0
-                    self.nex_idx = 0
-                    self.prev_total_steps = 0
-                    RollingMillSimulator.clear_logs(self.simulator)
-            await asyncio.sleep(0.1)
+            else:
+                self.status_code = 2
+                self.hr_data_combined.setValues(33, [self.status_code])
+                self.counter = 0
+                self.counter2 = 0
+                self.cursor = 0
+                RollingMillSimulator.clear_logs(self.simulator)
 
 # ===================== Точка входа =====================
 
 async def main():
     server = AsyncModbusServer()
+    metrics = MetricsExporter([server])
+    await metrics.start()
 
     server_task = asyncio.create_task(server.run_server("192.168.0.99", 55000))
 
@@ -0,0 +1,306 @@
+import asyncio
+import random
+import time
+
+import asyncpg
+
+import Config
+from Metrics import Timing
+import MillRegistry
+
+# Канал уведомлений о новых заготовках
+SLABS_CHANNEL = "slabs_new"
+
+# Триггер на вставку в slabs: NOTIFY в SLABS_CHANNEL с id новой записи.
+# Ставится при открытии пула; advisory lock не даёт нескольким серверам ставить его одновременно.
+SLABS_TRIGGER = f"""
+    SELECT pg_advisory_xact_lock(hashtext('{SLABS_CHANNEL}'));
+
+    CREATE OR REPLACE FUNCTION slabs_notify_new() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{SLABS_CHANNEL}', NEW.id::text);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS slabs_notify_new ON slabs;
+    CREATE TRIGGER slabs_notify_new AFTER INSERT ON slabs
+        FOR EACH ROW EXECUTE FUNCTION slabs_notify_new();
+"""
+
+# Колонки slabs, которые дописывает сервер: итог заготовки (TelemetrySink) и причина
+# отказа от заготовки (reject_slab). Добавляются при открытии пула, до подготовки
+# SLAB_QUERIES: ALTER TABLE slabs при подготовленных запросах к ней ломает их
+# ("cached plan must not change result type")
+SLABS_SCHEMA = f"""
+    SELECT pg_advisory_xact_lock(hashtext('{SLABS_CHANNEL}'));
+
+    ALTER TABLE slabs
+        ADD COLUMN IF NOT EXISTS final_thickness   real,
+        ADD COLUMN IF NOT EXISTS final_temperature real,
+        ADD COLUMN IF NOT EXISTS pass_count        integer,
+        ADD COLUMN IF NOT EXISTS peak_effort       real,
+        ADD COLUMN IF NOT EXISTS reject_reason     text;
+"""
+
+# Колонки захваченной заготовки: явный список, чтобы тип результата claim
+# не зависел от колонок, добавленных в slabs позже
+SLAB_COLUMNS = ("id", "length_slab", "width_slab", "thikness_slab", "temperature_slab",
+                "material_slab", "diametr_roll", "material_roll")
+
+# Запросы к таблице slabs; готовятся один раз на каждое соединение пула
+SLAB_QUERIES = {
+    "count": "SELECT COUNT(*) AS count FROM slabs",
+    # Оставляем 3 последние использованные записи, неиспользованные не трогаем
+    "trim": """
+        DELETE FROM slabs
+        WHERE is_used AND id NOT IN (
+            SELECT id FROM slabs
+            WHERE is_used
+            ORDER BY id DESC
+            LIMIT 3
+        )
+    """,
+    # Захват самой старой неиспользованной заготовки (FIFO) одной транзакцией:
+    # строки, уже захваченные другим сервером, пропускаются
+    "claim": f"""
+        UPDATE slabs SET is_used = TRUE
+        WHERE id = (
+            SELECT id FROM slabs
+            WHERE is_used IS NOT TRUE
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {", ".join(SLAB_COLUMNS)}
+    """,
+}
+
+# Отказ от захваченной заготовки (марки, материала или компоновки нет в справочнике):
+# строка остаётся is_used, причина пишется в reject_reason
+SLAB_REJECT = "UPDATE slabs SET reject_reason = $2 WHERE id = $1"
+
+# Справочник стана (MillRegistry) в БД: kind - раздел (MillRegistry.SECTIONS), name - имя
+# записи, params - её параметры (jsonb; у компоновки по умолчанию "default": true).
+# Таблица необязательна, поэтому запрос не готовится вместе с SLAB_QUERIES.
+REGISTRY_QUERY = "SELECT kind, name, params FROM mill_registry"
+
+# Порог количества записей, после которого таблица подрезается
+SLABS_KEEP_LIMIT = 10
+
+
+class SlabConnection(asyncpg.Connection):
+    "Соединение пула с подготовленными запросами SLAB_QUERIES"
+    __slots__ = ("statements",)
+
+    async def prepare_slab_queries(self):
+        self.statements = {name: await self.prepare(sql) for name, sql in SLAB_QUERIES.items()}
+
+
+class Backoff:
+    "Экспоненциально растущая пауза со случайным разбросом (full jitter)"
+
+    def __init__(self, minimum=Config.DB_RETRY_MIN, maximum=Config.DB_RETRY_MAX, factor=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        self._ceiling = self.minimum
+
+    def next(self) -> float:
+        "Очередная пауза (с); верхняя граница растёт до maximum"
+        delay = random.uniform(self.minimum, self._ceiling)
+        self._ceiling = min(self._ceiling * self.factor, self.maximum)
+        return delay
+
+
+class SlabDatabase:
+    """
+    Очередь заготовок в таблице slabs через общий пул соединений asyncpg.
+    Пул создаётся при первом обращении (или open()), соединения после сбоя БД
+    он восстанавливает сам. Новые записи приходят через LISTEN на отдельном
+    соединении; при его потере очередь опрашивается с паузами Backoff.
+    """
+
+    def __init__(self, settings: dict | None = None,
+                 min_size=Config.DB_POOL_MIN, max_size=Config.DB_POOL_MAX):
+        self.settings = settings or Config.db_settings()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool: asyncpg.Pool | None = None
+        self.last_error: Exception | None = None
+
+        # Соединение для LISTEN и события "в slabs появилась запись" - по одному на каждого
+        # ожидающего (wait_for_slab): сброс своего события не гасит уведомление другим станам
+        self._listener: asyncpg.Connection | None = None
+        self._waiters: set[asyncio.Event] = set()
+        # Триггер SLABS_TRIGGER: после неудачной установки пул работает без уведомлений,
+        # установка повторяется не чаще раза в Config.DB_RETRY_MAX
+        self._trigger_installed = False
+        self._trigger_retry_at = 0.0
+        # Пулом и LISTEN могут пользоваться несколько станов процесса одновременно
+        self._open_lock = asyncio.Lock()
+
+        # Время создания пула и захвата заготовки (claim_slab)
+        self.open_time = Timing()
+        self.claim_time = Timing()
+
+    async def open(self):
+        if self.pool is not None and self._trigger_installed:
+            return
+        async with self._open_lock:
+            if self.pool is None:
+                started = time.perf_counter()
+                await self._migrate()
+                self.pool = await asyncpg.create_pool(
+                    **self.settings,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    timeout=Config.DB_CONNECT_TIMEOUT,
+                    connection_class=SlabConnection,
+                    init=SlabConnection.prepare_slab_queries,
+                )
+                self.open_time.add(time.perf_counter() - started)
+            if not self._trigger_installed and time.monotonic() >= self._trigger_retry_at:
+                await self._install_trigger()
+
+    async def _migrate(self):
+        """
+        Колонки SLABS_SCHEMA на отдельном соединении до создания пула. Без прав на
+        ALTER TABLE сервер работает дальше: не записываются только итоги и отказы.
+        """
+        conn = await asyncpg.connect(**self.settings, timeout=Config.DB_CONNECT_TIMEOUT)
+        try:
+            async with conn.transaction():
+                await conn.execute(SLABS_SCHEMA)
+        except asyncpg.PostgresError as exc:
+            print(f"Колонки slabs не добавлены: {exc!r}")
+        finally:
+            await conn.close()
+
+    async def _install_trigger(self):
+        "Установка SLABS_TRIGGER; при ошибке заготовки ждутся опросом с паузами Backoff"
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(SLABS_TRIGGER)
+            self._trigger_installed = True
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError,
+                asyncpg.InterfaceError) as exc:
+            self._trigger_retry_at = time.monotonic() + Config.DB_RETRY_MAX
+            print(f"Триггер {SLABS_CHANNEL} не установлен, очередь опрашивается: {exc!r}")
+
+    async def close(self):
+        await self._drop_listener()
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            await pool.close()
+
+    async def _listen(self):
+        "Поднимает соединение LISTEN, если его нет или оно разорвано"
+        if self._listener is not None and not self._listener.is_closed():
+            return
+        async with self._open_lock:
+            if self._listener is not None and not self._listener.is_closed():
+                return
+            await self._drop_listener()
+            listener = await asyncpg.connect(**self.settings, timeout=Config.DB_CONNECT_TIMEOUT)
+            await listener.add_listener(SLABS_CHANNEL, self._on_notify)
+            self._listener = listener
+
+    async def _drop_listener(self):
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            if not listener.is_closed():
+                await listener.close()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        for event in self._waiters:
+            event.set()
+
+    async def claim_slab(self):
+        "Захватывает самую старую неиспользованную запись slabs (is_used := TRUE); None, если их нет"
+        await self.open()
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            stmt = conn.statements
+            row = await stmt["claim"].fetchrow()
+            if await stmt["count"].fetchval() > SLABS_KEEP_LIMIT:
+                await stmt["trim"].fetch()
+        self.claim_time.add(time.perf_counter() - started)
+        return row
+
+    async def reject_slab(self, slab_id, reason: str):
+        "Отметка захваченной заготовки, которую стан не может прокатать; ошибка БД только печатается"
+        if slab_id is None:
+            return
+        try:
+            await self.open()
+            async with self.pool.acquire() as conn:
+                await conn.execute(SLAB_REJECT, slab_id, reason)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError,
+                asyncpg.InterfaceError) as exc:
+            print(f"Отказ от заготовки {slab_id} не записан в slabs: {exc!r}")
+
+    def stats(self) -> dict:
+        "Время создания пула и захвата заготовок (с)"
+        return {
+            "open": self.open_time.stats(),
+            "claim": self.claim_time.stats(),
+            "pool_size": self.pool.get_size() if self.pool is not None else 0,
+        }
+
+    async def refresh_registry(self) -> bool:
+        """
+        Перечитывает справочник стана из таблицы mill_registry и делает его текущим.
+        При ошибке остаётся прежний справочник (или файл Config.REGISTRY_FILE). True - обновлён.
+        """
+        try:
+            await self.open()
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(REGISTRY_QUERY)
+            MillRegistry.install(MillRegistry.MillRegistry.from_rows(rows, source="mill_registry"))
+            return True
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError,
+                ValueError, KeyError, TypeError) as exc:
+            print(f"Справочник стана из БД не обновлён: {exc!r}")
+            return False
+
+    async def wait_for_slab(self, stopped=lambda: False):
+        """
+        Ожидание новой заготовки. Очередь проверяется сразу и после каждого NOTIFY;
+        без уведомлений (или при недоступной БД) - с растущей паузой Backoff.
+        Возвращает захваченную запись slabs или None, если stopped() стало истинным.
+        """
+        backoff = Backoff()
+        notified = asyncio.Event()
+        self._waiters.add(notified)
+        try:
+            return await self._wait_for_slab(stopped, backoff, notified)
+        finally:
+            self._waiters.discard(notified)
+
+    async def _wait_for_slab(self, stopped, backoff, notified):
+        while not stopped():
+            # Сброс до проверки очереди: NOTIFY, пришедший во время claim, не теряется
+            notified.clear()
+            try:
+                await self.open()
+                await self._listen()
+                row = await self.claim_slab()
+                self.last_error = None
+                if row is not None:
+                    return row
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError,
+                    asyncpg.InterfaceError) as exc:
+                if type(exc) is not type(self.last_error):
+                    print(f"Ошибка БД: {exc!r}")
+                self.last_error = exc
+            try:
+                await asyncio.wait_for(notified.wait(), backoff.next())
+                backoff.reset()
+            except asyncio.TimeoutError:
+                pass
+        return None
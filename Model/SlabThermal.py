@@ -0,0 +1,168 @@
+import numpy as np
+
+# Тепловая модель сляба по толщине: одномерная неявная конечно-объёмная схема
+# (обратный Эйлер) на половине толщины - от оси сляба (симметрия) до поверхности.
+# Все расчёты ведутся пачкой: профили [сляб, узел], толщины и ширины [сляб].
+# Шаг схемы - трёхдиагональная система, решаемая прогонкой сразу для всех слябов.
+
+STEEL_CONDUCTIVITY = 28.0  # Теплопроводность стали (Вт/(м*К))
+STEEL_DENSITY = 7800.0  # Плотность (кг/м3)
+STEEL_HEAT_CAPACITY = 650.0  # Удельная теплоёмкость (Дж/(кг*К))
+EMISSIVITY = 0.8  # Степень черноты окисленной поверхности
+STEFAN_BOLTZMANN = 5.67e-8  # Постоянная Стефана-Больцмана (Вт/(м2*К4))
+CONVECTION = 20.0  # Коэффициент конвективной теплоотдачи на воздухе (Вт/(м2*К))
+ROLL_CONTACT = 20000.0  # Коэффициент теплопередачи в контакте с валками (Вт/(м2*К))
+
+NODES = 25  # Узлов по половине толщины
+GRID_POWER = 2  # Сгущение сетки к поверхности: шаг у поверхности в (NODES - 1) раз мельче осевого
+RELINEARIZE_DT = 1.0  # Период пересчёта коэффициента излучения по температуре поверхности (с)
+CONTACT_SUBSTEPS = 10  # Подшагов на время контакта с валками
+
+
+def grid(nodes=NODES):
+    "Относительные координаты узлов от оси (0) до поверхности (1), сгущённые к поверхности"
+    u = np.linspace(0.0, 1.0, nodes)
+    return 1.0 - (1.0 - u) ** GRID_POWER
+
+
+def _cells(z):
+    "Относительные объёмы ячеек узлов и расстояния между соседними узлами"
+    gaps = np.diff(z)
+    volume = np.empty_like(z)
+    volume[0] = gaps[0] / 2
+    volume[-1] = gaps[-1] / 2
+    volume[1:-1] = (gaps[:-1] + gaps[1:]) / 2
+    return volume, gaps
+
+
+def radiation(surface, ambient):
+    "Коэффициент теплоотдачи излучением, линеаризованный по температуре поверхности (Вт/(м2*К))"
+    Ts = np.asarray(surface) + 273.15
+    Ta = np.asarray(ambient) + 273.15
+    return EMISSIVITY * STEFAN_BOLTZMANN * (Ts ** 2 + Ta ** 2) * (Ts + Ta)
+
+
+def solve_tridiagonal(lower, diag, upper, rhs):
+    """
+    Прогонка (алгоритм Томаса) для пачки трёхдиагональных систем.
+    lower, diag, upper - [сляб, узел] (lower[:, 0] и upper[:, -1] не используются),
+    rhs - [сляб, узел, ...] с любым числом правых частей.
+    """
+    n = diag.shape[1]
+    rhs = np.array(rhs, dtype=np.float64)
+    extra = (slice(None),) + (None,) * (rhs.ndim - 2)
+    c = np.empty_like(diag)
+    c[:, 0] = upper[:, 0] / diag[:, 0]
+    rhs[:, 0] /= diag[:, 0][extra]
+    for i in range(1, n):
+        m = diag[:, i] - lower[:, i] * c[:, i - 1]
+        c[:, i] = upper[:, i] / m
+        rhs[:, i] -= lower[:, i][extra] * rhs[:, i - 1]
+        rhs[:, i] /= m[extra]
+    for i in range(n - 2, -1, -1):
+        rhs[:, i] -= c[:, i][extra] * rhs[:, i + 1]
+    return rhs
+
+
+def implicit_step(thickness, width, h_face, h_side, env, dt, z):
+    """
+    Шаг обратного Эйлера в виде T' = P @ T + q для пачки слябов.
+    thickness, width - мм; h_face - теплоотдача с верхней и нижней граней, h_side -
+    с боковых (сток, распределённый по толщине), env - температура среды (°C).
+    Матрица системы трёхдиагональная; P и q получаются одной прогонкой
+    с правыми частями diag(c) и вектором среды, поэтому шаги с постоянными
+    коэффициентами сводятся к умножению на P. dt - скаляр или [сляб].
+    """
+    half = np.asarray(thickness, dtype=np.float64) / 2000  # Половина толщины (м)
+    side = 2.0 / (np.asarray(width, dtype=np.float64) / 1000)  # Площадь боковых граней на объём (1/м)
+    volume, gaps = _cells(z)
+    V = half[:, None] * volume  # Объёмы ячеек на единицу площади (м)
+    G = STEEL_CONDUCTIVITY / (half[:, None] * gaps)  # Проводимости между узлами (Вт/(м2*К))
+    C = STEEL_DENSITY * STEEL_HEAT_CAPACITY * V / np.reshape(dt, (-1, 1))
+    sink = V * (np.asarray(h_side) * side)[:, None]
+    sink[:, -1] += h_face
+
+    lower = np.zeros_like(V)
+    upper = np.zeros_like(V)
+    lower[:, 1:] = -G
+    upper[:, :-1] = -G
+    diag = C + sink
+    diag[:, 1:] += G
+    diag[:, :-1] += G
+
+    nodes = len(z)
+    rhs = np.zeros((len(half), nodes, nodes + 1))
+    rhs[:, np.arange(nodes), np.arange(nodes)] = C
+    rhs[:, :, nodes] = sink * np.asarray(env, dtype=np.float64)[..., None]
+    solved = solve_tridiagonal(lower, diag, upper, rhs)
+    return solved[:, :, :nodes], solved[:, :, nodes]
+
+
+class SlabThermal:
+    """
+    Профили температуры по толщине пачки слябов (profile [сляб, узел], °C).
+    Средняя по толщине температура идёт в расчёт сопротивления деформации,
+    температура поверхности - в показания пирометров.
+    """
+
+    def __init__(self, temperature, thickness, width, nodes=NODES):
+        self.z = grid(nodes)
+        self.weights = _cells(self.z)[0] / _cells(self.z)[0].sum()
+        self.reset(temperature, thickness, width)
+
+    def reset(self, temperature, thickness, width):
+        "Равномерный профиль (выдача из печи)"
+        self.thickness = np.atleast_1d(np.asarray(thickness, dtype=np.float64)).copy()
+        self.width = np.broadcast_to(np.asarray(width, dtype=np.float64), self.thickness.shape).copy()
+        temperature = np.broadcast_to(np.asarray(temperature, dtype=np.float64), self.thickness.shape)
+        self.profile = np.repeat(temperature[:, None], len(self.z), axis=1)
+
+    @property
+    def mean(self):
+        return self.profile @ self.weights
+
+    @property
+    def core(self):
+        return self.profile[:, 0]
+
+    @property
+    def surface(self):
+        return self.profile[:, -1]
+
+    def advance(self, n, dt, ambient, h_face=None):
+        """
+        n шагов dt с теплоотдачей излучением и конвекцией в среду ambient
+        (или с заданным коэффициентом h_face на гранях, например в контакте с валками).
+        dt - скаляр или [сляб]. Возвращает средние, осевые и поверхностные
+        температуры по шагам [сляб, шаг].
+        """
+        out = np.empty((3, len(self.thickness), n))
+        every = max(int(round(RELINEARIZE_DT / np.max(dt))), 1)
+        for first in range(0, n, every):
+            air = radiation(self.surface, ambient) + CONVECTION
+            P, q = implicit_step(self.thickness, self.width, air if h_face is None else h_face,
+                                 air, ambient, dt, self.z)
+            for k in range(first, min(first + every, n)):
+                self.profile = np.matmul(P, self.profile[:, :, None])[:, :, 0] + q
+                out[:, :, k] = self.mean, self.core, self.surface
+        return out
+
+    def roll_bite(self, contact_time, roll_temp, heating, thickness):
+        """
+        Проход через валки: охлаждение граней в контакте с валками за contact_time (с),
+        равномерный разогрев от пластической деформации heating (°C) и новая толщина (мм).
+        """
+        contact_time = np.broadcast_to(np.asarray(contact_time, dtype=np.float64), self.thickness.shape)
+        if contact_time.any():
+            # Слябы без контакта (нулевое время) за подшаги нулевой длины не меняются
+            substep = np.maximum(contact_time, 1e-9) / CONTACT_SUBSTEPS
+            self.advance(CONTACT_SUBSTEPS, substep, roll_temp, ROLL_CONTACT)
+        self.profile += np.asarray(heating, dtype=np.float64).reshape(-1, 1)
+        self.thickness = np.broadcast_to(np.asarray(thickness, dtype=np.float64),
+                                         self.thickness.shape).copy()
+
+    def cooling(self, ambient, dt):
+        "Температуры шагов фазы на воздухе для ядер PhaseKernels (первый сляб пачки)"
+        def temps(n, unclamped=0):
+            return self.advance(n, dt, ambient)[:, 0]
+        return temps
@@ -0,0 +1,207 @@
+import os
+import tempfile
+
+import numpy as np
+
+# Порядок колонок в записи одного шага симуляции.
+# Шаг передаётся в журнал одним кортежем именно в этом порядке.
+COLUMNS = (
+    'time',       # Время (с)
+    'gap',        # Раствор валков (мм)
+    'speed_V',    # Скорость валков
+    'temp',       # Температура сляба (°C)
+    'pyro1',      # Пирометр перед валками (°C)
+    'pyro2',      # Пирометр после валков (°C)
+    'x',          # Начальная координата сляба (мм)
+    'x1',         # Конечная координата сляба (мм)
+    'speed_V0',   # Скорость рольгангов до валков
+    'speed_V1',   # Скорость рольгангов после валков
+    'length',     # Длина сляба (мм)
+    'effort',     # Усилие прокатки (кН)
+    'moment',     # Момент прокатки (кН*м)
+    'power',      # Мощность прокатки (кВт)
+    'left_cap',   # Левый концевик
+    'right_cap',  # Правый концевик
+    'gap_fb',     # Флаг выхода раствора на уставку
+    'speed_fb',   # Флаг выхода скорости валков на уставку
+    'temp_core',  # Температура на оси сляба (°C)
+    'temp_surf',  # Температура поверхности сляба (°C)
+)
+
+(T, GAP, SPEED_V, TEMP, PYRO1, PYRO2, X, X1, SPEED_V0, SPEED_V1, LENGTH,
+ EFFORT, MOMENT, POWER, LEFT_CAP, RIGHT_CAP, GAP_FB, SPEED_FB, TEMP_CORE, TEMP_SURF) = range(len(COLUMNS))
+
+# Количество знаков после запятой при выдаче наружу (None - флаг, выдаётся целым);
+# время - до миллисекунды (наименьший шаг физики)
+DECIMALS = (3, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, None, None, None, None, 2, 2)
+
+
+def round_block(block):
+    "Копия блока шагов [колонка, шаг], округлённая по DECIMALS"
+    out = np.empty_like(block)
+    for idx, decimals in enumerate(DECIMALS):
+        np.round(block[idx], decimals or 0, out=out[idx])
+    return out
+
+
+class TelemetryLog:
+    """
+    Колоночный журнал шагов симуляции на типизированных массивах float64.
+    Индексы шагов сквозные (с последнего clear). После set_retention в памяти
+    держится окно из последних шагов фиксированного размера, а более старые
+    блоками уходят в файл на диске; read() отдаёт любой диапазон из обоих мест.
+    """
+
+    def __init__(self, first_step, capacity=1024):
+        self._data = np.empty((len(COLUMNS), max(int(capacity), 1)), dtype=np.float64)
+        self._size = 0  # Всего шагов
+        self._base = 0  # Индекс первого шага в памяти (до него - в файле)
+        self.retention = None  # Шагов, которые гарантированно остаются в памяти
+        self._spill_dir = None
+        self._spill = None  # Файл вытесненных шагов [шаг, колонка] (создаётся при первом вытеснении)
+        self.append(first_step)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def base(self):
+        "Индекс первого шага, который ещё в памяти"
+        return self._base
+
+    def set_retention(self, steps, spill_dir=None):
+        """
+        Держать в памяти последние steps шагов (окно на 2 * steps шагов), старые
+        вытеснять в файл в spill_dir (по умолчанию - временный каталог системы).
+        steps = None - всё в памяти, как без вызова.
+        """
+        self.retention = None if steps is None else max(int(steps), 1)
+        self._spill_dir = spill_dir or None
+        if self.retention is not None:
+            used = self._size - self._base
+            self._resize(max(2 * self.retention, used))
+
+    def _resize(self, capacity):
+        used = self._size - self._base
+        data = np.empty((len(COLUMNS), capacity), dtype=np.float64)
+        data[:, :used] = self._data[:, :used]
+        self._data = data
+
+    def reserve(self, steps):
+        """
+        Освобождает место под steps шагов, чтобы фаза не перевыделяла память: без
+        удержания массив растёт вдвое, с удержанием старые шаги вытесняются на диск.
+        """
+        used = self._size - self._base
+        need = used + int(steps)
+        if need <= self.capacity:
+            return
+        if self.retention is None:
+            self._resize(max(need, self.capacity * 2))
+            return
+        keep = min(used, max(self.retention - int(steps), 0))
+        self._spill_oldest(used - keep)
+        if keep + steps > self.capacity:
+            # Фаза длиннее окна: окно растёт до неё
+            self._resize(keep + int(steps))
+
+    def _spill_oldest(self, count):
+        "Вытесняет count самых старых шагов окна в файл одной записью"
+        if count <= 0:
+            return
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(prefix="telemetry_", dir=self._spill_dir)
+        self._spill.seek(0, os.SEEK_END)
+        self._spill.write(np.ascontiguousarray(self._data[:, :count].T).tobytes())
+        self._spill.flush()
+        used = self._size - self._base
+        self._data[:, :used - count] = self._data[:, count:used]
+        self._base += count
+
+    def _read_spilled(self, start, end):
+        "Шаги start..end-1 из файла вытеснения, блок [колонка, шаг]"
+        rows = np.empty((end - start, len(COLUMNS)), dtype=np.float64)
+        self._spill.seek(start * rows.itemsize * len(COLUMNS))
+        self._spill.readinto(memoryview(rows).cast("B"))
+        return rows.T
+
+    def append(self, step):
+        "Добавляет один шаг (кортеж значений в порядке COLUMNS)"
+        if self._size - self._base == self.capacity:
+            self.reserve(1)
+        self._data[:, self._size - self._base] = step
+        self._size += 1
+
+    def extend(self, block):
+        "Добавляет блок шагов [колонка, шаг] одним копированием"
+        steps = block.shape[1]
+        self.reserve(steps)
+        used = self._size - self._base
+        self._data[:, used:used + steps] = block
+        self._size += steps
+
+    def last(self):
+        "Последний шаг в виде списка чисел (индексы - константы колонок)"
+        return self._data[:, self._size - self._base - 1].tolist()
+
+    def column(self, idx):
+        """
+        Представление колонки без копирования: шаги в памяти (с base до конца).
+        При удержании представление действительно до следующего добавления шагов.
+        """
+        return self._data[idx, :self._size - self._base]
+
+    def read(self, start=0, end=None):
+        """
+        Шаги start..end-1 (сквозные индексы) блоком [колонка, шаг]: из памяти - без
+        копирования, с участием файла вытеснения - новым массивом.
+        """
+        end = self._size if end is None else min(end, self._size)
+        start = min(max(start, 0), end)
+        if start >= self._base:
+            return self._data[:, start - self._base:end - self._base]
+        spilled = self._read_spilled(start, min(end, self._base))
+        if end <= self._base:
+            return spilled
+        return np.concatenate((spilled, self._data[:, :end - self._base]), axis=1)
+
+    def rounded(self, columns):
+        """
+        Колонки columns за всё время списками, округлёнными по правилам DECIMALS
+        (флаги - целыми). Журнал, включая файл вытеснения, читается один раз.
+        """
+        block = self.read()
+        out = []
+        for idx in columns:
+            decimals = DECIMALS[idx]
+            if decimals is None:
+                out.append(block[idx].astype(np.int64).tolist())
+            else:
+                out.append(np.round(block[idx], decimals).tolist())
+        return out
+
+    def since(self, cursor, end=None):
+        """
+        Блок шагов [колонка, шаг] с cursor до end (по умолчанию до конца журнала),
+        округлённый по DECIMALS, и новый курсор
+        """
+        end = self._size if end is None else min(end, self._size)
+        return round_block(self.read(cursor, end)), end
+
+    def clear(self, first_step):
+        "Сбрасывает журнал, оставляя только начальный шаг (память и файл вытеснения сохраняются)"
+        self._size = 0
+        self._base = 0
+        if self._spill is not None:
+            self._spill.truncate(0)
+        self.append(first_step)
+
+    def close(self):
+        "Удаляет файл вытеснения"
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
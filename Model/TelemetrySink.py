@@ -0,0 +1,206 @@
+import asyncio
+import time
+
+import asyncpg
+
+import Config
+from RunRecorder import STEP_FIELDS
+from SlabDatabase import Backoff, SlabDatabase
+
+TELEMETRY_TABLE = "rolling_telemetry"
+# Строка таблицы: id заготовки и поля записи шага (значения регистров 12..32)
+TELEMETRY_COLUMNS = ("slab_id",) + tuple(name.lower() for name in STEP_FIELDS)
+
+TELEMETRY_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {TELEMETRY_TABLE} (
+        slab_id  integer NOT NULL,
+        pyro1    real,
+        pyro2    real,
+        effort   real,
+        gap      real,
+        speed_v  real,
+        speed_v0 real,
+        speed_v1 real,
+        moment   real,
+        power    real,
+        time     real,
+        flags    smallint
+    );
+    CREATE INDEX IF NOT EXISTS {TELEMETRY_TABLE}_slab_id ON {TELEMETRY_TABLE} (slab_id);
+"""
+
+# Колонки итога добавляет в slabs SlabDatabase (SLABS_SCHEMA) при открытии пула
+
+SLAB_SUMMARY_UPDATE = """
+    UPDATE slabs
+    SET final_thickness = $2, final_temperature = $3, pass_count = $4, peak_effort = $5
+    WHERE id = $1
+"""
+
+
+class TelemetrySink:
+    """
+    Загрузка построчной телеметрии в rolling_telemetry пачками через COPY.
+    log_step() только складывает строку в текущую пачку; полная пачка (или неполная
+    раз в flush_interval) уходит в очередь, которую разбирает фоновая задача - один
+    copy_records_to_table на пачку. При переполнении очереди пачка отбрасывается
+    и учитывается в dropped_rows. По завершении заготовки итог (толщина, температура,
+    число проходов, наибольшее расчётное усилие прохода) пишется в её строку slabs одной транзакцией;
+    итоги идут отдельной неограниченной очередью (по одному на заготовку) и
+    записываются раньше пачек, поэтому переполнение очереди пачек их не теряет.
+    """
+
+    def __init__(self, db: SlabDatabase, batch_size=Config.TELEMETRY_BATCH,
+                 flush_interval=Config.TELEMETRY_FLUSH_INTERVAL,
+                 max_batches=Config.TELEMETRY_MAX_BATCHES):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_batches)
+        self._summaries: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        self._schema_ready = False
+
+        # Текущая заготовка и её итог
+        self.slab_id = None
+        self._batch = []
+        self.pass_count = 0
+        self.thickness = None
+        self.temperature = None
+        self.peak_effort = 0.0
+
+        # Счётчики
+        self.rows_written = 0
+        self.dropped_rows = 0
+        self.batches_written = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    # ===================== Интерфейс для сервера =====================
+
+    def begin_slab(self, slab_id, thickness, temperature):
+        "Новая заготовка: строки далее относятся к slab_id (итог предыдущей должен быть записан)"
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self.slab_id = slab_id
+        self.pass_count = 0
+        self.thickness = thickness
+        self.temperature = temperature
+        self.peak_effort = 0.0
+
+    def log_step(self, record):
+        "Строка шага (значения в порядке STEP_FIELDS) в текущую пачку"
+        if self.slab_id is None:
+            return
+        self._batch.append((self.slab_id, *record))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def pass_done(self, thickness, temperature, effort):
+        "Завершён проход: толщина после валков, температура на выходе и расчётное усилие (кН)"
+        self.pass_count += 1
+        self.thickness = thickness
+        self.temperature = temperature
+        self.peak_effort = max(self.peak_effort, effort)
+
+    def flush(self):
+        "Отправить неполную пачку в очередь загрузки"
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._put(("rows", batch), len(batch))
+
+    def finish_slab(self):
+        "Заготовка закончена: дописать строки и поставить в очередь запись итога в slabs"
+        if self.slab_id is None:
+            return
+        self.flush()
+        self._summaries.put_nowait(("summary", self.slab_id, float(self.thickness),
+                                    float(self.temperature), self.pass_count,
+                                    float(self.peak_effort)))
+        self.slab_id = None
+
+    async def close(self, timeout=10.0):
+        "Дождаться загрузки очереди и остановить фоновую задачу"
+        self.finish_slab()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(self._queue.join(), self._summaries.join()),
+                                   timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        self._task = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "pending_summaries": self._summaries.qsize(),
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "dropped_rows": self.dropped_rows,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+        }
+
+    # ===================== Фоновая задача =====================
+
+    def _put(self, item, rows=0):
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped_rows += rows
+
+    async def _run(self):
+        while True:
+            # Итоги заготовок - в первую очередь; новый итог ждёт не дольше flush_interval
+            queue = self._queue if self._summaries.empty() else self._summaries
+            try:
+                item = await asyncio.wait_for(queue.get(), self.flush_interval)
+            except asyncio.TimeoutError:
+                # Неполная пачка не задерживается дольше flush_interval
+                self.flush()
+                continue
+            try:
+                await self._store(item)
+            finally:
+                queue.task_done()
+
+    async def _store(self, item):
+        """
+        Запись элемента очереди. Пока БД недоступна - повтор с растущей паузой;
+        ошибка самого запроса повтором не лечится, пачка отбрасывается.
+        """
+        backoff = Backoff()
+        while True:
+            try:
+                await self.db.open()
+                async with self.db.pool.acquire() as conn:
+                    if not self._schema_ready:
+                        await conn.execute(TELEMETRY_SCHEMA)
+                        self._schema_ready = True
+                    if item[0] == "rows":
+                        started = time.perf_counter()
+                        await conn.copy_records_to_table(
+                            TELEMETRY_TABLE, records=item[1], columns=TELEMETRY_COLUMNS)
+                        self.last_flush_latency = time.perf_counter() - started
+                        self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+                        self.rows_written += len(item[1])
+                        self.batches_written += 1
+                    else:
+                        async with conn.transaction():
+                            await conn.execute(SLAB_SUMMARY_UPDATE, *item[1:])
+                return
+            except (OSError, asyncio.TimeoutError, asyncpg.InterfaceError,
+                    asyncpg.PostgresConnectionError, asyncpg.CannotConnectNowError) as exc:
+                print(f"Ошибка записи телеметрии: {exc!r}")
+                await asyncio.sleep(backoff.next())
+            except asyncpg.PostgresError as exc:
+                print(f"Ошибка записи телеметрии: {exc!r}")
+                if item[0] == "rows":
+                    self.dropped_rows += len(item[1])
+                return
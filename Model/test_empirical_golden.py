@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+
+from BatchRunner import roll_slab
+from RollingMillSimulator import RollingMillSimulator
+from TelemetryLog import COLUMNS
+
+# Эталонный журнал эмпирической модели: прокатка заготовок по графикам ниже, записанная
+# ядрами фаз до появления тепловой модели fd. Перезаписывается (python test_empirical_golden.py)
+# только при сознательном изменении эмпирической модели.
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "empirical_passes.npz")
+SEED = 7
+# Допуск: порядок вычислений может меняться, значения - нет
+ATOL = 1e-6
+
+SLAB = {'length_slab': 3000, 'width_slab': 250, 'thikness_slab': 350, 'temperature_slab': 1200,
+        'material_slab': 'Ст3сп', 'diametr_roll': 300, 'material_roll': 'Сталь'}
+PASSES = [{'gap': gap, 'speed': speed} for gap, speed in
+          ((320, 200), (290, 220), (260, 250), (230, 250), (200, 300), (170, 300))]
+# Медленные рольганги: доход до концевика дольше, чем остывание до final_temp
+SLOW_PASSES = [{'gap': gap, 'speed': 200, 'v0': 20, 'v1': 20} for gap in (320, 290)]
+CASES = [
+    (dict(SLAB, id=1), PASSES),
+    (dict(SLAB, id=2, length_slab=2500, width_slab=200, temperature_slab=1150,
+          material_slab='65Г', material_roll='Чугун'), PASSES),
+    (dict(SLAB, id=3, length_slab=6000), SLOW_PASSES),
+]
+
+
+def empirical_logs() -> dict:
+    "Колонки журнала по заготовкам: {'<id>/<колонка>': значения}"
+    logs = {}
+    for slab, passes in CASES:
+        sim = RollingMillSimulator.from_slab(slab, seed=SEED, thermal="empirical")
+        roll_slab(sim, passes)
+        block = sim.log.read()
+        for idx, name in enumerate(COLUMNS):
+            logs[f"{slab['id']}/{name}"] = block[idx].copy()
+    return logs
+
+
+def test_empirical_model_matches_golden():
+    golden = np.load(GOLDEN_FILE)
+    logs = empirical_logs()
+    for key in golden.files:
+        np.testing.assert_allclose(logs[key], golden[key], rtol=0, atol=ATOL, err_msg=key)
+
+
+if __name__ == "__main__":
+    os.makedirs(os.path.dirname(GOLDEN_FILE), exist_ok=True)
+    np.savez_compressed(GOLDEN_FILE, **empirical_logs())
+    print(GOLDEN_FILE, file=sys.stderr)
@@ -0,0 +1,63 @@
+import csv
+import os
+import threading
+
+from openpyxl import load_workbook
+
+from ExcelLogger import EXCEL_HEADERS, PART_SUFFIX, ExcelLogger, ExcelWriter
+
+PARAMS = [("Длина сляба, мм", 3000)]
+ROW = tuple(float(i) for i in range(len(EXCEL_HEADERS)))
+
+
+def _data_rows(filename):
+    rows = list(load_workbook(filename, read_only=True).active.values)
+    return rows[rows.index(tuple(EXCEL_HEADERS)) + 1:]
+
+
+def test_open_does_not_block_on_full_queue(tmp_path):
+    writer = ExcelWriter(max_queue=2)
+    logger = ExcelLogger(writer=writer)
+    first, second = str(tmp_path / "first.xlsx"), str(tmp_path / "second.xlsx")
+    writer.start = lambda: None  # Поток не разбирает очередь, пока она не заполнится
+    logger.open(first, PARAMS)
+    logger.log_step(ROW)
+    logger.log_step(ROW)
+    assert logger.dropped == 1
+
+    opened = threading.Thread(target=logger.open, args=(second, PARAMS))
+    opened.start()
+    opened.join(1.0)
+    assert not opened.is_alive()
+    logger.log_step(ROW)
+    assert logger.dropped == 2
+
+    del writer.start
+    writer.start()
+    logger.close()
+    writer.close()  # Общий поток: файлы дописаны после его остановки
+
+    # Строки остаются в файле, открытом до них
+    assert _data_rows(first) == [ROW]
+    assert _data_rows(second) == []
+    assert not os.path.exists(first + PART_SUFFIX)
+
+
+def test_flush_appends_journal_and_close_saves_workbook(tmp_path):
+    logger = ExcelLogger(flush_interval=60.0)
+    filename = str(tmp_path / "run.xlsx")
+    logger.open(filename, PARAMS)
+    for _ in range(3):
+        logger.log_step(ROW)
+    logger.flush()
+    while logger.flush_count == 0:
+        threading.Event().wait(0.01)
+
+    with open(filename + PART_SUFFIX, newline="", encoding="utf-8") as f:
+        journal = list(csv.reader(f))
+    assert journal[0] == EXCEL_HEADERS and len(journal) == 4
+    assert not os.path.exists(filename)
+
+    logger.close()
+    assert _data_rows(filename) == [ROW] * 3
+    assert not os.path.exists(filename + PART_SUFFIX)
@@ -0,0 +1,107 @@
+import asyncio
+import types
+
+import pytest
+
+import Pacer
+
+
+class Clock:
+    "Монотонное время Pacer: sleep сдвигает его, work() - задержка расчёта шага"
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+    def work(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(Pacer, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(Pacer, "asyncio", types.SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+
+def _run(pacer, clock, work):
+    "Шаги с задержками расчёта work[i] перед каждым tick; моменты выдачи шагов"
+    async def run():
+        published = []
+        pacer.begin()
+        for seconds in work:
+            clock.work(seconds)
+            await pacer.tick()
+            published.append(clock.now)
+        return published
+    return asyncio.run(run())
+
+
+def test_steps_follow_monotonic_deadlines(clock):
+    pacer = Pacer.Pacer(dt=0.1, speed=2.0)
+    published = _run(pacer, clock, [0.0, 0.01, 0.03, 0.02])
+
+    # Время расчёта не накапливается: шаг N - в t0 + N * dt / speed
+    assert published == pytest.approx([100.0, 100.05, 100.1, 100.15])
+    stats = pacer.stats()
+    assert stats["steps"] == 4 and stats["overruns"] == 0 and stats["max_lateness"] == 0
+
+
+def test_late_step_is_overrun_and_schedule_catches_up(clock):
+    pacer = Pacer.Pacer(dt=0.1, speed=1.0)
+    published = _run(pacer, clock, [0.0, 0.25, 0.0, 0.0])
+
+    # Шаг 1 опоздал на 0.15 с (больше периода), шаг 2 (дедлайн 100.2) выдаётся сразу
+    assert published == pytest.approx([100.0, 100.25, 100.25, 100.3])
+    stats = pacer.stats()
+    assert stats["overruns"] == 1 and stats["resyncs"] == 0
+    assert stats["max_lateness"] == pytest.approx(0.15)
+    assert stats["mean_lateness"] == pytest.approx((0.15 + 0.05) / 4)
+    assert stats["jitter"] > 0
+
+
+def test_hopeless_lag_resyncs_schedule(clock):
+    pacer = Pacer.Pacer(dt=0.1, speed=1.0, max_lag=10)
+    published = _run(pacer, clock, [0.0, 2.0, 0.0, 0.0])
+
+    # Отставание больше max_lag периодов: график от момента шага 1
+    assert published == pytest.approx([100.0, 102.0, 102.1, 102.2])
+    stats = pacer.stats()
+    assert stats["resyncs"] == 1 and stats["overruns"] == 1
+
+
+def test_begin_keeps_schedule_only_while_next_deadline_is_ahead(clock):
+    pacer = Pacer.Pacer(dt=0.1, speed=1.0)
+    _run(pacer, clock, [0.0, 0.0])
+    assert _run(pacer, clock, [0.0]) == pytest.approx([100.2])  # Фаза продолжает график
+    clock.work(1.0)
+    assert _run(pacer, clock, [0.0]) == pytest.approx([101.2])  # Новый график
+    assert pacer.stats()["overruns"] == 0
+
+
+@pytest.mark.parametrize("speed", [0, -1, None])
+def test_non_positive_speed_is_unpaced(clock, speed):
+    pacer = Pacer.Pacer(dt=0.1, speed=speed)
+    published = _run(pacer, clock, [0.0, 0.5, 0.0])
+
+    assert pacer.period == 0.0
+    assert published == pytest.approx([100.0, 100.5, 100.5])
+    assert clock.sleeps == [0, 0, 0]  # Только уступка циклу событий
+    stats = pacer.stats()
+    assert stats["steps"] == 3 and stats["overruns"] == 0 and stats["max_lateness"] == 0
+
+
+def test_reset_stats_clears_counters(clock):
+    pacer = Pacer.Pacer(dt=0.1, speed=1.0)
+    _run(pacer, clock, [0.0, 0.25])
+    pacer.reset_stats()
+    assert pacer.stats()["steps"] == 0 and pacer.stats()["overruns"] == 0
+    assert _run(pacer, clock, [0.0]) == pytest.approx([100.25])  # Дедлайн 100.2 прошёл - новый график
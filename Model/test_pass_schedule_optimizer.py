@@ -0,0 +1,31 @@
+import pytest
+
+from PassScheduleOptimizer import PassScheduleOptimizer
+
+SLAB = {'thikness_slab': 200, 'width_slab': 250, 'length_slab': 3000, 'temperature_slab': 1200,
+        'material_slab': 'Ст3сп', 'diametr_roll': 300, 'material_roll': 'Сталь'}
+CASES = [
+    (SLAB, 50),
+    (dict(SLAB, thikness_slab=350), 40),
+    (dict(SLAB, thikness_slab=300), 100),
+    (dict(SLAB, thikness_slab=250, temperature_slab=1150, material_slab='65Г'), 60),
+]
+
+
+@pytest.mark.parametrize("slab, target", CASES)
+def test_passes_schedule_not_longer_than_energy_schedule(slab, target):
+    optimizer = PassScheduleOptimizer()
+    fewest = optimizer.optimize(slab, target, 'passes')["passes"]
+    cheapest = optimizer.optimize(slab, target, 'energy')["passes"]
+
+    assert len(fewest) <= len(cheapest)
+    assert fewest[-1]["gap"] == cheapest[-1]["gap"] == target
+
+
+def test_colder_states_kept_for_bite():
+    # Горячий сляб захватывает меньшее обжатие: 200 -> 50 мм за 4 прохода только на малых скоростях
+    passes = PassScheduleOptimizer().optimize(SLAB, 50, 'passes')["passes"]
+
+    assert len(passes) == 4
+    gaps = [step["gap"] for step in passes]
+    assert gaps == sorted(gaps, reverse=True)
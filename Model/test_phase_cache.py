@@ -0,0 +1,62 @@
+import numpy as np
+
+import PhaseCache
+from BatchRunner import roll_slab
+from PhaseCache import PhaseEntry
+from RollingMillSimulator import RollingMillSimulator
+from test_empirical_golden import PASSES, SLAB
+
+
+def _entry(nbytes):
+    return PhaseEntry(np.zeros(nbytes // 8), [])
+
+
+def test_quantize_rounds_to_key_decimals():
+    assert PhaseCache.quantize(1.00049, 2) == PhaseCache.quantize(1.0, 2)
+    assert PhaseCache.quantize(1.0006) != PhaseCache.quantize(1.0)
+    assert PhaseCache.quantize(-0.0) == PhaseCache.quantize(0.0)
+    assert str(PhaseCache.quantize(-0.0001)[0]) == "0.0"
+    assert PhaseCache.quantize(np.array([1.00001, 2.0])) == PhaseCache.quantize(np.array([1.0, 2.0]))
+    assert PhaseCache.quantize("Ст3сп", 3) == ("Ст3сп", 3)
+
+
+def test_lru_eviction_and_bytes_accounting():
+    cache = PhaseCache.PhaseCache(3 * 800)
+    for key in "abc":
+        cache.put(key, _entry(800))
+    assert cache.nbytes == 3 * 800
+    assert cache.get("a") is not None  # "a" - самая свежая, вытесняется "b"
+
+    cache.put("d", _entry(800))
+    assert cache.get("b") is None
+    assert {key for key in "acd" if cache.get(key) is not None} == set("acd")
+    assert cache.nbytes == 3 * 800 and cache.evictions == 1
+
+    # Замена записи: старый размер вычитается, 800 + 800 + 1600 не укладывается - вытесняется "c"
+    cache.put("a", _entry(1600))
+    assert cache.nbytes == 800 + 1600 and cache.evictions == 2
+    assert cache.get("c") is None
+    cache.put("big", _entry(4000))  # Больше max_bytes - не кэшируется
+    assert cache.get("big") is None and cache.nbytes <= cache.max_bytes
+    stats = cache.stats()
+    assert stats["entries"] == len(cache) and stats["bytes"] == cache.nbytes
+
+
+def _rolled(cache, seed=3):
+    sim = RollingMillSimulator.from_slab(dict(SLAB, id=1), seed=seed, thermal="empirical")
+    sim.phase_cache = cache
+    roll_slab(sim, PASSES[:2])
+    return sim.log.read().copy(), sim.pass_values
+
+
+def test_cache_hit_returns_cold_compute():
+    cold, cold_values = _rolled(None)
+    cache = PhaseCache.PhaseCache(64 * 2 ** 20)
+    first, _ = _rolled(cache)
+    misses = cache.misses
+    hit, hit_values = _rolled(cache)
+
+    assert cache.misses == misses and cache.hits >= misses
+    np.testing.assert_array_equal(first, cold)
+    np.testing.assert_array_equal(hit, cold)
+    assert hit_values == cold_values
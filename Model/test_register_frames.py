@@ -0,0 +1,70 @@
+import struct
+
+import numpy as np
+import pytest
+
+from RegisterFrames import (FLAG_BITS, FRAME_ADDRESS, FRAME_WORDS, REGISTER_COLUMNS, PhaseFrames,
+                            decode_setpoints, encode_frames, float_to_regs, regs_to_float)
+from RunRecorder import RECORD_DTYPES, STEP_FIELDS, replay_frames
+from TelemetryLog import COLUMNS, GAP_FB, LEFT_CAP, PYRO1, RIGHT_CAP, SPEED_FB, T
+
+
+def _block(steps=4):
+    "Блок [колонка, шаг] с различимыми значениями колонок"
+    block = np.arange(len(COLUMNS))[:, None] * 10.0 + np.arange(steps) * 0.25 + 0.5
+    for col, _ in FLAG_BITS:
+        block[col] = 0
+    return block
+
+
+@pytest.mark.parametrize("value", [0.0, -0.0, 1.5, -273.15, 1200.25, 3.4e38, 1e-30])
+def test_float_regs_round_trip(value):
+    regs = float_to_regs(value)
+    assert all(0 <= word <= 0xFFFF for word in regs)
+    assert regs_to_float(*regs) == np.float32(value)
+
+
+def test_float_regs_are_big_endian_high_word_first():
+    assert float_to_regs(1.0) == [0x3F80, 0x0000]
+    assert float_to_regs(-2.5) == [0xC020, 0x0000]
+
+
+def test_decode_setpoints_reads_four_floats_in_register_order():
+    setpoints = (120.5, 42.0, 300.0, -310.0)
+    regs = [word for value in setpoints for word in float_to_regs(value)]
+    assert decode_setpoints(regs + [0x0001, 0, 0]) == setpoints
+
+
+def test_frame_layout_follows_register_columns():
+    block = _block()
+    frames, values = encode_frames(block)
+
+    assert frames.shape == (4, FRAME_WORDS) and frames.dtype == np.uint16
+    assert FRAME_ADDRESS + FRAME_WORDS - 1 == 32  # Слово флагов - регистр 32
+    for i, col in enumerate(REGISTER_COLUMNS):
+        decoded = [regs_to_float(*frame[2 * i:2 * i + 2]) for frame in frames.tolist()]
+        np.testing.assert_array_equal(decoded, block[col].astype(np.float32))
+        np.testing.assert_array_equal(values[:, i], block[col].astype(np.float32))
+    assert REGISTER_COLUMNS[0] == PYRO1 and REGISTER_COLUMNS[-1] == T  # Регистры 12-13 и 30-31
+
+
+def test_flag_bits():
+    block = _block()
+    block[LEFT_CAP, 1] = block[GAP_FB, 1] = 1
+    block[RIGHT_CAP, 2] = block[SPEED_FB, 2] = 1
+    block[:, 3][[LEFT_CAP, RIGHT_CAP, GAP_FB, SPEED_FB]] = 1
+    frames, _ = encode_frames(block)
+    assert frames[:, -1].tolist() == [0, 0x05, 0x0A, 0x0F]
+
+
+def test_run_records_replay_to_published_frames():
+    block = _block()
+    block[RIGHT_CAP, 0] = 1
+    phase = PhaseFrames(0, block)
+    records = np.ascontiguousarray(phase.records).view(RECORD_DTYPES[1]).reshape(len(phase))
+    assert RECORD_DTYPES[1].names == STEP_FIELDS
+
+    frames, control = replay_frames(records)
+    np.testing.assert_array_equal(frames, phase.frames)
+    assert control is None
+    assert struct.unpack('>f', struct.pack('>2H', *phase.frames[0, :2]))[0] == phase.block[PYRO1, 0]
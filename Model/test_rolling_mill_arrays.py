@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import MillRegistry
+import RollingMillArrays as rma
+from RollingMill import RollingMill
+
+# Формулы RollingMill не обращаются к полям экземпляра
+MILL = RollingMill.__new__(RollingMill)
+RTOL = 1e-12
+
+# Проходы h_0 -> h_1 при DV = 300 мм
+PASSES = [(350.0, 320.0), (200.0, 168.0), (60.0, 50.0), (20.0, 15.0)]
+DV = 300.0
+TEMP = 1100.0
+V = 200.0
+
+
+def _both(name, *args):
+    "Значение формулы RollingMillArrays на массивах и скалярного метода RollingMill по точкам"
+    columns = [np.array(column, dtype=float) for column in zip(*args)]
+    return getattr(rma, name)(*columns), np.array([getattr(MILL, name)(*point) for point in args])
+
+
+@pytest.mark.parametrize("name, args", [
+    ("SpeedOfRolling", [(DV, v) for v in (50.0, 200.0, 400.0)]),
+    ("RelDef", PASSES),
+    ("ContactArcLen", [(DV, h_0, h_1) for h_0, h_1 in PASSES]),
+    ("TempDrDConRoll", [(DV, h_0, h_1, TEMP, 0.2) for h_0, h_1 in PASSES]),
+    ("TempDrPlDeform", [(120.0, h_0, h_1) for h_0, h_1 in PASSES]),
+    ("GenTemp", [(TEMP, 5.0, 12.0, 3.0), (900.0, 0.0, 20.0, 8.0)]),
+    ("Moment", [(40.0, h_0, h_1, 1500.0) for h_0, h_1 in PASSES]),
+    ("Effort", [(40.0, 250.0, 120.0), (60.0, 200.0, 300.0)]),
+    ("Power", [(100.0, v, DV) for v in (50.0, 400.0)]),
+    ("TempDrBPass", [(TEMP, 15.0, 250.0, h) for h in (350.0, 50.0)]),
+    # Ветви AvrgPressure: LK/h_ср < 1, 1..2, 2..4, > 4
+    ("AvrgPressure", [(lk, 90.0, 110.0, 120.0) for lk in (50.0, 100.0, 150.0, 200.0, 300.0, 400.0, 500.0)]),
+])
+def test_formula_matches_scalar_method(name, args):
+    vector, scalar = _both(name, *args)
+    np.testing.assert_allclose(vector, scalar, rtol=RTOL)
+
+
+@pytest.mark.parametrize("grade", ["Ст3сп", "65Г"])
+def test_def_resistance_matches_scalar_method(grade):
+    points = [(RelDef, 40.0, V, T) for RelDef in (0.05, 0.2) for T in (900.0, 1200.0)]
+    vector = rma.DefResistance(*[np.array(c) for c in zip(*points)], grade)
+    scalar = [MILL.DefResistance(*point, grade) for point in points]
+    np.testing.assert_allclose(vector, scalar, rtol=RTOL)
+
+
+def test_fric_coef_matches_scalar_method_on_both_speed_branches():
+    MS = MillRegistry.resolve_grade("Ст3сп").material
+    V0 = np.array([0.5, 3.0, 3.5, 10.0])  # V0 <= 3 - постоянный k2
+    vector = rma.FricCoef("Сталь", MS, V0, TEMP)
+    scalar = [MILL.FricCoef("Сталь", MS, v, TEMP) for v in V0]
+    np.testing.assert_allclose(vector, scalar, rtol=RTOL)
+    assert vector[0] == vector[1]
+
+
+def test_cap_condition_matches_scalar_method():
+    S = np.array([5.0, 20.0, 60.0])
+    assert list(rma.CapCondition(0.3, S, DV)) == [MILL.CapCondition(0.3, s, DV) for s in S]
+
+
+def test_sweep_accepts_scalar_axes():
+    maps = rma.sweep(['Ст3сп'], 100, 5, 1000, 100)
+
+    assert maps["effort"].shape == (1, 1, 1, 1, 1)
+    full = rma.sweep(['Ст3сп'], [100.0], [5.0], [1000.0], [100.0])
+    for key in ("effort", "moment", "power", "temp"):
+        np.testing.assert_array_equal(maps[key], full[key])
+    point = rma.rolling_pass(100.0, 95.0, 100.0, 1000.0, 250.0, DV, 'Ст3сп')
+    assert maps["effort"].item() == pytest.approx(point["effort"], rel=RTOL)
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+
+from RunRecorder import (CONTROL_FIELDS, HEADER, HEADER_SIZE, MAGIC, RECORD_DTYPES, RECORD_FIELDS,
+                         STEP_FIELDS, RunReader, RunRecorder, replay_frames)
+
+PARAMS = {'id': 5, 'material_slab': 'Ст3сп', 'seed': 7}
+
+
+def _steps(start, count):
+    "Блок шагов [шаг, поле STEP_FIELDS]"
+    steps = np.arange(start, start + count)[:, None] + np.arange(len(STEP_FIELDS)) / 16
+    return steps.astype('<f4')
+
+
+def test_round_trip_with_control_words(tmp_path):
+    path = str(tmp_path / "run.rec")
+    recorder = RunRecorder(path, PARAMS, chunk_records=4)
+    recorder.append(tuple(_steps(0, 1)[0]) + (0x0001, 1))
+    recorder.extend(_steps(1, 6), control=(0x0100, 3))  # Растёт на два куска
+    full = np.hstack((_steps(7, 2), [[0x0200, 4]] * 2))
+    recorder.extend(full)  # Блок с CONTROL_FIELDS пишется как есть
+    recorder.close()
+
+    reader = RunReader(path)
+    try:
+        assert reader.version == 2 and reader.has_control
+        assert reader.params == PARAMS
+        assert len(reader) == 9
+        steps = np.stack([reader.field(name) for name in STEP_FIELDS], axis=1)
+        np.testing.assert_array_equal(steps, _steps(0, 9))
+        assert reader.field('control').tolist() == [0x0001] + [0x0100] * 6 + [0x0200] * 2
+        assert reader.field('status').tolist() == [1] + [3] * 6 + [4] * 2
+
+        frames, control = replay_frames(reader.records)
+        assert frames.shape == (9, 21)
+        assert control.tolist()[1] == [0x0100, 3]
+    finally:
+        reader.close()
+
+
+def test_reader_follows_file_being_written(tmp_path):
+    path = str(tmp_path / "live.rec")
+    recorder = RunRecorder(path, PARAMS, chunk_records=2)
+    reader = RunReader(path)
+    try:
+        assert len(reader) == 0
+        recorder.extend(_steps(0, 3))
+        assert reader.refresh() == 3
+        recorder.append(tuple(_steps(3, 1)[0]) + (0, 0))
+        assert reader.refresh() == 4
+        assert reader.field('time')[-1] == _steps(3, 1)[0, STEP_FIELDS.index('time')]
+    finally:
+        reader.close()
+        recorder.close()
+
+
+def test_version_1_file_has_no_control_words(tmp_path):
+    path = tmp_path / "v1.rec"
+    dtype = RECORD_DTYPES[1]
+    meta = json.dumps(PARAMS).encode('utf-8')
+    records = np.ascontiguousarray(_steps(0, 3)).view(dtype).reshape(3)
+    header = bytearray(HEADER_SIZE)
+    HEADER.pack_into(header, 0, MAGIC, 1, HEADER_SIZE, dtype.itemsize, len(meta), 3)
+    header[HEADER.size:HEADER.size + len(meta)] = meta
+    path.write_bytes(bytes(header) + records.tobytes())
+
+    reader = RunReader(str(path))
+    try:
+        assert reader.version == 1 and not reader.has_control
+        assert reader.dtype.names == STEP_FIELDS
+        np.testing.assert_array_equal(reader.field('gap'), _steps(0, 3)[:, STEP_FIELDS.index('gap')])
+        frames, control = replay_frames(reader.records)
+        assert control is None and frames.shape[0] == 3
+    finally:
+        reader.close()
+    assert set(CONTROL_FIELDS) == set(RECORD_FIELDS) - set(STEP_FIELDS)
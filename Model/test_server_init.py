@@ -0,0 +1,72 @@
+import asyncio
+
+from ScaleTest import SLAB
+from Server import AsyncModbusServer
+
+
+class QueueDb:
+    "Очередь slabs в памяти вместо SlabDatabase"
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.rejected = []
+
+    async def wait_for_slab(self, stopped=lambda: False):
+        return self.rows.pop(0) if self.rows else None
+
+    async def reject_slab(self, slab_id, reason):
+        self.rejected.append((slab_id, reason))
+
+    async def close(self):
+        pass
+
+
+def _init(rows):
+    async def run():
+        db = QueueDb(rows)
+        server = AsyncModbusServer(runs_dir="runs", speed=0, db=db)
+        try:
+            await server.start_init_from_registers()
+            return server, db, server.hr_data_combined.getValues(32, 1)[0]
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_unknown_grade_is_rejected_and_next_slab_claimed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bad = dict(SLAB, id=1, material_slab="Ст99")
+    server, db, reg32 = _init([bad, SLAB])
+
+    assert [slab_id for slab_id, _ in db.rejected] == [1]
+    assert db.rejected[0][1].startswith("Марки стали 'Ст99' нет в реестре")
+    assert server.initialized
+    assert server.simulator.StartTemp == SLAB['temperature_slab']
+    assert reg32 & 0x10
+
+
+def test_rejected_slab_without_successor_leaves_mill_waiting(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bad = dict(SLAB, id=2, material_roll="Латунь")
+    server, db, reg32 = _init([bad])
+
+    assert [slab_id for slab_id, _ in db.rejected] == [2]
+    assert not server.initialized
+    assert not reg32 & 0x10
+
+
+def test_start_slab_rejects_unknown_layout(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run():
+        db = QueueDb([])
+        server = AsyncModbusServer(runs_dir="runs", speed=0, db=db, layout="Нет такого стана")
+        try:
+            return await server.start_slab(dict(SLAB, id=3)), server, db
+        finally:
+            await server.close()
+    started, server, db = asyncio.run(run())
+
+    assert not started
+    assert not server.initialized
+    assert [slab_id for slab_id, _ in db.rejected] == [3]
@@ -0,0 +1,193 @@
+import asyncio
+
+import SlabDatabase
+from ExcelLogger import SLAB_PARAMS
+from ScaleTest import SLAB
+from SlabDatabase import SLAB_COLUMNS, SLAB_QUERIES, SLABS_KEEP_LIMIT, SLABS_SCHEMA
+from TelemetrySink import TELEMETRY_SCHEMA
+
+
+class Recorder:
+    "Соединение и пул asyncpg, записывающие порядок обращений к БД"
+
+    def __init__(self, events):
+        self.events = events
+
+    async def execute(self, sql, *args):
+        self.events.append(("execute", sql))
+
+    def transaction(self):
+        return self
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def close(self):
+        self.events.append(("close",))
+
+
+def test_slabs_columns_added_before_pool_prepares_queries(monkeypatch):
+    events = []
+
+    async def connect(**kwargs):
+        events.append(("connect",))
+        return Recorder(events)
+
+    async def create_pool(**kwargs):
+        events.append(("create_pool",))
+        return Recorder(events)
+
+    monkeypatch.setattr(SlabDatabase.asyncpg, "connect", connect)
+    monkeypatch.setattr(SlabDatabase.asyncpg, "create_pool", create_pool)
+    asyncio.run(SlabDatabase.SlabDatabase(settings={}).open())
+
+    kinds = [event[0] for event in events]
+    assert kinds[:4] == ["connect", "execute", "close", "create_pool"]
+    assert events[1][1] == SLABS_SCHEMA
+    # После создания пула slabs меняется только триггером
+    assert all("ALTER TABLE" not in event[1] for event in events[4:] if event[0] == "execute")
+
+
+def test_slabs_altered_only_by_startup_schema():
+    assert "ALTER TABLE slabs" not in TELEMETRY_SCHEMA
+    for column in ("final_thickness", "final_temperature", "pass_count", "peak_effort"):
+        assert column in SLABS_SCHEMA
+
+
+def test_claim_returns_explicit_columns():
+    claim = SLAB_QUERIES["claim"]
+    assert "RETURNING *" not in claim
+    assert f"RETURNING {', '.join(SLAB_COLUMNS)}" in claim
+    # Колонки, которые читают симулятор и Excel-лог заготовки
+    assert {key for key, _ in SLAB_PARAMS} | {"id"} <= set(SLAB_COLUMNS)
+
+
+def test_reject_reason_added_by_startup_schema():
+    assert "reject_reason" in SLABS_SCHEMA
+    assert not hasattr(SlabDatabase, "SLAB_REJECT_SCHEMA")
+
+
+class SlabsTable:
+    """
+    Таблица slabs в памяти с запросами SLAB_QUERIES. claim выбирает самую старую
+    неиспользованную строку, пропуская заблокированные другими транзакциями
+    (ORDER BY id ... FOR UPDATE SKIP LOCKED), и держит блокировку через await.
+    """
+
+    def __init__(self, ids=()):
+        self.rows = {}
+        self.locked = set()
+        self.max_locked = 0
+        self.trims = 0
+        for slab_id in ids:
+            self.insert(slab_id)
+
+    def insert(self, slab_id):
+        self.rows[slab_id] = dict(SLAB, id=slab_id, is_used=False)
+
+    async def claim(self):
+        free = sorted(i for i, row in self.rows.items() if not row["is_used"] and i not in self.locked)
+        if not free:
+            return None
+        slab_id = free[0]
+        self.locked.add(slab_id)
+        self.max_locked = max(self.max_locked, len(self.locked))
+        await asyncio.sleep(0)  # Транзакция открыта: другие захваты идут параллельно
+        self.rows[slab_id]["is_used"] = True
+        self.locked.discard(slab_id)
+        return {key: self.rows[slab_id][key] for key in SLAB_COLUMNS}
+
+    async def count(self):
+        return len(self.rows)
+
+    async def trim(self):
+        self.trims += 1
+        used = sorted(i for i, row in self.rows.items() if row["is_used"])
+        for slab_id in used[:-3]:
+            del self.rows[slab_id]
+
+
+class Statement:
+    def __init__(self, query):
+        self.fetchrow = self.fetchval = self.fetch = query
+
+
+class SlabsPool:
+    "Пул asyncpg поверх SlabsTable: соединения с подготовленными statements"
+
+    def __init__(self, table):
+        self.statements = {name: Statement(getattr(table, name)) for name in SLAB_QUERIES}
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def _database(table):
+    db = SlabDatabase.SlabDatabase(settings={})
+    db.pool = SlabsPool(table)
+    db._trigger_installed = True
+
+    async def listen():
+        pass
+    db._listen = listen
+    return db
+
+
+def test_claim_is_fifo_and_trims_used_rows():
+    table = SlabsTable([3, 1, 2] + list(range(10, 10 + SLABS_KEEP_LIMIT)))
+    db = _database(table)
+
+    async def run():
+        return [(await db.claim_slab() or {}).get("id") for _ in range(len(table.rows) + 1)]
+    claimed = asyncio.run(run())
+
+    assert claimed == [1, 2, 3] + list(range(10, 10 + SLABS_KEEP_LIMIT)) + [None]
+    # Подрезка удаляет самые старые использованные строки, пока их больше SLABS_KEEP_LIMIT
+    assert table.trims > 0
+    assert sorted(table.rows) == list(range(10, 10 + SLABS_KEEP_LIMIT))
+
+
+def test_concurrent_claims_skip_locked_rows():
+    table = SlabsTable(range(1, 7))
+    db = _database(table)
+
+    async def run():
+        return await asyncio.gather(*(db.claim_slab() for _ in range(8)))
+    rows = asyncio.run(run())
+
+    # Захваты перекрывались, и каждый получил свою строку по порядку id
+    assert table.max_locked > 1
+    assert [row["id"] for row in rows if row is not None] == [1, 2, 3, 4, 5, 6]
+    assert rows[-2:] == [None, None]
+
+
+def test_one_notify_wakes_every_waiting_mill():
+    table = SlabsTable()
+    db = _database(table)
+
+    async def run():
+        waiters = [asyncio.create_task(db.wait_for_slab()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert len(db._waiters) == 3
+        for slab_id in (7, 5, 6):
+            table.insert(slab_id)
+        db._on_notify(None, 0, SlabDatabase.SLABS_CHANNEL, "7")  # Одно уведомление на всю вставку
+        # Быстрее первой паузы опроса (не меньше DB_RETRY_MIN): будит именно уведомление
+        return await asyncio.wait_for(asyncio.gather(*waiters), SlabDatabase.Config.DB_RETRY_MIN / 2)
+    rows = asyncio.run(run())
+
+    # Каждый стан проснулся и захватил свою строку
+    assert sorted(row["id"] for row in rows) == [5, 6, 7]
+    assert not db._waiters
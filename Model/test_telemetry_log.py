@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+
+from TelemetryLog import COLUMNS, GAP_FB, T, TEMP, TelemetryLog
+
+
+def _steps(start, count):
+    "Блок шагов [колонка, шаг]: значение - номер шага плюс доля номера колонки"
+    steps = np.arange(start, start + count, dtype=float)
+    return steps[None, :] + np.arange(len(COLUMNS))[:, None] / 100
+
+
+def _log(steps, retention, spill_dir):
+    log = TelemetryLog(_steps(0, 1)[:, 0], capacity=4)
+    log.set_retention(retention, spill_dir)
+    for start in range(1, steps, 7):
+        log.extend(_steps(start, min(7, steps - start)))
+    return log
+
+
+def test_retention_keeps_window_and_spills_older_steps(tmp_path):
+    log = _log(100, 10, str(tmp_path))
+
+    assert len(log) == 100
+    assert log.base > 0 and len(log) - log.base >= 10
+    assert log.capacity <= 2 * 10 + 7
+    np.testing.assert_array_equal(log.column(T), np.arange(log.base, 100))
+    assert log.last() == list(_steps(99, 1)[:, 0])
+
+
+def test_read_spans_spill_file_and_memory(tmp_path):
+    log = _log(100, 10, str(tmp_path))
+    base = log.base
+
+    np.testing.assert_array_equal(log.read(), _steps(0, 100))
+    np.testing.assert_array_equal(log.read(base - 5, base + 5), _steps(base - 5, 10))
+    np.testing.assert_array_equal(log.read(3, 8), _steps(3, 5))
+    np.testing.assert_array_equal(log.read(base, 100), _steps(base, 100 - base))
+
+
+def test_without_retention_nothing_is_spilled():
+    log = _log(100, None, None)
+
+    assert log.base == 0 and log._spill is None
+    np.testing.assert_array_equal(log.read(), _steps(0, 100))
+
+
+def test_clear_truncates_spill_file(tmp_path):
+    log = _log(100, 10, str(tmp_path))
+    assert os.fstat(log._spill.fileno()).st_size > 0
+
+    log.clear(_steps(0, 1)[:, 0])
+
+    assert len(log) == 1 and log.base == 0
+    assert os.fstat(log._spill.fileno()).st_size == 0
+    log.extend(_steps(1, 60))
+    np.testing.assert_array_equal(log.read(), _steps(0, 61))
+    log.close()
+
+
+def test_rounded_reads_log_once(tmp_path, monkeypatch):
+    log = _log(100, 10, str(tmp_path))
+    reads = []
+    read = log.read
+    monkeypatch.setattr(log, "read", lambda *args: reads.append(args) or read(*args))
+
+    time, temp, gap_fb = log.rounded((T, TEMP, GAP_FB))
+
+    assert len(reads) == 1
+    assert time == list(np.round(np.arange(100.0), 3))
+    assert temp == list(np.round(np.arange(100.0) + TEMP / 100, 2))
+    assert gap_fb == list(range(100)) and isinstance(gap_fb[0], int)